@@ -0,0 +1,813 @@
+"""
+Offline benchmarks for the bot's hot paths.
+
+Runs game_server_bot against in-process fakes of Discord channels, messages and interactions, and a fake
+process backend, so it needs no network, no Discord token and no game server. Each REST call a real bot
+would make is counted (and can be slowed down or answered with a 429), and the event loop is sampled to
+report how long it was blocked.
+
+    python benchmarks/bench_bot.py                        # run every scenario and print a table
+    python benchmarks/bench_bot.py --json before.json     # also save the results
+    python benchmarks/bench_bot.py --compare before.json  # show the change against saved results
+"""
+import argparse
+import asyncio
+import bisect
+import collections
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import discord
+from discord.ext import commands
+import logging
+
+
+# --- Fake Discord REST layer ---
+class FakeResponse:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.reason = {404: "Not Found", 429: "Too Many Requests"}.get(status, "")
+        self.headers = headers or {}
+
+
+class FakeHTTP:
+    """
+    Counts every REST call by route and simulates latency and rate limiting.
+    429s are handled the way discord.py handles them: the rate-limit headers are reported to the bot's trace hook,
+    the call waits Retry-After and is retried.
+    """
+    def __init__(self, latency_seconds, rate_limit_probability, retry_after_seconds, seed):
+        self.latency_seconds = latency_seconds
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after_seconds = retry_after_seconds
+        self.random = random.Random(seed)
+        self.calls = collections.Counter()
+        self.rate_limited = 0
+        self.observer = None
+
+    async def request(self, method, route, path):
+        while True:
+            self.calls[f"{method} {route}"] += 1
+            await asyncio.sleep(self.latency_seconds)
+            if self.rate_limit_probability and self.random.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                if self.observer:
+                    self.observer(path, 429, {"Retry-After": str(self.retry_after_seconds)})
+                await asyncio.sleep(self.retry_after_seconds)
+                continue
+            return
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class FakeUser:
+    def __init__(self, user_id, display_name, bot=False):
+        self.id = user_id
+        self.display_name = self.name = display_name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content, author, created_at):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.created_at = created_at
+        self.guild = None
+        self.attachments = []
+        self.mentions = []
+        self.webhook_id = None
+        self.type = discord.MessageType.default
+        self._state = channel.state
+
+    async def edit(self, content=None, view=None, **kwargs):
+        await self.channel.http.request("PATCH", "/channels/{channel_id}/messages/{message_id}", f"/channels/{self.channel.id}/messages/{self.id}")
+        if self.id not in self.channel.messages:
+            raise discord.NotFound(FakeResponse(404), "Unknown Message")
+        self.content = content
+        return self
+
+    async def delete(self, delay=None):
+        if delay is not None:
+            return # Delayed deletes fire after the scenario has finished
+        await self.channel.http.request("DELETE", "/channels/{channel_id}/messages/{message_id}", f"/channels/{self.channel.id}/messages/{self.id}")
+        if self.channel.messages.pop(self.id, None) is None:
+            raise discord.NotFound(FakeResponse(404), "Unknown Message")
+
+
+class FakePartialMessage(FakeMessage):
+    def __init__(self, channel, message_id):
+        super().__init__(channel, message_id, None, None, discord.utils.snowflake_time(message_id))
+
+
+class FakeTextChannel:
+    """An in-memory text channel. Messages are kept in ID order, which is also their creation order."""
+    HISTORY_PAGE_SIZE = 100
+
+    def __init__(self, http, channel_id, bot_user):
+        self.http = http
+        self.id = channel_id
+        self.bot_user = bot_user
+        self.messages = {}
+        self._ids = [] # Sorted message IDs; may still hold IDs of deleted messages
+        self.guild = None
+        self.state = None # Set by the harness to the bot's connection state
+        self._last_created = discord.utils.utcnow() - datetime.timedelta(days=30)
+
+    def _next_id(self, created_at=None):
+        created_at = created_at or max(discord.utils.utcnow(), self._last_created + datetime.timedelta(milliseconds=1))
+        self._last_created = created_at
+        message_id = discord.utils.time_snowflake(created_at)
+        while message_id in self.messages:
+            message_id += 1
+        return message_id, created_at
+
+    def add_message(self, content, author, created_at=None):
+        """Adds a message without a REST call (used to prefill channels)."""
+        message_id, created_at = self._next_id(created_at)
+        message = FakeMessage(self, message_id, content, author, created_at)
+        self.messages[message_id] = message
+        bisect.insort(self._ids, message_id)
+        return message
+
+    async def send(self, content=None, view=None, ephemeral=False, delete_after=None, **kwargs):
+        await self.http.request("POST", "/channels/{channel_id}/messages", f"/channels/{self.id}/messages")
+        return self.add_message(content, self.bot_user)
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakePartialMessage(self, message_id)
+
+    async def delete_messages(self, messages):
+        if len(messages) > 100:
+            raise ValueError("Can only bulk delete messages up to 100 messages")
+        cutoff = discord.utils.utcnow() - datetime.timedelta(days=14)
+        if any(message.created_at < cutoff for message in messages):
+            raise discord.HTTPException(FakeResponse(400), "Cannot bulk delete messages older than 14 days")
+        await self.http.request("POST", "/channels/{channel_id}/messages/bulk-delete", f"/channels/{self.id}/messages/bulk-delete")
+        for message in messages:
+            self.messages.pop(message.id, None)
+
+    async def history(self, limit=None, after=None, oldest_first=True, **kwargs):
+        # One GET per page of 100, like the real paginator.
+        after_id = after.id if after is not None else 0
+        yielded = 0
+        while limit is None or yielded < limit:
+            start = bisect.bisect_right(self._ids, after_id)
+            page = self._ids[start:start + self.HISTORY_PAGE_SIZE]
+            await self.http.request("GET", "/channels/{channel_id}/messages", f"/channels/{self.id}/messages")
+            if not page:
+                return
+            for message_id in page:
+                message = self.messages.get(message_id)
+                if message is not None:
+                    yield message
+                    yielded += 1
+            after_id = page[-1]
+            if len(page) < self.HISTORY_PAGE_SIZE:
+                return
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False, **kwargs):
+        if self._done:
+            raise discord.errors.InteractionResponded(self._interaction)
+        self._done = True
+        await self._interaction.http.request("POST", "/interactions/{interaction_id}/callback", "/interactions/0/callback")
+
+    async def send_message(self, content=None, ephemeral=False, **kwargs):
+        if self._done:
+            raise discord.errors.InteractionResponded(self._interaction)
+        self._done = True
+        await self._interaction.http.request("POST", "/interactions/{interaction_id}/callback", "/interactions/0/callback")
+
+
+class FakeFollowup:
+    def __init__(self, http):
+        self.http = http
+
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        await self.http.request("POST", "/webhooks/{application_id}/{token}", "/webhooks/0/token")
+
+
+class FakeInteraction:
+    def __init__(self, http, channel, user, custom_id):
+        self.http = http
+        self.channel = channel
+        self.channel_id = channel.id
+        self.user = user
+        self.data = {"custom_id": custom_id}
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(http)
+
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        await self.followup.send(content, ephemeral=ephemeral, **kwargs)
+
+
+class FakeContext(commands.Context):
+    """Command context whose replies go to the fake channel instead of the REST client."""
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+# --- Fake process backend ---
+class FakeProcessTable:
+    """
+    Stands in for the OS process table and the start/stop commands. Scans take scan_seconds (like waiting on
+    tasklist) and servers come up boot_seconds after their start command runs.
+    """
+    def __init__(self, scan_seconds, boot_seconds):
+        self.scan_seconds = scan_seconds
+        self.boot_seconds = boot_seconds
+        self.running = {} # lowercased process name -> PID
+        self.scans = 0
+        self.pid_checks = 0
+        self.launches = 0
+        self.stops = 0
+        self._next_pid = 1000
+
+    def mark_running(self, process_name):
+        """Puts a process in the table as if it had just finished starting."""
+        self._next_pid += 1
+        self.running[process_name.lower()] = self._next_pid
+
+    def launch(self, process_name):
+        self.launches += 1
+        asyncio.get_running_loop().call_later(self.boot_seconds, self.mark_running, process_name)
+
+    def stop(self, process_name):
+        self.stops += 1
+        self.running.pop(process_name.lower(), None)
+
+
+def build_fake_process_probe(bot_module, table):
+    class FakeProcessProbe(bot_module.ProcessProbe):
+        name = "fake"
+
+        async def find_pids(self, process_names):
+            table.scans += 1
+            await asyncio.sleep(table.scan_seconds)
+            return {name.lower(): [table.running[name.lower()]] if name.lower() in table.running else [] for name in process_names}
+
+        def is_pid_alive(self, pid, process_name):
+            table.pid_checks += 1
+            return table.running.get(process_name.lower()) == pid
+
+    return FakeProcessProbe()
+
+
+def build_fake_subprocess_module(table, process_name):
+    """Replaces the subprocess module seen by the bot so start/stop commands drive the fake process table."""
+    def popen(command, *args, **kwargs):
+        table.launch(process_name)
+        return types.SimpleNamespace(pid=None)
+
+    def run(command, *args, **kwargs):
+        table.stop(process_name)
+        return types.SimpleNamespace(returncode=0)
+
+    return types.SimpleNamespace(Popen=popen, run=run, CREATE_NO_WINDOW=0, CREATE_NEW_PROCESS_GROUP=0, PIPE=subprocess.PIPE,
+                                 DEVNULL=subprocess.DEVNULL, CalledProcessError=subprocess.CalledProcessError)
+
+
+# --- Fake game servers answering player count queries ---
+class FakeA2SServer(asyncio.DatagramProtocol):
+    """
+    Answers A2S_INFO requests on a local UDP port. With challenge=True it first replies with an S2C_CHALLENGE ('A')
+    packet and only answers requests that echo the challenge back, like newer Source servers do.
+    """
+    REQUEST = b"\xff\xff\xff\xffTSource Engine Query\x00"
+    CHALLENGE = b"\x12\x34\x56\x78"
+
+    def __init__(self, challenge=False):
+        self.challenge = challenge
+        self.players, self.max_players = 0, 16
+        self.requests = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        if not data.startswith(self.REQUEST):
+            return
+        if self.challenge and data[len(self.REQUEST):] != self.CHALLENGE:
+            self.transport.sendto(b"\xff\xff\xff\xffA" + self.CHALLENGE, addr)
+            return
+        strings = b"".join(value.encode() + b"\x00" for value in ("Bench Server", "map01", "bench", "Bench Game"))
+        self.transport.sendto(b"\xff\xff\xff\xffI\x11" + strings + b"\x00\x00" + bytes((self.players, self.max_players, 0)), addr)
+
+    async def start(self):
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=("127.0.0.1", 0))
+        return self.transport.get_extra_info("sockname")[1]
+
+    def close(self):
+        self.transport.close()
+
+
+class FakeMinecraftServer:
+    """Answers Minecraft Server List Ping handshakes and status requests on a local TCP port."""
+    def __init__(self):
+        self.players, self.max_players = 0, 20
+        self.requests = 0
+        self._server = None
+
+    @staticmethod
+    def _varint(value):
+        encoded = bytearray()
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            encoded.append(byte | (0x80 if value else 0))
+            if not value:
+                return bytes(encoded)
+
+    @staticmethod
+    async def _read_packet(reader):
+        length = shift = 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return await reader.readexactly(length)
+
+    async def _handle(self, reader, writer):
+        try:
+            handshake = await self._read_packet(reader)
+            status_request = await self._read_packet(reader)
+            if handshake[:1] != b"\x00" or status_request != b"\x00":
+                return
+            self.requests += 1
+            status = json.dumps({
+                "version": {"name": "1.20.4", "protocol": 765},
+                "players": {"online": self.players, "max": self.max_players},
+                "description": {"text": "Bench Server"}
+            }).encode()
+            payload = b"\x00" + self._varint(len(status)) + status
+            writer.write(self._varint(len(payload)) + payload)
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self._server.close()
+
+
+# --- Event loop blocking monitor ---
+class LoopBlockMonitor:
+    """Sleeps in short ticks and attributes any oversleep to callbacks that blocked the event loop."""
+    TICK_SECONDS = 0.001
+
+    def __init__(self):
+        self.max_block = 0.0
+        self.total_block = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.TICK_SECONDS)
+            overshoot = loop.time() - started - self.TICK_SECONDS
+            if overshoot > self.TICK_SECONDS:
+                self.total_block += overshoot
+                self.max_block = max(self.max_block, overshoot)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+# --- Harness ---
+class Harness:
+    """Imports the bot once and wires fresh fakes into it before every scenario."""
+    CHANNEL_ID = 1234567890123456789
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="bot-bench-")
+        os.chdir(self.workdir) # bot.log and the state database go to a scratch directory
+        import game_server_bot
+        logging.getLogger().setLevel(logging.WARNING)
+        self.bot_module = game_server_bot
+        self.bot = game_server_bot.bot
+        self.bot_user = FakeUser(1, "Bot", bot=True)
+        self.bot._connection.user = self.bot_user
+        # Command replies normally go through the REST client; the bot's contexts send them to the fake channel instead.
+        get_context = type(self.bot).get_context
+        self.bot.get_context = lambda origin, cls=FakeContext: get_context(self.bot, origin, cls=cls)
+        self._run_index = 0
+
+    def reset(self):
+        """Gives the bot a clean channel, process table, state store and caches."""
+        module, bot = self.bot_module, self.bot
+        self._run_index += 1
+        self.http = FakeHTTP(self.args.latency_ms / 1000, self.args.rate_limit_probability, self.args.retry_after_ms / 1000, self.args.seed)
+        self.channel = FakeTextChannel(self.http, self.CHANNEL_ID, self.bot_user)
+        self.channel.state = bot._connection
+        self.processes = FakeProcessTable(self.args.scan_ms / 1000, self.args.boot_ms / 1000)
+
+        bot.loop = asyncio.get_running_loop()
+        bot.get_channel = lambda channel_id: self.channel if channel_id == self.CHANNEL_ID else None
+        bot.process_probe = build_fake_process_probe(module, self.processes)
+        bot.state_store = module.StateStore(os.path.join(self.workdir, f"state-{self._run_index}.db"))
+        bot.state_store.loaded = True
+        bot.scheduler.stop()
+        bot.scheduler = module.JobScheduler()
+        bot.message_rate_limiter = module.TokenBucketLimiter(module.CONTROL_CHANNEL_MESSAGES_PER_MINUTE / 60, module.CONTROL_CHANNEL_MESSAGE_BURST)
+        bot.server_state.invalidate()
+        bot.persistent_messages.clear()
+        bot.persistent_message_hashes.clear()
+        bot.retired_messages.clear()
+        # A fresh updater, so edit pacing and rate-limit holds from the previous scenario don't carry over.
+        bot.message_updater = module.PersistentMessageUpdater(self.args.edit_interval_ms / 1000)
+        for server in bot.game_servers.values():
+            bot.message_updater.register((server.name, "panel"), lambda server=server: module.render_panel_message(server))
+        bot.message_updater.start()
+        self.http.observer = bot.message_updater.observe_response
+
+        module.SERVER_PROBE_INITIAL_INTERVAL_SECONDS = 0.01
+        module.SERVER_PROBE_MAX_INTERVAL_SECONDS = 0.05
+        for server in bot.game_servers.values():
+            server.channel_id = self.CHANNEL_ID
+            server.panel_message_id = None
+            server.command_history.clear()
+            server.start_time = server.shutdown_deadline = None
+            server.pid = None
+            server.idle_since = None
+        self.server = next(iter(bot.game_servers.values()))
+        module.subprocess = build_fake_subprocess_module(self.processes, self.server.process_name)
+
+        async def run_shell_command(command):
+            module.subprocess.run(command)
+        module.run_shell_command = run_shell_command
+
+    async def restore_panel(self):
+        """Creates the server panels like on_ready does."""
+        for server in self.bot.game_servers.values():
+            server.panel_view = self.bot_module.ServerControlView(self.bot, server)
+        await self.bot_module.restore_persistent_messages(self.bot.game_servers.values())
+
+    async def settle(self):
+        await self.bot.message_delete_batcher.flush()
+        await self.bot.message_updater.flush()
+        await self.bot.state_store.flush()
+
+    def counters(self):
+        return {
+            "api_calls": self.http.total_calls,
+            "api_calls_by_route": dict(sorted(self.http.calls.items())),
+            "rate_limited": self.http.rate_limited,
+            "process_scans": self.processes.scans,
+            "pid_checks": self.processes.pid_checks,
+            "server_launches": self.processes.launches
+        }
+
+
+# --- Scenarios ---
+async def scenario_clear_channel(harness):
+    """!clear_channel full on a channel holding CLEAR_MESSAGES messages, some older than 14 days."""
+    await harness.restore_panel()
+    channel = harness.channel
+    user = FakeUser(2, "Player")
+    now = discord.utils.utcnow()
+    old_count = int(harness.args.clear_messages * harness.args.old_fraction)
+    for index in range(harness.args.clear_messages):
+        age = datetime.timedelta(days=20) if index < old_count else datetime.timedelta(days=1)
+        channel.add_message(f"chatter {index}", user, now - age + datetime.timedelta(milliseconds=index))
+    harness.http.calls.clear()
+
+    context = types.SimpleNamespace(bot=harness.bot, channel=channel, message=None)
+    yield
+    await harness.bot_module.clear_channel(context, "full")
+    await harness.settle()
+    remaining = len(channel.messages)
+    panels = len(harness.bot.game_servers)
+    if remaining != panels:
+        raise AssertionError(f"clear_channel left {remaining} messages, expected only the {panels} panel(s)")
+
+
+async def scenario_command_burst(harness):
+    """COMMAND_BURST messages from 20 users arriving at once: a mix of !serverstatus commands and chatter that gets deleted."""
+    await harness.restore_panel()
+    await harness.settle()
+    users = [FakeUser(2 + index, f"Player{index}") for index in range(20)]
+    messages = []
+    for index in range(harness.args.command_burst):
+        content = "!serverstatus" if index % 5 < 3 else f"hello {index}"
+        messages.append(harness.channel.add_message(content, users[index % len(users)]))
+    harness.http.calls.clear()
+    yield
+    await asyncio.gather(*(harness.bot.on_message(message) for message in messages))
+    await harness.settle()
+
+
+async def scenario_chat_flood(harness):
+    """One user flooding the control channel with CHAT_FLOOD messages, commands mixed in."""
+    await harness.restore_panel()
+    await harness.settle()
+    user = FakeUser(3, "Spammer")
+    messages = [harness.channel.add_message("!serverstatus" if index % 2 else f"spam {index}", user) for index in range(harness.args.chat_flood)]
+    harness.http.calls.clear()
+    yield
+    for message in messages:
+        await harness.bot.on_message(message)
+    await harness.settle()
+
+
+async def scenario_gateway_events(harness):
+    """GATEWAY_EVENTS MESSAGE_CREATE payloads from a busy channel the bot does not control, fed to its gateway parser."""
+    other_channel_id = harness.CHANNEL_ID + 1
+    author = {"id": "7", "username": "Chatter", "discriminator": "0", "avatar": None, "global_name": None}
+    member = {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+    payloads = [{
+        "id": str(10 ** 18 + index), "channel_id": str(other_channel_id), "guild_id": "1", "author": author, "member": member,
+        "content": f"chat message {index}", "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+        "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0
+    } for index in range(harness.args.gateway_events)]
+    parse = harness.bot._connection.parsers["MESSAGE_CREATE"]
+    harness.http.calls.clear()
+    yield
+    for payload in payloads:
+        parse(payload)
+    await asyncio.sleep(0)
+
+
+async def scenario_status_ticks(harness):
+    """
+    STATUS_TICKS status loop ticks against a running server. Real ticks are STATUS_UPDATE_INTERVAL_MINUTES apart, so
+    each one finds the process state cache expired and the panel free to be edited again; the scenario invalidates the
+    cache and turns off edit pacing to match.
+    """
+    harness.processes.mark_running(harness.server.process_name)
+    await harness.restore_panel()
+    await harness.settle()
+    harness.http.calls.clear()
+    harness.processes.scans = harness.processes.pid_checks = 0
+    bot = harness.bot
+    bot.message_updater.min_interval_seconds = 0
+    yield
+    for _ in range(harness.args.status_ticks):
+        bot.server_state.invalidate()
+        await harness.bot_module.status_update_loop.coro()
+        await bot.message_updater.flush()
+    await harness.settle()
+    checks = harness.processes.scans + harness.processes.pid_checks
+    if checks < harness.args.status_ticks:
+        raise AssertionError(f"{harness.args.status_ticks} ticks checked the server process only {checks} times")
+
+
+async def scenario_panel_refreshes(harness):
+    """PANEL_REFRESHES forced re-renders of every server panel, as on_ready and !panel do."""
+    await harness.restore_panel()
+    await harness.settle()
+    harness.http.calls.clear()
+    yield
+    for _ in range(harness.args.panel_refreshes):
+        harness.bot.persistent_message_hashes.clear()
+        await harness.bot_module.restore_persistent_messages(harness.bot.game_servers.values())
+    await harness.settle()
+
+
+async def scenario_button_clicks(harness):
+    """BUTTON_CLICKS users pressing Start at the same moment, then the same number pressing Stop."""
+    await harness.restore_panel()
+    await harness.settle()
+    view = harness.server.panel_view
+    harness.http.calls.clear()
+    yield
+
+    async def click(button, index):
+        interaction = FakeInteraction(harness.http, harness.channel, FakeUser(100 + index, f"Player{index}"), button.custom_id)
+        if await view.interaction_check(interaction):
+            await button.callback(interaction)
+
+    await asyncio.gather(*(click(view.start_button, index) for index in range(harness.args.button_clicks)))
+    await asyncio.gather(*(click(view.stop_button, index) for index in range(harness.args.button_clicks)))
+    await harness.settle()
+
+
+async def scenario_player_queries(harness):
+    """
+    PLAYER_QUERIES player count polls against local A2S (plain and challenge) and Minecraft stand-ins, a burst of
+    concurrent polls sharing one query through PlayerCountCache, and idle_shutdown_loop stopping an empty server.
+    """
+    module, server = harness.bot_module, harness.server
+    a2s, a2s_challenge, minecraft = FakeA2SServer(), FakeA2SServer(challenge=True), FakeMinecraftServer()
+    a2s.players, a2s_challenge.players, minecraft.players = 3, 5, 7
+    queries = {
+        "a2s": (module.A2SPlayerQuery("127.0.0.1", await a2s.start()), (3, 16)),
+        "a2s_challenge": (module.A2SPlayerQuery("127.0.0.1", await a2s_challenge.start()), (5, 16)),
+        "minecraft": (module.MinecraftPlayerQuery("127.0.0.1", await minecraft.start()), (7, 20))
+    }
+    harness.processes.mark_running(server.process_name)
+    await harness.restore_panel()
+    await harness.settle()
+    saved_player_count, saved_idle_minutes = server.player_count, server.idle_shutdown_minutes
+    harness.http.calls.clear()
+    harness.processes.scans = 0
+    yield
+
+    try:
+        for name, (query, expected) in queries.items():
+            cache = module.PlayerCountCache(query, ttl_seconds=0)
+            for _ in range(harness.args.player_queries):
+                result = await cache.get()
+                if result != expected:
+                    raise AssertionError(f"{name} query returned {result}, expected {expected}")
+        if a2s_challenge.requests != 2 * harness.args.player_queries:
+            raise AssertionError(f"challenge server saw {a2s_challenge.requests} requests, expected two per query")
+
+        # Concurrent polls (the panel and the idle policy at once) share a single query.
+        cache = module.PlayerCountCache(queries["minecraft"][0], module.PLAYER_COUNT_CACHE_TTL_SECONDS)
+        requests_before = minecraft.requests
+        results = await asyncio.gather(*(cache.get() for _ in range(50)))
+        if set(results) != {(7, 20)} or minecraft.requests != requests_before + 1:
+            raise AssertionError(f"50 concurrent polls sent {minecraft.requests - requests_before} queries, expected 1")
+
+        # The idle policy: players keep the server up, an empty server starts the timer and is stopped once it runs out.
+        server.player_count = module.PlayerCountCache(queries["a2s"][0], module.PLAYER_COUNT_CACHE_TTL_SECONDS)
+        server.idle_shutdown_minutes = 10
+        await module.idle_shutdown_loop.coro()
+        if server.idle_since is not None:
+            raise AssertionError("idle timer started while players were online")
+        a2s.players = 0
+        server.player_count.invalidate()
+        await module.idle_shutdown_loop.coro()
+        if server.idle_since is None:
+            raise AssertionError("idle timer did not start for an empty server")
+        server.idle_since -= server.idle_shutdown_minutes * 60
+        server.player_count.invalidate()
+        await module.idle_shutdown_loop.coro()
+        if server.process_name.lower() in harness.processes.running:
+            raise AssertionError("idle_shutdown_loop did not stop the empty server")
+        await harness.settle()
+    finally:
+        server.player_count, server.idle_shutdown_minutes = saved_player_count, saved_idle_minutes
+        for responder in (a2s, a2s_challenge, minecraft):
+            responder.close()
+
+
+SCENARIOS = {
+    "clear_channel": scenario_clear_channel,
+    "command_burst": scenario_command_burst,
+    "chat_flood": scenario_chat_flood,
+    "gateway_events": scenario_gateway_events,
+    "status_ticks": scenario_status_ticks,
+    "panel_refreshes": scenario_panel_refreshes,
+    "button_clicks": scenario_button_clicks,
+    "player_queries": scenario_player_queries
+}
+
+
+async def run_scenario(harness, scenario):
+    """Runs one scenario: its setup up to the yield is not measured, the rest is."""
+    harness.reset()
+    steps = scenario(harness)
+    await steps.__anext__()
+    monitor = LoopBlockMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        await steps.__anext__()
+    except StopAsyncIteration:
+        pass
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    return {
+        "wall_seconds": round(wall, 4),
+        "loop_block_max_ms": round(monitor.max_block * 1000, 2),
+        "loop_block_total_ms": round(monitor.total_block * 1000, 2),
+        **harness.counters()
+    }
+
+
+async def run_all(args):
+    harness = Harness(args)
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        if args.scenario and name not in args.scenario:
+            continue
+        runs = [await run_scenario(harness, scenario) for _ in range(args.repeat)]
+        # Counts are deterministic; the wall and blocking times are reported as the median of the runs.
+        result = runs[-1]
+        for key in ("wall_seconds", "loop_block_max_ms", "loop_block_total_ms"):
+            result[key] = statistics.median(run[key] for run in runs)
+        results[name] = result
+        print(f"  {name}: {result['wall_seconds']:.3f}s, {result['api_calls']} API calls", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+SUMMARY_COLUMNS = ("wall_seconds", "api_calls", "rate_limited", "process_scans", "pid_checks", "server_launches", "loop_block_max_ms", "loop_block_total_ms")
+
+def print_table(results, baseline=None):
+    header = f"{'scenario':<16}" + "".join(f"{column:>22}" for column in SUMMARY_COLUMNS)
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        cells = []
+        for column in SUMMARY_COLUMNS:
+            value = result.get(column)
+            cell = f"{value:g}" if value is not None else "-"
+            base = (baseline or {}).get(name, {}).get(column)
+            if base is not None and value is not None and base != value:
+                change = f"{(value - base) / base * 100:+.0f}%" if base else "new"
+                cell = f"{cell} ({change})"
+            cells.append(f"{cell:>22}")
+        print(f"{name:<16}" + "".join(cells))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for game_server_bot's hot paths.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Run only this scenario (repeatable).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; times are the median.")
+    parser.add_argument("--json", metavar="PATH", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", metavar="PATH", help="Show changes against results saved with --json.")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated latency of every REST call.")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.01, help="Chance that a REST call is answered with a 429.")
+    parser.add_argument("--retry-after-ms", type=float, default=50.0, help="Retry-After of simulated 429s.")
+    parser.add_argument("--scan-ms", type=float, default=20.0, help="Simulated duration of one process table scan.")
+    parser.add_argument("--boot-ms", type=float, default=100.0, help="Simulated time for the game server to come up.")
+    parser.add_argument("--edit-interval-ms", type=float, default=50.0, help="Minimum gap between edits of one persistent message.")
+    parser.add_argument("--clear-messages", type=int, default=50000)
+    parser.add_argument("--old-fraction", type=float, default=0.02, help="Share of clear_channel messages older than 14 days.")
+    parser.add_argument("--command-burst", type=int, default=100)
+    parser.add_argument("--chat-flood", type=int, default=200)
+    parser.add_argument("--gateway-events", type=int, default=20000)
+    parser.add_argument("--status-ticks", type=int, default=1000)
+    parser.add_argument("--panel-refreshes", type=int, default=50)
+    parser.add_argument("--button-clicks", type=int, default=20)
+    parser.add_argument("--player-queries", type=int, default=200, help="Sequential polls per player count protocol.")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    results = asyncio.run(run_all(args))
+
+    baseline = None
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if json_path:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "discord.py": discord.__version__,
+            "settings": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+            "results": results
+        }
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
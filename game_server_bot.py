@@ -1,25 +1,39 @@
 import discord
 from discord.ext import commands, tasks
+import abc
 import asyncio
 import os
+import sys
+import json
+import atexit
+import sqlite3
+import concurrent.futures
+import csv
+import ntpath
 import subprocess
+import signal
 import datetime
+import time
+import hashlib
+import hmac
+import bisect
+import heapq
+import threading
+import traceback
+import math
+import re
+import aiohttp
+from aiohttp import web
 import pytz
 from collections import deque
+from array import array
 import logging
-
-# --- Configure logging to a file ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='bot.log',
-    filemode='a'
-)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logging.getLogger().addHandler(console_handler)
-
+import logging.handlers
+import queue
+import gzip
+import shutil
+import stat
+import zlib
 
 # =====================================================================
 #                          C U S T O M   C O N F I G U R A T I O N
@@ -36,301 +50,3197 @@ GAME_SERVER_START_COMMAND = r'start /B "" "C:\Path\To\Your\Game\Server.exe" -una
 GAME_SERVER_STOP_COMMAND = "taskkill /IM YourGameServerProcessName.exe /F"
 GAME_SERVER_PROCESS_NAME = "YourGameServerProcessName.exe" # The exact process name to check for
 
+# Process detection backend used to find the game server process.
+# "auto" picks "tasklist" on Windows, "procfs" on Linux and "ps" on other systems.
+PROCESS_PROBE_BACKEND = "auto"
+SERVER_STATE_CACHE_TTL_SECONDS = 5 # How long one process check result is shared by every caller before probing again
+
+# How the bot confirms that the server finished starting or stopping. Every probe in a list must report its
+# "expect" value (default True) before the server counts as ready/stopped. Supported probe types:
+#   {"type": "process"}                                               - the game server process is running
+#   {"type": "tcp", "host": "127.0.0.1", "port": 25565}               - a TCP port accepts connections
+#   {"type": "udp", "host": "127.0.0.1", "port": 27015, "payload": b"\xff"} - a UDP port answers a datagram
+#   {"type": "log", "path": r"C:\Path\To\server.log", "pattern": r"Server started"} - new log output matches a regex
+SERVER_READY_PROBES = [{"type": "process"}]
+SERVER_STOPPED_PROBES = [{"type": "process", "expect": False}]
+SERVER_READY_TIMEOUT_SECONDS = 120 # Give up confirming a start after this long
+SERVER_STOP_TIMEOUT_SECONDS = 60 # Give up confirming a stop after this long
+SERVER_PROBE_INITIAL_INTERVAL_SECONDS = 0.25 # First poll delay; doubles after every failed poll...
+SERVER_PROBE_MAX_INTERVAL_SECONDS = 5 # ...up to this interval
+
+# Owned Server Process (optional)
+# Set GAME_SERVER_LAUNCH_ARGS to the server executable and its arguments to let the bot launch and own the
+# server process itself, e.g. [r"C:\Path\To\Your\Game\Server.exe", "-unattended", "-log"]. The bot then notices
+# a crash the moment it happens and stops the server gracefully instead of running GAME_SERVER_STOP_COMMAND.
+# Leave it as None to keep using GAME_SERVER_START_COMMAND / GAME_SERVER_STOP_COMMAND.
+GAME_SERVER_LAUNCH_ARGS = None
+GAME_SERVER_STOP_CONSOLE_COMMAND = None # Written to the server's console to stop it (e.g. "stop" or "quit"); None sends Ctrl+Break/SIGTERM
+SERVER_GRACEFUL_STOP_TIMEOUT_SECONDS = 30 # How long an owned server may take to exit before it is killed
+SERVER_RESTART_ON_CRASH = False # Relaunch an owned server that exits without being asked to
+SERVER_RESTART_BACKOFF_INITIAL_SECONDS = 5 # Delay before the first restart; doubles with every crash in the window...
+SERVER_RESTART_BACKOFF_MAX_SECONDS = 300 # ...up to this delay
+SERVER_CRASH_LOOP_MAX_RESTARTS = 3 # Stop restarting once the server crashes more often than this...
+SERVER_CRASH_LOOP_WINDOW_SECONDS = 600 # ...within this many seconds
+
+# Server Output Capture
+# The console output of an owned server (GAME_SERVER_LAUNCH_ARGS) is always captured. Set GAME_SERVER_LOG_FILE to
+# also follow a log file the server writes itself; !serverlog then searches that file instead of the captured copies.
+GAME_SERVER_LOG_FILE = None # e.g. r"C:\Path\To\Your\Game\Logs\server.log"
+LOG_CAPTURE_DIR = "server_logs" # Where captured console output is written (rotated, one file set per server)
+LOG_BUFFER_LINES = 5000 # Newest output lines kept in memory per server
+LOG_MAX_LINE_LENGTH = 1000 # Longer lines are cut off in memory
+LOG_SPILL_MAX_BYTES = 10 * 1024 * 1024 # Rotate a captured output file once it reaches this size...
+LOG_SPILL_BACKUP_COUNT = 5 # ...keeping this many older files
+LOG_SPILL_FLUSH_SECONDS = 1 # Captured output is written to disk in batches at most this often
+LOG_FOLLOW_INTERVAL_SECONDS = 1 # How often GAME_SERVER_LOG_FILE is checked for new output
+LOG_FOLLOW_MAX_READ_BYTES = 4 * 1024 * 1024 # Most new log output read into memory per check
+LOG_SEARCH_MAX_BYTES = 64 * 1024 * 1024 # How far back from the end of each log file !serverlog searches
+SERVER_LOG_MAX_LINES = 50 # Most lines !serverlog returns
+LOG_SEARCH_MAX_PATTERN_LENGTH = 100 # Longest search text !serverlog accepts
+
+# Save Snapshots (optional)
+SAVE_DIRECTORY = None # The game's world/save directory, e.g. r"C:\Path\To\Your\Game\Saves"; None disables snapshots
+SNAPSHOT_DIR = "snapshots" # Where snapshot chunks and manifests are kept (one store per server)
+SNAPSHOT_ON_STOP = True # Take a snapshot after every confirmed stop (manual, automated, idle or before a scheduled restart)
+SNAPSHOT_KEEP = 10 # Number of snapshots kept; chunks only older snapshots used are deleted
+SNAPSHOT_CHUNK_SIZE = 4 * 1024 * 1024 # Files are deduplicated in pieces of this size
+SNAPSHOT_COMPRESSION_LEVEL = 3 # zlib level for stored chunks (1 = fastest, 9 = smallest)
+SNAPSHOT_WORKERS = None # Threads hashing and compressing chunks in parallel; None uses one per CPU core
+
+# Player Count and Idle Shutdown (optional)
+# How the bot asks the running server for its player count; None disables player counts and idle shutdown.
+#   {"type": "a2s", "host": "127.0.0.1", "port": 27015}       - Source A2S_INFO query (most Steam dedicated servers; use the query port)
+#   {"type": "minecraft", "host": "127.0.0.1", "port": 25565} - Minecraft Java Edition status ping
+PLAYER_COUNT_QUERY = None
+PLAYER_COUNT_CACHE_TTL_SECONDS = 15 # How long one player count answer is reused
+PLAYER_QUERY_TIMEOUT_SECONDS = 2 # How long to wait for the server to answer a player count query
+IDLE_SHUTDOWN_MINUTES = 0 # Stop the server after this many minutes without players (0 disables; SHUTDOWN_DELAY_HOURS still applies)
+IDLE_CHECK_INTERVAL_SECONDS = 60 # How often the idle policy checks the player count
+
+# Demand Forecast and Pre-warming (learns when players usually ask for the server from the command history)
+FORECAST_PREWARM = False # Start the server shortly before hours in which players very likely want it
+FORECAST_HISTORY_DAYS = 56 # How much history the forecast learns from
+FORECAST_MIN_WEEKS = 3 # Weeks of history needed before the forecast is trusted to pre-warm
+FORECAST_PREWARM_CONFIDENCE = 0.75 # Pre-warm for hours in which players asked for the server in at least this share of weeks
+FORECAST_PREWARM_LEAD_MINUTES = 5 # Start this long (plus the last measured boot time) before the hour
+FORECAST_PREWARM_GRACE_MINUTES = 30 # Stop a pre-warmed server again if nobody asks for it or joins within this time
+FORECAST_CHECK_INTERVAL_SECONDS = 60 # How often the pre-warm policy runs
+
 # Discord Channel and Message IDs
 # The Discord channel where the bot will operate and send persistent messages
 SERVER_CHANNEL_ID = 1234567890123456789 # Replace with your actual channel ID
 
-# File paths to store persistent message IDs (these files will be created/updated)
-PERSISTENT_VIEW_MESSAGE_ID_FILE = "persistent_view_message_id.txt"
-PERSISTENT_HISTORY_MESSAGE_ID_FILE = "persistent_history_message_id.txt"
-PERSISTENT_STATUS_MESSAGE_ID_FILE = "persistent_status_message_id.txt"
+# SQLite database holding persistent message IDs, server start/shutdown times and command history (created if missing)
+STATE_DB_FILE = "bot_state.db"
 
 # Server Automation Timings
 SHUTDOWN_DELAY_HOURS = 12 # Hours until the server automatically shuts down after starting
-STATUS_UPDATE_INTERVAL_MINUTES = 1 # How often the server status message is updated (in minutes)
+STATUS_UPDATE_INTERVAL_MINUTES = 1 # How often the server panel is refreshed (in minutes)
+PERSISTENT_MESSAGE_MIN_EDIT_INTERVAL_SECONDS = 2 # Minimum gap between two edits of the same persistent message
 DAILY_CLEAR_HOUR = 3 # Hour (24-hour format) for the daily channel clear task
 DAILY_CLEAR_MINUTE = 0 # Minute for the daily channel clear task
+SCHEDULE_MISSED_GRACE_MINUTES = 30 # Scheduled starts, stops and restarts missed while the bot was offline still run if at most this late
+SCHEDULE_EXTEND_MAX_HOURS = 24 # !extend never moves an automated shutdown further than this from now
+SCHEDULE_MAX_JOBS = 500 # Maximum number of scheduled jobs across all servers
+
+# Resource Sampling (Linux only; reads /proc/<pid> of the running game server)
+RESOURCE_SAMPLE_INTERVAL_SECONDS = 10 # How often CPU, RAM, thread and disk I/O usage is sampled; 0 disables sampling
+RESOURCE_HISTORY_SECONDS = 3600 # How much sample history is kept for the status sparkline and !serverstats
+RESOURCE_SPARKLINE_WIDTH = 30 # Number of characters in the panel's CPU sparkline
+STATS_MESSAGE_DELETE_DELAY_SECONDS = 60 # How long the !serverstats reply stays before deleting itself and the command
+
+# Bot Logging
+BOT_LOG_FILE = "bot.log" # The bot's own log file
+BOT_LOG_LEVEL = "INFO" # DEBUG, INFO, WARNING or ERROR
+BOT_LOG_MAX_BYTES = 10 * 1024 * 1024 # Rotate the log once it reaches this size...
+BOT_LOG_ROTATE_HOURS = 24 # ...or after this many hours, whichever comes first (0 rotates by size only)
+BOT_LOG_BACKUP_COUNT = 7 # Number of gzip-compressed rotated logs to keep
+BOT_LOG_JSON = False # Write the log file as one JSON object per line instead of plain text
+
+# Metrics and Event Loop Health
+METRICS_HTTP_PORT = None # Serve Prometheus metrics on http://METRICS_HTTP_HOST:<port>/metrics (e.g. 9108); None disables the endpoint
+METRICS_HTTP_HOST = "127.0.0.1" # Keep this on localhost unless the scraper runs on another machine
+LOOP_LAG_SAMPLE_INTERVAL_SECONDS = 0.1 # How often event loop lag is measured
+LOOP_BLOCK_WARNING_MS = 100 # Log the stack of any callback that blocks the event loop for longer than this
+MEMORY_REPORT_DELAY_SECONDS = 300 # Log the bot's steady-state memory use this long after startup; 0 disables the report
+
+# Discord Gateway and Caches
+# The bot only acts in its control channels, so it subscribes to guild and guild message events only, caches no
+# members, and drops message events from every other channel before discord.py builds any objects for them.
+MESSAGE_CACHE_SIZE = None # Messages discord.py keeps in memory (only control channel messages reach it); None disables the cache
+
+# Local Control API (optional)
+# Lets scripts on this machine start, stop and query the servers without a Discord round trip (see server_control.py).
+CONTROL_API_PORT = None # Serve the API on http://CONTROL_API_HOST:<port>/ (e.g. 9109); None disables it unless CONTROL_API_SOCKET is set
+CONTROL_API_HOST = "127.0.0.1" # Keep this on localhost; anyone who can reach the API with the token controls the servers
+CONTROL_API_SOCKET = None # Serve on this Unix socket path instead of a TCP port (Linux/macOS), e.g. "/run/gsbot/control.sock"
+CONTROL_API_TOKEN = "YOUR_CONTROL_API_TOKEN" # Clients send "Authorization: Bearer <token>"; the API stays off while this is the placeholder
 
 # Timezone for logging and scheduling (e.g., 'America/New_York', 'Europe/London', 'Asia/Tokyo')
 TARGET_TIMEZONE = pytz.timezone('America/Chicago')
 
 # Bot Behavior Settings
-MAX_COMMAND_HISTORY = 5 # Maximum number of recent commands to display in the history message
+MAX_COMMAND_HISTORY = 5 # Maximum number of recent commands to display on the panel
+HISTORY_PAGE_SIZE = 10 # Entries per page of !history
+HISTORY_RETENTION_DAYS = 365 # History older than this is pruned once a day (0 keeps everything)
 HELP_MESSAGE_DELETE_DELAY_SECONDS = 30 # How long the !serverhelp message stays before deleting itself and the command
+CONTROL_CHANNEL_MESSAGE_BURST = 5 # Messages a user may send in a control channel in quick succession...
+CONTROL_CHANNEL_MESSAGES_PER_MINUTE = 10 # ...and per minute after that; anything beyond is deleted unread, commands included
+INVALID_MESSAGE_DELETE_WINDOW_SECONDS = 2 # Chat in a control channel is collected this long and then removed with one bulk delete
+
+# Multiple Game Servers (optional)
+# To manage several game servers from this one bot, list them here. Each entry needs a unique short "name"
+# (used in commands such as `!startserver minecraft` and in button IDs) and may override any of these keys;
+# keys left out fall back to the single-server settings above:
+#   "display_name", "start_command", "stop_command", "process_name", "channel_id", "ready_probes",
+#   "stopped_probes", "ready_timeout_seconds", "stop_timeout_seconds", "shutdown_delay_hours", "launch_args",
+#   "stop_console_command", "graceful_stop_timeout_seconds", "restart_on_crash", "player_query", "idle_shutdown_minutes",
+#   "log_file", "prewarm", "save_directory"
+# Leave the list empty to manage only the server configured by GAME_SERVER_START_COMMAND and friends.
+GAME_SERVERS = []
 
 # =====================================================================
 #                      E N D   C U S T O M   C O N F I G U R A T I O N
 # =====================================================================
 
 
+# --- Metrics ---
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style, plus the largest value seen."""
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the maximum for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms, keyed by metric name and label set."""
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+    PREFIX = "gsbot_"
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.descriptions = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items())) if labels else ()
+
+    def describe(self, name, description):
+        self.descriptions[name] = description
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.DEFAULT_BUCKETS)
+        histogram.observe(value)
+
+    def counter_value(self, name, **labels):
+        return sum(value for (metric, label_items), value in self.counters.items()
+                   if metric == name and all(item in label_items for item in labels.items()))
+
+    def gauge_value(self, name, **labels):
+        return self.gauges.get(self._key(name, labels))
+
+    def histograms_named(self, name):
+        """Returns {label dict as tuple: histogram} for every label set of a histogram."""
+        return {label_items: histogram for (metric, label_items), histogram in self.histograms.items() if metric == name}
+
+    @staticmethod
+    def _escape_label_value(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _format_labels(cls, label_items, extra=()):
+        items = list(label_items) + list(extra)
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{cls._escape_label_value(value)}"' for key, value in items) + "}"
+
+    def render_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        def header(name, metric_type):
+            if name in self.descriptions:
+                lines.append(f"# HELP {self.PREFIX}{name} {self.descriptions[name]}")
+            lines.append(f"# TYPE {self.PREFIX}{name} {metric_type}")
+
+        for metric_type, series in (("counter", self.counters), ("gauge", self.gauges)):
+            for name in sorted({name for name, _ in series}):
+                header(name, metric_type)
+                for (metric, label_items), value in series.items():
+                    if metric == name:
+                        lines.append(f"{self.PREFIX}{name}{self._format_labels(label_items)} {value}")
+        for name in sorted({name for name, _ in self.histograms}):
+            header(name, "histogram")
+            for label_items, histogram in self.histograms_named(name).items():
+                cumulative = 0
+                for bound, bucket_count in zip(list(histogram.bounds) + ["+Inf"], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.PREFIX}{name}_bucket{self._format_labels(label_items, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.PREFIX}{name}_sum{self._format_labels(label_items)} {histogram.sum}")
+                lines.append(f"{self.PREFIX}{name}_count{self._format_labels(label_items)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Discord REST routes by method and path, so metrics group calls by what they do rather than by message ID.
+REST_ROUTE_NAMES = (
+    ("GET", re.compile(r"/channels/\d+/messages/\d+$"), "fetch_message"),
+    ("GET", re.compile(r"/channels/\d+/messages$"), "history"),
+    ("POST", re.compile(r"/channels/\d+/messages/bulk-delete$"), "delete_messages"),
+    ("POST", re.compile(r"/channels/\d+/messages$"), "send"),
+    ("PATCH", re.compile(r"/channels/\d+/messages/\d+$"), "edit"),
+    ("DELETE", re.compile(r"/channels/\d+/messages/\d+$"), "delete"),
+    ("POST", re.compile(r"/interactions/\d+/[^/]+/callback$"), "interaction_response"),
+    ("POST", re.compile(r"/webhooks/\d+/[^/]+$"), "followup")
+)
+
+def rest_route_name(method, path):
+    for route_method, pattern, name in REST_ROUTE_NAMES:
+        if method == route_method and pattern.search(path):
+            return name
+    return "other"
+
+
+class EventLoopMonitor:
+    """
+    Measures event loop lag with a short periodic sleep, and runs a watchdog thread that logs the stack of
+    whatever is blocking the loop for longer than LOOP_BLOCK_WARNING_MS.
+    """
+    def __init__(self, metrics, interval_seconds, block_threshold_seconds):
+        self.metrics = metrics
+        self.interval_seconds = interval_seconds
+        self.block_threshold_seconds = block_threshold_seconds
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.ensure_future(self._run())
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            self._heartbeat = time.monotonic()
+            self.metrics.observe("event_loop_lag_seconds", max(0.0, loop.time() - started - self.interval_seconds))
+
+    def _watch(self):
+        reported_heartbeat = None
+        while True:
+            time.sleep(self.block_threshold_seconds / 2)
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval_seconds
+            if blocked_for < self.block_threshold_seconds or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            self.metrics.inc("event_loop_blocks_total")
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=8)) if frame is not None else "(stack unavailable)\n"
+            logging.warning("Event loop blocked for more than %.0f ms. Currently running:\n%s", blocked_for * 1000, stack.rstrip())
+
+
+def describe_bot_metrics(metrics):
+    metrics.describe("rest_requests_total", "Discord REST requests by route and HTTP status.")
+    metrics.describe("rest_request_seconds", "Discord REST request latency by route.")
+    metrics.describe("process_probe_seconds", "Duration of one process table scan.")
+    metrics.describe("server_confirm_seconds", "Time until a start or stop was confirmed by the probes.")
+    metrics.describe("status_loop_drift_seconds", "How far status_update_loop ticks drift from their interval.")
+    metrics.describe("event_loop_lag_seconds", "Oversleep of a periodic sleep on the event loop.")
+    metrics.describe("event_loop_blocks_total", "Times a callback blocked the event loop for longer than LOOP_BLOCK_WARNING_MS.")
+    metrics.describe("commands_total", "Commands invoked by name.")
+    metrics.describe("gateway_latency_seconds", "Latency of the Discord gateway heartbeat.")
+    metrics.describe("uptime_seconds", "Seconds since the bot process started.")
+    metrics.describe("process_resident_bytes", "Resident memory of the bot process.")
+    metrics.describe("steady_state_resident_bytes", "Resident memory of the bot process MEMORY_REPORT_DELAY_SECONDS after startup.")
+    metrics.describe("gateway_events_dropped_total", "Message events from channels other than the control channels, dropped unparsed.")
+
+
+def process_memory_bytes():
+    """Returns (resident bytes, peak resident bytes) of the bot process, or (None, None) where the platform offers neither."""
+    if sys.platform.startswith("linux"):
+        values = {}
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = int(value.split()[0]) * 1024
+        return values.get("VmRSS"), values.get("VmHWM")
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (field, ctypes.c_size_t) for field in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                                       "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                                                       "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.WinDLL("kernel32")
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize, counters.PeakWorkingSetSize
+    return None, None
+
+
+# --- Logging Pipeline ---
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates the log when it reaches max_bytes or after interval_seconds, whichever comes first, and gzips rotated files."""
+    def __init__(self, filename, max_bytes, interval_seconds, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval_seconds = interval_seconds
+        self.rollover_at = time.time() + interval_seconds if interval_seconds else None
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source, destination):
+        with open(source, "rb") as source_file, gzip.open(destination, "wb") as destination_file:
+            shutil.copyfileobj(source_file, destination_file)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval_seconds:
+            self.rollover_at = time.time() + self.interval_seconds
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread untouched. The stock QueueHandler formats every message on the calling
+    thread so records can be pickled; this queue never leaves the process, so formatting is left to the listener.
+    """
+    def prepare(self, record):
+        return record
+
+
+def configure_logging():
+    """
+    Routes every log record through a queue to a listener thread that owns the file and console handlers,
+    so writing, rotating and compressing the log never happens on the event loop.
+    """
+    formatter = JsonLogFormatter() if BOT_LOG_JSON else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = CompressingRotatingFileHandler(BOT_LOG_FILE, BOT_LOG_MAX_BYTES, BOT_LOG_ROTATE_HOURS * 3600, BOT_LOG_BACKUP_COUNT)
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(BOT_LOG_LEVEL)
+    root_logger.addHandler(InProcessQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    # Registered before any other exit handler, so it runs last and still writes their log lines.
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = configure_logging()
+
+
 # --- Bot Setup ---
-intents = discord.Intents.default()
+# Guilds for the channel cache, guild and direct messages and their content for commands; nothing else is subscribed to.
+intents = discord.Intents.none()
+intents.guilds = True
+intents.guild_messages = True
+intents.dm_messages = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
-bot.current_panel_message_id = None
-bot.current_history_message_id = None
-bot.current_status_message_id = None
-bot.command_history_list = deque(maxlen=MAX_COMMAND_HISTORY)
-bot.server_start_time = None
-bot.shutdown_task = None
+# Lets the persistent message updater follow Discord's rate-limit headers on every REST response,
+# and times every request for the metrics.
+http_trace = aiohttp.TraceConfig()
 
-# --- Helper Functions (attached to bot in on_ready for better scope) ---
+async def _on_http_request_start(session, trace_config_ctx, params):
+    trace_config_ctx.started = time.perf_counter()
 
-async def check_server_process_func():
-    """Checks if the game server process is currently running."""
-    try:
-        result = subprocess.run(
-            ['tasklist', '/FI', f'IMAGENAME eq {GAME_SERVER_PROCESS_NAME}', '/NH', '/FO', 'CSV'],
-            capture_output=True,
-            text=True,
-            check=False,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
-        return GAME_SERVER_PROCESS_NAME.lower() in result.stdout.lower() and "no tasks are running" not in result.stdout.lower()
-    except Exception as e:
-        logging.error(f"ERROR in check_server_process: {e}")
+async def _on_http_request_end(session, trace_config_ctx, params):
+    updater = getattr(bot, "message_updater", None)
+    if updater is not None:
+        updater.observe_response(params.url.path, params.response.status, params.response.headers)
+    route = rest_route_name(params.method, params.url.path)
+    bot.metrics.inc("rest_requests_total", {"route": route, "status": params.response.status})
+    bot.metrics.observe("rest_request_seconds", time.perf_counter() - trace_config_ctx.started, {"route": route})
+
+async def _on_http_request_exception(session, trace_config_ctx, params):
+    bot.metrics.inc("rest_requests_total", {"route": rest_route_name(params.method, params.url.path), "status": "error"})
+
+http_trace.on_request_start.append(_on_http_request_start)
+http_trace.on_request_end.append(_on_http_request_end)
+http_trace.on_request_exception.append(_on_http_request_exception)
+
+bot = commands.Bot(command_prefix="!", intents=intents, http_trace=http_trace, max_messages=MESSAGE_CACHE_SIZE,
+                   member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+
+# Gateway events that belong to one channel. Chat in guild channels the bot does not control is dropped in front of
+# discord.py's parsers instead of being turned into Message, Member and User objects first. Commands and direct
+# messages still get through, so a command sent elsewhere is answered with a pointer to the control channel.
+# The filter replaces entries of discord.py's private ConnectionState.parsers table, which is not a public API. It is
+# only known to be safe with the version pinned in requirements.txt (discord.py 2.7.1); keep the pin and this filter
+# in step, and re-check the parser names whenever the pin is raised.
+CHANNEL_SCOPED_EVENTS = ("MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE", "MESSAGE_DELETE_BULK")
+
+def is_foreign_channel_event(event, data):
+    """Whether a channel-scoped gateway payload is chat from a guild channel the bot does not control."""
+    channel_id = data.get("channel_id")
+    if channel_id is None or data.get("guild_id") is None or is_control_channel(int(channel_id)):
+        return False
+    return not (event == "MESSAGE_CREATE" and data.get("content", "").startswith(bot.command_prefix))
+
+def install_channel_event_filter(connection):
+    """
+    Wraps the gateway parsers of CHANNEL_SCOPED_EVENTS. Returns whether the filter was installed; if discord.py's
+    internals do not look as expected, nothing is changed and every event is parsed in full.
+    """
+    parsers = getattr(connection, "parsers", None)
+    missing = [event for event in CHANNEL_SCOPED_EVENTS if not isinstance(parsers, dict) or not callable(parsers.get(event))]
+    if missing:
+        logging.warning("Channel event filter disabled: discord.py %s has no parser for %s (it was written against "
+                        "discord.py 2.7.1). Events from other channels are parsed in full.", discord.__version__, ", ".join(missing))
         return False
+    for event in CHANNEL_SCOPED_EVENTS:
+        parse = parsers[event]
+        def parse_control_channel_event(data, parse=parse, event=event):
+            if is_foreign_channel_event(event, data):
+                bot.metrics.inc("gateway_events_dropped_total", {"event": event})
+                return
+            parse(data)
+        parsers[event] = parse_control_channel_event
+    return True
 
-async def get_server_status_string_func():
-    """Generates the formatted server status string content (without the leading title)."""
-    server_running_status = await bot.check_server_process() 
+install_channel_event_filter(getattr(bot, "_connection", None))
 
-    status_lines = []
-    if server_running_status:
-        status_lines.append("🟢 **Status:** Running")
-        if bot.server_start_time:
-            if bot.server_start_time.tzinfo is None:
-                bot.server_start_time = TARGET_TIMEZONE.localize(bot.server_start_time)
+bot.metrics = MetricsRegistry()
+describe_bot_metrics(bot.metrics)
+bot.loop_monitor = EventLoopMonitor(bot.metrics, LOOP_LAG_SAMPLE_INTERVAL_SECONDS, LOOP_BLOCK_WARNING_MS / 1000)
+bot.metrics_runner = None
+bot.memory_report_task = None
 
-            shutdown_time_ct = bot.server_start_time + datetime.timedelta(hours=SHUTDOWN_DELAY_HOURS)
-            now_ct = datetime.datetime.now(TARGET_TIMEZONE)
-            time_remaining = shutdown_time_ct - now_ct
+bot.persistent_messages = {} # (server name, message_id_attr) -> cached discord.Message/PartialMessage, so updates skip fetch_message
+bot.persistent_message_hashes = {} # (server name, message_id_attr) -> digest of the last content rendered into that message
+bot.retired_messages = [] # (server, state key, message ID) of status and history messages left by earlier versions
 
-            hours, remainder = divmod(int(time_remaining.total_seconds()), 3600)
-            minutes, _ = divmod(remainder, 60)
+# --- Game Server Definitions ---
+class GameServer:
+    """Configuration and runtime state of one managed game server."""
+    def __init__(self, name, display_name=None, start_command=GAME_SERVER_START_COMMAND, stop_command=GAME_SERVER_STOP_COMMAND,
+                 process_name=GAME_SERVER_PROCESS_NAME, channel_id=SERVER_CHANNEL_ID, ready_probes=SERVER_READY_PROBES,
+                 stopped_probes=SERVER_STOPPED_PROBES, ready_timeout_seconds=SERVER_READY_TIMEOUT_SECONDS,
+                 stop_timeout_seconds=SERVER_STOP_TIMEOUT_SECONDS, shutdown_delay_hours=SHUTDOWN_DELAY_HOURS,
+                 launch_args=GAME_SERVER_LAUNCH_ARGS, stop_console_command=GAME_SERVER_STOP_CONSOLE_COMMAND,
+                 graceful_stop_timeout_seconds=SERVER_GRACEFUL_STOP_TIMEOUT_SECONDS, restart_on_crash=SERVER_RESTART_ON_CRASH,
+                 player_query=PLAYER_COUNT_QUERY, idle_shutdown_minutes=IDLE_SHUTDOWN_MINUTES, log_file=GAME_SERVER_LOG_FILE,
+                 prewarm=FORECAST_PREWARM, save_directory=SAVE_DIRECTORY):
+        self.name = name
+        self.display_name = display_name or name
+        self.start_command = start_command
+        self.stop_command = stop_command
+        self.process_name = process_name
+        self.channel_id = channel_id
+        self.ready_probes = ready_probes
+        self.stopped_probes = stopped_probes
+        self.ready_timeout_seconds = ready_timeout_seconds
+        self.stop_timeout_seconds = stop_timeout_seconds
+        self.shutdown_delay_hours = shutdown_delay_hours
+        self.launch_args = launch_args
+        self.stop_console_command = stop_console_command
+        self.graceful_stop_timeout_seconds = graceful_stop_timeout_seconds
+        self.restart_on_crash = restart_on_crash
+        self.player_query = player_query
+        self.idle_shutdown_minutes = idle_shutdown_minutes
+        self.log_file = log_file
+        self.prewarm = prewarm
+        self.save_directory = save_directory
 
-            status_lines.append(f"⏰ **Started At:** {bot.server_start_time.strftime('%m/%d/%y %H:%M:%S %Z')}")
-            status_lines.append(f"🗓️ **Auto-Shutdown At:** {shutdown_time_ct.strftime('%m/%d/%y %H:%M:%S %Z')}")
-            status_lines.append(f"⏳ **Time Remaining:** {hours}h {minutes}m")
-        else:
-            status_lines.append("⏰ **Started At:** Unknown (Bot may have restarted)")
-            status_lines.append("🗓️ **Auto-Shutdown At:** Unknown")
-            status_lines.append("⏳ **Time Remaining:** Unknown")
+        self.panel_message_id = None
+        self.command_history = deque(maxlen=MAX_COMMAND_HISTORY)
+        self.start_time = None
+        self.shutdown_deadline = None # Absolute time of the automated shutdown; persisted so restarts keep the original deadline
+        self.last_ready_seconds = None # Measured time from launch until the readiness probes passed
+        self.pid = None # Last known PID of the game server, used as a fast path by check_server_process
+        self.panel_view = None
+        self.resources = None # ResourceHistory of sampled CPU, memory and disk I/O
+        self.resource_sampler = None # ProcessResourceSampler turning process counters into rates
+        self.supervisor = None # ServerSupervisor owning the process when launch_args is set
+        self.player_count = None # PlayerCountCache when player_query is set
+        self.idle_since = None # Monotonic time since which the server has had no players
+        self.log_capture = None # ServerLogCapture when the server's output is captured or followed
+        self.operations = None # ServerOperationQueue serializing start, stop and restart requests
+        self.forecast = None # DemandForecast learned from the command history
+        self.snapshots = None # SaveSnapshotter when save_directory is set
+        self.prewarmed_at = None # Epoch time of a pre-warm start nobody has claimed yet
+        self.prewarmed_for = None # Epoch time of the hour the last pre-warm was for
+
+    def state_key(self, key):
+        """Namespaces a state store key to this server."""
+        return f"{self.name}.{key}"
+
+
+def build_game_servers():
+    """Builds the managed servers from GAME_SERVERS, or a single server from the single-server settings."""
+    if not GAME_SERVERS:
+        servers = {"server": GameServer("server", display_name="Game Server")}
     else:
-        status_lines.append("🔴 **Status:** Stopped")
-        status_lines.append("Use `!serverhelp` for advanced commands.")
-    
-    return "\n".join(status_lines)
+        servers = {}
+        for server_config in GAME_SERVERS:
+            server = GameServer(**server_config)
+            if server.name in servers:
+                raise ValueError(f"Duplicate game server name '{server.name}' in GAME_SERVERS.")
+            if ":" in server.name or " " in server.name:
+                raise ValueError(f"Game server name '{server.name}' may not contain spaces or colons.")
+            servers[server.name] = server
+    for server in servers.values():
+        attach_server_services(server)
+    return servers
 
-async def update_persistent_message(channel, message_id_attr, file_path, content_func, view=None):
-    """Generic function to update or send a persistent message."""
-    message_id = getattr(bot, message_id_attr)
-    content = await content_func() if asyncio.iscoroutinefunction(content_func) else content_func()
+def servers_in_channel(channel_id):
+    """Returns the servers whose panel lives in the given channel."""
+    return [server for server in bot.game_servers.values() if server.channel_id == channel_id]
 
-    existing_message = None
-    if message_id:
+def is_control_channel(channel_id):
+    return any(server.channel_id == channel_id for server in bot.game_servers.values())
+
+def persistent_message_ids():
+    """Returns the IDs of every server's panel message."""
+    return {server.panel_message_id for server in bot.game_servers.values() if server.panel_message_id}
+
+# CREATE_NO_WINDOW only exists on Windows; creationflags must be 0 everywhere else.
+_NO_WINDOW_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+async def run_shell_command(command):
+    """Runs a shell command without blocking the event loop. Raises CalledProcessError on a non-zero exit code."""
+    process = await asyncio.create_subprocess_shell(
+        command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL, creationflags=_NO_WINDOW_FLAGS
+    )
+    return_code = await process.wait()
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, command)
+
+# --- Durable State Store ---
+
+# Files written by older versions of the bot; their contents are imported into the state store once.
+LEGACY_STATE_FILES = {
+    "current_panel_message_id": "persistent_view_message_id.txt",
+    "current_history_message_id": "persistent_history_message_id.txt",
+    "current_status_message_id": "persistent_status_message_id.txt",
+    "clear_channel_watermark": "clear_channel_watermark.txt"
+}
+
+class HistoryEntry:
+    """One command history record. Only the epoch timestamp is stored; it is rendered when displayed."""
+    __slots__ = ("created_at", "command", "user", "server")
+
+    def __init__(self, created_at, command, user, server):
+        self.created_at = created_at
+        self.command = command
+        self.user = user
+        self.server = server
+
+    def display_timestamp(self):
+        return datetime.datetime.fromtimestamp(self.created_at, TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M:%S %Z')
+
+    def display_line(self):
+        return f"- `{self.command}` by {self.user} at {self.display_timestamp()}"
+
+class ScheduledJob:
+    """
+    One scheduled action. run_at is an absolute epoch time, so a job keeps its timing across bot restarts.
+    Recurring jobs carry a cron expression and are moved to their next run after each one.
+    """
+    __slots__ = ("id", "kind", "server_name", "run_at", "cron", "created_by")
+
+    def __init__(self, job_id, kind, server_name, run_at, cron, created_by):
+        self.id = job_id
+        self.kind = kind
+        self.server_name = server_name
+        self.run_at = run_at
+        self.cron = cron
+        self.created_by = created_by
+
+    def describe(self):
+        target = f" {self.server_name}" if self.server_name else ""
+        when = datetime.datetime.fromtimestamp(self.run_at, TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M %Z')
+        repeat = f", repeats `{self.cron}`" if self.cron else ""
+        return f"`#{self.id}` **{self.kind}**{target} at {when}{repeat} (by {self.created_by})"
+
+class StateStore:
+    """
+    Durable bot state in a single SQLite database running in WAL mode.
+    Reads are served from memory. Writes are collected for a few milliseconds and committed as one
+    atomic transaction on a dedicated worker thread, so the event loop never waits on the disk.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS command_history ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL,"
+        " command TEXT NOT NULL, user TEXT NOT NULL, server TEXT NOT NULL DEFAULT '')",
+        "CREATE TABLE IF NOT EXISTS scheduled_jobs ("
+        " id INTEGER PRIMARY KEY, kind TEXT NOT NULL, server TEXT, run_at REAL NOT NULL, cron TEXT, created_by TEXT NOT NULL)"
+    )
+    # Created after migrations, so they always index the current table layout.
+    INDEXES = (
+        "CREATE INDEX IF NOT EXISTS command_history_by_server ON command_history (server, id)",
+        "CREATE INDEX IF NOT EXISTS command_history_by_user ON command_history (server, user COLLATE NOCASE, id)",
+        "CREATE INDEX IF NOT EXISTS command_history_by_command ON command_history (server, command COLLATE NOCASE, id)",
+        "CREATE INDEX IF NOT EXISTS command_history_by_time ON command_history (created_at)"
+    )
+    FLUSH_DELAY_SECONDS = 0.05 # Writes made within this window are committed together
+
+    def __init__(self, path):
+        self.path = path
+        self.loaded = False
+        # One worker thread owns the connection, which also serializes every database access.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self._conn = None
+        self._values = {}
+        self._pending_values = {}
+        self._pending_history = []
+        self._pending_jobs = {} # Job ID -> row to upsert, or None to delete
+        self._flush_task = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(command_history)")}
+            if "server" not in columns:
+                # Databases from before multi-server support; their rows are claimed by the first server on load.
+                self._conn.execute("ALTER TABLE command_history ADD COLUMN server TEXT NOT NULL DEFAULT ''")
+            if "timestamp" in columns:
+                # Older databases also stored every timestamp pre-rendered as text; rebuild the table without it.
+                self._conn.executescript(
+                    "BEGIN IMMEDIATE;"
+                    "CREATE TABLE command_history_compact ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL,"
+                    " command TEXT NOT NULL, user TEXT NOT NULL, server TEXT NOT NULL DEFAULT '');"
+                    "INSERT INTO command_history_compact (id, created_at, command, user, server)"
+                    " SELECT id, created_at, command, user, server FROM command_history;"
+                    "DROP TABLE command_history;"
+                    "ALTER TABLE command_history_compact RENAME TO command_history;"
+                    "COMMIT;"
+                )
+                logging.info("Compacted the command history table of %s.", self.path)
+            for statement in self.INDEXES:
+                self._conn.execute(statement)
+        return self._conn
+
+    def _write_sync(self, values, history, jobs):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            existing_message = await channel.fetch_message(message_id)
-        except discord.NotFound:
-            logging.warning(f"Message {message_id} for {message_id_attr} not found. Will send a new one.")
-            setattr(bot, message_id_attr, None) # Clear ID to ensure a new message is sent
-        except discord.Forbidden:
-            logging.error(f"Bot lacks permission to fetch/edit message {message_id} for {message_id_attr}. Will send a new one.")
-            setattr(bot, message_id_attr, None)
-        except Exception as e:
-            logging.error(f"Failed to fetch message for {message_id_attr}: {e}. Will send a new one.")
-            setattr(bot, message_id_attr, None)
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in values.items()]
+            )
+            conn.executemany(
+                "INSERT INTO command_history (created_at, command, user, server) VALUES (?, ?, ?, ?)",
+                [(entry.created_at, entry.command, entry.user, entry.server) for entry in history]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO scheduled_jobs (id, kind, server, run_at, cron, created_by) VALUES (?, ?, ?, ?, ?, ?)",
+                [row for row in jobs.values() if row is not None]
+            )
+            conn.executemany("DELETE FROM scheduled_jobs WHERE id = ?", [(job_id,) for job_id, row in jobs.items() if row is None])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_legacy_files(self, values):
+        migrated, migrated_files = {}, []
+        for key, file_path in LEGACY_STATE_FILES.items():
+            if not os.path.exists(file_path):
+                continue
+            migrated_files.append(file_path)
+            if key in values:
+                continue
+            with open(file_path, "r") as f:
+                value_str = f.read().strip()
+            try:
+                migrated[key] = int(value_str) if value_str else None
+            except ValueError:
+                logging.error("Invalid value stored in legacy state file %s. Skipping it.", file_path)
+        if migrated:
+            self._write_sync(migrated, [], {})
+            values.update(migrated)
+        for file_path in migrated_files:
+            os.remove(file_path)
+            logging.info("Migrated legacy state file %s into %s.", file_path, self.path)
+
+    def _load_sync(self):
+        conn = self._connect()
+        values = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM kv")}
+        self._migrate_legacy_files(values)
+        return values
+
+    async def load(self):
+        """Loads all stored values into memory."""
+        values = await asyncio.get_running_loop().run_in_executor(self._executor, self._load_sync)
+        # Values set before loading finished are newer than what was on disk.
+        self._values = {**values, **self._values}
+        self.loaded = True
+
+    def _history_page_sync(self, server_names, user, command, offset, limit):
+        conditions = [f"server IN ({', '.join('?' for _ in server_names)})"]
+        params = list(server_names)
+        if user is not None:
+            conditions.append("user = ? COLLATE NOCASE")
+            params.append(user)
+        if command is not None:
+            conditions.append("command = ? COLLATE NOCASE")
+            params.append(command)
+        where = " AND ".join(conditions)
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT created_at, command, user, server FROM command_history WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM command_history WHERE {where}", params).fetchone()[0]
+        return [HistoryEntry(*row) for row in rows], total
+
+    async def history_page(self, server_names, limit, offset=0, user=None, command=None):
+        """
+        Returns (entries, total): up to limit history entries of server_names, newest first, skipping the newest offset,
+        and the number of entries matching the filters. user and command filters are case-insensitive exact matches.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._history_page_sync, tuple(server_names), user, command, offset, limit
+        )
 
-    if existing_message:
+    async def recent_history(self, server_names, limit):
+        """Returns the newest limit history entries recorded for any of server_names, oldest first."""
+        entries, _ = await self.history_page(server_names, limit)
+        return entries[::-1]
+
+    def _load_jobs_sync(self):
+        rows = self._connect().execute("SELECT id, kind, server, run_at, cron, created_by FROM scheduled_jobs").fetchall()
+        return [ScheduledJob(*row) for row in rows]
+
+    async def load_jobs(self):
+        """Returns every persisted scheduled job."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._load_jobs_sync)
+
+    def _history_since_sync(self, server_names, since):
+        rows = self._connect().execute(
+            f"SELECT created_at, command, user, server FROM command_history"
+            f" WHERE created_at >= ? AND server IN ({', '.join('?' for _ in server_names)}) ORDER BY created_at",
+            (since, *server_names)
+        ).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    async def history_since(self, server_names, since):
+        """Returns every history entry of server_names created at or after the given epoch time, oldest first."""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._history_since_sync, tuple(server_names), since)
+
+    def _prune_history_sync(self, before):
+        return self._connect().execute("DELETE FROM command_history WHERE created_at < ?", (before,)).rowcount
+
+    async def prune_history(self, before):
+        """Deletes history entries created before the given epoch timestamp and returns how many were removed."""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._prune_history_sync, before)
+
+    def get(self, key, default=None):
+        value = self._values.get(key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        """Updates a value in memory and queues it to be written."""
+        if key in self._values and self._values[key] == value:
+            return
+        self._values[key] = value
+        self._pending_values[key] = value
+        self._schedule_flush()
+
+    def append_history(self, entry):
+        self._pending_history.append(entry)
+        self._schedule_flush()
+
+    def save_job(self, job):
+        self._pending_jobs[job.id] = (job.id, job.kind, job.server_name, job.run_at, job.cron, job.created_by)
+        self._schedule_flush()
+
+    def delete_job(self, job_id):
+        self._pending_jobs[job_id] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No event loop yet; close() writes whatever is still pending
+        self._flush_task = loop.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(self.FLUSH_DELAY_SECONDS)
+        await self.flush()
+
+    def _take_pending(self):
+        values, history, jobs = self._pending_values, self._pending_history, self._pending_jobs
+        self._pending_values, self._pending_history, self._pending_jobs = {}, [], {}
+        return values, history, jobs
+
+    async def flush(self):
+        """Commits every pending write in one transaction."""
+        if not self._pending_values and not self._pending_history and not self._pending_jobs:
+            return
+        values, history, jobs = self._take_pending()
         try:
-            await existing_message.edit(content=content, view=view)
-            logging.debug(f"Edited existing message {message_id} for {message_id_attr}.")
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write_sync, values, history, jobs)
         except Exception as e:
-            logging.error(f"Failed to edit existing message {message_id} for {message_id_attr}: {e}. Attempting to send a new one.")
-            setattr(bot, message_id_attr, None) # Clear ID to force new message
-            # Fall through to send a new message
-            try:
-                new_message = await channel.send(content=content, view=view)
-                setattr(bot, message_id_attr, new_message.id)
-                with open(file_path, "w") as f:
-                    f.write(str(new_message.id))
-                logging.debug(f"Sent new message and saved ID for {message_id_attr}: {new_message.id}.")
-            except Exception as send_e:
-                logging.error(f"Failed to send new message for {message_id_attr} after edit failure: {send_e}")
-    else: # If no existing_message or ID was cleared
-        try:
-            new_message = await channel.send(content=content, view=view)
-            setattr(bot, message_id_attr, new_message.id)
-            with open(file_path, "w") as f:
-                f.write(str(new_message.id))
-            logging.debug(f"Sent new message and saved ID for {message_id_attr}: {new_message.id}.")
+            logging.error("Failed to write bot state to %s: %s", self.path, e)
+            # Keep the writes so the next flush retries them, without overwriting newer values.
+            self._pending_values = {**values, **self._pending_values}
+            self._pending_history = history + self._pending_history
+            self._pending_jobs = {**jobs, **self._pending_jobs}
+
+    def close(self):
+        """Writes anything still pending and closes the database. Called at interpreter exit."""
+        # Let a flush that is still running on the worker thread finish first, so the connection is never used by
+        # two threads at once. New work can no longer be submitted to the executor at interpreter exit.
+        self._executor.shutdown(wait=True)
+        values, history, jobs = self._take_pending()
+        try:
+            if values or history or jobs:
+                self._write_sync(values, history, jobs)
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
         except Exception as e:
-            logging.error(f"Failed to send new persistent message for {message_id_attr}: {e}")
+            logging.error("Failed to write bot state to %s on exit: %s", self.path, e)
 
+bot.state_store = StateStore(STATE_DB_FILE)
+atexit.register(bot.state_store.close)
 
-async def start_game_server_func(interaction_or_ctx):
-    server_running_status = await bot.check_server_process()
-    
-    response_target = interaction_or_ctx.followup if isinstance(interaction_or_ctx, discord.Interaction) else interaction_or_ctx
-    channel_for_update = interaction_or_ctx.channel if isinstance(interaction_or_ctx, (discord.Interaction, commands.Context)) else interaction_or_ctx
+def set_server_timing(server, start_time, shutdown_deadline):
+    """Updates a server's start time and automated shutdown deadline, in memory and in the state store."""
+    server.start_time = start_time
+    server.shutdown_deadline = shutdown_deadline
+    bot.state_store.set(server.state_key("server_start_time"), start_time.timestamp() if start_time else None)
+    bot.state_store.set(server.state_key("shutdown_deadline"), shutdown_deadline.timestamp() if shutdown_deadline else None)
 
-    if server_running_status:
-        bot.server_start_time = datetime.datetime.now(TARGET_TIMEZONE)
-        if bot.shutdown_task and not bot.shutdown_task.done():
-            bot.shutdown_task.cancel()
-            logging.info("Existing shutdown task cancelled as server is already running (timer reset).")
-        bot.shutdown_task = bot.loop.create_task(bot.schedule_shutdown(channel_for_update))
-        logging.info(f"Shutdown timer reset for {SHUTDOWN_DELAY_HOURS} hours.")
-        await response_target.send("The server was already running. Shutdown timer has been reset!", ephemeral=True)
-        await bot.update_server_status_message(channel_for_update)
-        return
+# History records what people did. Commands are recorded as they run, except for start and stop requests, which only
+# count once the operation went through; a superseded or failed request is not recorded, wherever it came from.
+OPERATION_COMMANDS = ("startserver", "stopserver")
 
-    try:
-        subprocess.Popen(GAME_SERVER_START_COMMAND, shell=True, creationflags=subprocess.CREATE_NO_WINDOW)
-        await asyncio.sleep(2)
-        server_running_status = await bot.check_server_process()
-        
-        if server_running_status:
-            bot.server_start_time = datetime.datetime.now(TARGET_TIMEZONE)
-            await response_target.send("Game server started successfully!", ephemeral=True)
-            if bot.shutdown_task and not bot.shutdown_task.done():
-                bot.shutdown_task.cancel()
-                logging.info("Existing shutdown task cancelled as server is starting.")
-            bot.shutdown_task = bot.loop.create_task(bot.schedule_shutdown(channel_for_update))
-            logging.info(f"New shutdown task scheduled for {SHUTDOWN_DELAY_HOURS} hours.")
-        else:
-            await response_target.send("Failed to confirm server started. Please check server logs manually.", ephemeral=True)
+def add_command_history_entry(server, command, user):
+    """Appends an entry to a server's command history and persists it."""
+    entry = HistoryEntry(time.time(), command, user, server.name)
+    server.command_history.append(entry)
+    bot.state_store.append_history(entry)
+    return entry
 
-        await bot.update_server_status_message(channel_for_update)
+# --- Process Probe Backends ---
 
-    except Exception as e:
-        logging.error(f"ERROR in start_game_server: {e}")
-        await response_target.send(f"Error starting game server: {e}", ephemeral=True)
+class ProcessProbe(abc.ABC):
+    """Base class for the backends that look up the game server process."""
+    name = "base"
 
-async def stop_game_server_func(interaction_or_ctx):
-    server_running_status = await bot.check_server_process()
+    @abc.abstractmethod
+    async def find_pids(self, process_names):
+        """
+        Returns {lowercased name: [PIDs]} for every running process whose image name is in process_names.
+        All names are resolved with a single pass over the process table.
+        """
 
-    if not server_running_status:
-        response_target = interaction_or_ctx.followup if isinstance(interaction_or_ctx, discord.Interaction) else interaction_or_ctx
-        await response_target.send("The server is not running.", ephemeral=True)
-        await bot.update_server_status_message(interaction_or_ctx.channel if isinstance(interaction_or_ctx, (discord.Interaction, commands.Context)) else interaction_or_ctx)
-        return
+    @abc.abstractmethod
+    def is_pid_alive(self, pid, process_name):
+        """Cheaply checks that a single known PID is still running as process_name."""
 
-    try:
-        subprocess.run(GAME_SERVER_STOP_COMMAND, shell=True, check=True, creationflags=subprocess.CREATE_NO_WINDOW)
-        await asyncio.sleep(2)
-        server_running_status = await bot.check_server_process()
-        
-        response_target = interaction_or_ctx.followup if isinstance(interaction_or_ctx, discord.Interaction) else interaction_or_ctx
-        channel_for_update = interaction_or_ctx.channel if isinstance(interaction_or_ctx, (discord.Interaction, commands.Context)) else interaction_or_ctx
 
-        if not server_running_status:
-            bot.server_start_time = None
-            await response_target.send("Game server stopped successfully!", ephemeral=True)
+class ProcfsProcessProbe(ProcessProbe):
+    """Linux backend that reads /proc directly instead of spawning a process lister."""
+    name = "procfs"
+    COMM_MAX_LEN = 15 # The kernel truncates /proc/<pid>/stat's comm field to 15 characters
+
+    @classmethod
+    def _match(cls, pid, targets):
+        """Returns which of the lowercased target names the process is running as, or None."""
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # Format is "pid (comm) state ...", and comm itself may contain spaces or parentheses.
+        open_paren, close_paren = stat.find(b"("), stat.rfind(b")")
+        comm = stat[open_paren + 1:close_paren].decode(errors="replace").lower()
+        state = stat[close_paren + 2:close_paren + 3]
+        if state in (b"Z", b"X"):
+            return None
+
+        if comm in targets:
+            return comm
+        truncated = [target for target in targets if len(target) > cls.COMM_MAX_LEN and comm == target[:cls.COMM_MAX_LEN]]
+        if not truncated:
+            return None
+        # comm was truncated, so confirm against argv[0] (this also covers Wine-hosted .exe servers).
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv0 = f.read().split(b"\0", 1)[0].decode(errors="replace")
+        except OSError:
+            return None
+        argv0_name = ntpath.basename(argv0).lower()
+        return argv0_name if argv0_name in truncated else None
+
+    def _scan(self, targets):
+        pids = {target: [] for target in targets}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                matched = self._match(entry, targets)
+                if matched:
+                    pids[matched].append(int(entry))
+        return pids
+
+    async def find_pids(self, process_names):
+        targets = {name.lower() for name in process_names}
+        return await asyncio.get_running_loop().run_in_executor(None, self._scan, targets)
+
+    def is_pid_alive(self, pid, process_name):
+        return self._match(pid, {process_name.lower()}) is not None
+
+
+class TasklistProcessProbe(ProcessProbe):
+    """Windows backend that runs tasklist without blocking the event loop."""
+    name = "tasklist"
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+
+    def __init__(self):
+        import ctypes
+        self._ctypes = ctypes
+        self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    @staticmethod
+    def _tasklist_args(targets):
+        # A single image name can be filtered by tasklist itself; several names need the full list.
+        if len(targets) == 1:
+            return ['tasklist', '/FI', f'IMAGENAME eq {next(iter(targets))}', '/NH', '/FO', 'CSV']
+        return ['tasklist', '/NH', '/FO', 'CSV']
+
+    @staticmethod
+    def _parse(output, targets):
+        pids = {target: [] for target in targets}
+        for row in csv.reader(output.splitlines()):
+            if len(row) >= 2 and row[0].lower() in pids:
+                try:
+                    pids[row[0].lower()].append(int(row[1]))
+                except ValueError:
+                    continue
+        return pids
+
+    async def find_pids(self, process_names):
+        targets = {name.lower() for name in process_names}
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._tasklist_args(targets),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                creationflags=_NO_WINDOW_FLAGS
+            )
+            stdout, _ = await proc.communicate()
+            output = stdout.decode(errors="replace")
+        except NotImplementedError:
+            # The selector event loop cannot spawn subprocesses on Windows, so fall back to a worker thread.
+            result = await asyncio.get_running_loop().run_in_executor(None, lambda: subprocess.run(
+                self._tasklist_args(targets), capture_output=True, text=True, check=False, creationflags=_NO_WINDOW_FLAGS
+            ))
+            output = result.stdout
+        return self._parse(output, targets)
+
+    def is_pid_alive(self, pid, process_name):
+        ctypes = self._ctypes
+        handle = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            if not self._kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)) or exit_code.value != self.STILL_ACTIVE:
+                return False
+            buffer = ctypes.create_unicode_buffer(1024)
+            size = ctypes.c_ulong(len(buffer))
+            if not self._kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                return False
+            return ntpath.basename(buffer.value).lower() == process_name.lower()
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+
+class PsProcessProbe(ProcessProbe):
+    """Fallback backend for POSIX systems without /proc (e.g. macOS)."""
+    name = "ps"
+
+    async def _list(self, *args):
+        proc = await asyncio.create_subprocess_exec(
+            'ps', *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await proc.communicate()
+        rows = []
+        for line in stdout.decode(errors="replace").splitlines():
+            pid, _, command = line.strip().partition(" ")
+            if pid.isdigit():
+                rows.append((int(pid), os.path.basename(command.strip())))
+        return rows
+
+    async def find_pids(self, process_names):
+        pids = {name.lower(): [] for name in process_names}
+        for pid, comm in await self._list('-axo', 'pid=,comm='):
+            if comm.lower() in pids:
+                pids[comm.lower()].append(pid)
+        return pids
+
+    def is_pid_alive(self, pid, process_name):
+        # Without /proc there is no cheap way to verify the image name, so only the fast liveness check is done here.
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+
+def select_process_probe(backend=PROCESS_PROBE_BACKEND):
+    """Builds the process probe backend named by PROCESS_PROBE_BACKEND."""
+    if backend == "auto":
+        if sys.platform == "win32":
+            backend = "tasklist"
+        elif os.path.isdir("/proc/self"):
+            backend = "procfs"
         else:
-            await response_target.send("Failed to confirm server stopped. Please check server manually.", ephemeral=True)
+            backend = "ps"
+    backends = {cls.name: cls for cls in (ProcfsProcessProbe, TasklistProcessProbe, PsProcessProbe)}
+    if backend not in backends:
+        raise ValueError(f"Unknown PROCESS_PROBE_BACKEND '{backend}'. Expected one of: auto, {', '.join(backends)}.")
+    logging.info("Using '%s' process probe backend.", backend)
+    return backends[backend]()
 
-        await bot.update_server_status_message(channel_for_update)
+bot.process_probe = select_process_probe()
 
-        if bot.shutdown_task and not bot.shutdown_task.done():
-            bot.shutdown_task.cancel()
-            logging.info("Automated shutdown task cancelled as server was manually stopped.")
-        bot.shutdown_task = None
+# --- Helper Functions (attached to bot in on_ready for better scope) ---
+
+async def check_server_process_func():
+    """Checks which game server processes are running. Returns {server name: running} for every server."""
+    running = {}
+    unresolved = []
+    for server in bot.game_servers.values():
+        # An owned process needs no probing at all; its exit is awaited by the supervisor.
+        if server.supervisor is not None and server.supervisor.is_running:
+            running[server.name] = True
+            continue
+        # Fast path: re-check the single PID we saw last time instead of listing every process.
+        try:
+            if server.pid and bot.process_probe.is_pid_alive(server.pid, server.process_name):
+                running[server.name] = True
+                continue
+        except Exception as e:
+            logging.error("ERROR checking PID %s of %s: %s", server.pid, server.name, e)
+        unresolved.append(server)
+
+    if unresolved:
+        # One scan of the process table resolves every remaining server.
+        try:
+            scan_started = time.perf_counter()
+            pids_by_name = await bot.process_probe.find_pids({server.process_name for server in unresolved})
+            bot.metrics.observe("process_probe_seconds", time.perf_counter() - scan_started, {"backend": bot.process_probe.name})
+        except Exception as e:
+            logging.error("ERROR in check_server_process: %s", e)
+            pids_by_name = {}
+        for server in unresolved:
+            pids = pids_by_name.get(server.process_name.lower(), [])
+            server.pid = pids[0] if pids else None
+            running[server.name] = bool(pids)
+    return running
 
-    except Exception as e:
-        logging.error(f"ERROR in stop_game_server: {e}")
-        await response_target.send(f"Error stopping game server: {e}", ephemeral=True)
 
-async def schedule_shutdown_func(channel):
+class ServerStateCache:
     """
-    Schedules an automated shutdown of the game server after SHUTDOWN_DELAY_HOURS.
+    Shares the result of one process probe (covering every server) between all callers for a short TTL.
+    Concurrent callers that miss the cache await the same in-flight probe instead of starting their own.
     """
-    try:
-        logging.info(f"Automated shutdown scheduled for {SHUTDOWN_DELAY_HOURS} hours from now.")
-        await asyncio.sleep(SHUTDOWN_DELAY_HOURS * 3600)
-
-        if await bot.check_server_process():
-            bot.command_history_list.append({
-                'command': 'Automated Shutdown',
-                'user': 'System',
-                'timestamp': datetime.datetime.now(TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M:%S %Z')
-            })
-            await bot.update_command_history_message(channel)
-            await bot.stop_game_server(channel)
+    def __init__(self, probe_func, ttl_seconds):
+        self._probe_func = probe_func
+        self.ttl_seconds = ttl_seconds
+        self._value = {}
+        self._checked_at = None
+        self._inflight = None
+        self._generation = 0 # Bumped by invalidate() so results of detached probes are discarded
+
+    def _is_fresh(self):
+        return self._checked_at is not None and asyncio.get_running_loop().time() - self._checked_at < self.ttl_seconds
+
+    async def get_all(self, force=False):
+        """Returns {server name: running}. force=True skips the cached value but still joins an in-flight probe."""
+        if not force and self._is_fresh():
+            return self._value
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        # Shield the shared probe so one cancelled caller does not cancel it for everyone else.
+        return await asyncio.shield(self._inflight)
+
+    async def get(self, server, force=False):
+        """Returns whether the given server is running."""
+        return (await self.get_all(force)).get(server.name, False)
+
+    async def _refresh(self):
+        generation = self._generation
+        try:
+            value = await self._probe_func()
+        finally:
+            if generation == self._generation:
+                self._inflight = None
+        # Only publish the result if invalidate() was not called while this probe was running.
+        if generation == self._generation:
+            self._value = value
+            self._checked_at = asyncio.get_running_loop().time()
+        return value
+
+    def invalidate(self):
+        """Drops the cached state and detaches any in-flight probe, e.g. after starting or stopping the server."""
+        self._generation += 1
+        self._checked_at = None
+        self._inflight = None
+
+bot.server_state = ServerStateCache(check_server_process_func, SERVER_STATE_CACHE_TTL_SECONDS)
+
+# --- Process Resource Sampling ---
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+class ResourceHistory:
+    """
+    Fixed-size ring buffer of resource samples. Every metric lives in its own preallocated array of doubles,
+    so recording a sample costs a handful of stores and memory use never grows.
+    """
+    METRICS = ("cpu_percent", "rss_bytes", "threads", "read_bytes_per_second", "write_bytes_per_second")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self._columns = {metric: array("d", bytes(8 * capacity)) for metric in self.METRICS}
+        self._next = 0
+        self.count = 0
+
+    def append(self, timestamp, cpu_percent, rss_bytes, threads, read_bytes_per_second, write_bytes_per_second):
+        index = self._next
+        self.timestamps[index] = timestamp
+        for metric, value in zip(self.METRICS, (cpu_percent, rss_bytes, threads, read_bytes_per_second, write_bytes_per_second)):
+            self._columns[metric][index] = value
+        self._next = (index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _indexes(self, since=None):
+        start = (self._next - self.count) % self.capacity
+        indexes = [(start + offset) % self.capacity for offset in range(self.count)]
+        if since is not None:
+            indexes = [index for index in indexes if self.timestamps[index] >= since]
+        return indexes
+
+    def values(self, metric, since=None):
+        """Returns the recorded values of a metric, oldest first. NaN marks values that could not be read."""
+        column = self._columns[metric]
+        return [column[index] for index in self._indexes(since)]
+
+    def latest(self):
+        """Returns (timestamp, {metric: value}) of the newest sample, or None."""
+        if not self.count:
+            return None
+        index = (self._next - 1) % self.capacity
+        return self.timestamps[index], {metric: column[index] for metric, column in self._columns.items()}
+
+    def clear(self):
+        self._next = 0
+        self.count = 0
+
+
+class ProcessResourceSampler:
+    """
+    Reads CPU time, RSS, thread count and I/O counters of one process from /proc/<pid>.
+    CPU and I/O are reported as rates between two consecutive samples of the same process.
+    """
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self):
+        self._previous = None # (pid, process start time, monotonic time, cpu ticks, read bytes, write bytes)
+
+    def reset(self):
+        self._previous = None
+
+    @staticmethod
+    def _read_io(pid):
+        counters = {}
+        try:
+            with open(f"/proc/{pid}/io", "rb") as f:
+                for line in f:
+                    key, _, value = line.partition(b":")
+                    counters[key] = int(value)
+        except (OSError, ValueError):
+            return math.nan, math.nan # /proc/<pid>/io is only readable by the process owner
+        return counters.get(b"read_bytes", math.nan), counters.get(b"write_bytes", math.nan)
+
+    def sample(self, pid):
+        """Returns (timestamp, cpu %, RSS bytes, threads, read B/s, write B/s), or None for the first sample of a process."""
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            self._previous = None
+            return None
+        now = time.monotonic()
+        # Fields after "(comm) ": state is field 3, utime/stime 14/15, num_threads 20, starttime 22 and rss 24.
+        fields = stat[stat.rfind(b")") + 2:].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])
+        threads = int(fields[17])
+        process_started = int(fields[19])
+        rss_bytes = int(fields[21]) * self.PAGE_SIZE
+        read_bytes, write_bytes = self._read_io(pid)
+
+        previous, self._previous = self._previous, (pid, process_started, now, cpu_ticks, read_bytes, write_bytes)
+        if previous is None or previous[:2] != (pid, process_started):
+            return None # New process (or a reused PID): rates need a second sample
+        elapsed = now - previous[2]
+        if elapsed <= 0:
+            return None
+        cpu_percent = (cpu_ticks - previous[3]) / self.CLOCK_TICKS / elapsed * 100
+        return (
+            time.time(),
+            cpu_percent,
+            rss_bytes,
+            threads,
+            (read_bytes - previous[4]) / elapsed,
+            (write_bytes - previous[5]) / elapsed
+        )
+
+
+def sparkline(values, width):
+    """Renders values as a row of block characters scaled from zero, taking the maximum of each of width buckets."""
+    values = [value for value in values if not math.isnan(value)]
+    if not values:
+        return ""
+    bucket_size = max(1, math.ceil(len(values) / width))
+    buckets = [max(values[i:i + bucket_size]) for i in range(0, len(values), bucket_size)]
+    low, high = min(0, min(buckets)), max(buckets)
+    if high - low < 1e-9:
+        return SPARKLINE_BLOCKS[0] * len(buckets)
+    return "".join(SPARKLINE_BLOCKS[int((value - low) / (high - low) * (len(SPARKLINE_BLOCKS) - 1))] for value in buckets)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+def format_bytes(byte_count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(byte_count) < 1024 or unit == "GB":
+            return f"{byte_count:.0f} {unit}" if unit == "B" else f"{byte_count:.1f} {unit}"
+        byte_count /= 1024
+
+RESOURCE_SAMPLING_SUPPORTED = sys.platform.startswith("linux") and RESOURCE_SAMPLE_INTERVAL_SECONDS > 0
+
+@tasks.loop(seconds=max(RESOURCE_SAMPLE_INTERVAL_SECONDS, 1))
+async def resource_sample_loop():
+    # Servers without a known PID are skipped; the status checks fill it in whenever the process is found.
+    for server in bot.game_servers.values():
+        if server.pid is None:
+            server.resource_sampler.reset()
+            continue
+        try:
+            sample = server.resource_sampler.sample(server.pid)
+        except Exception as e:
+            logging.error("Failed to sample resources of %s (PID %s): %s", server.name, server.pid, e)
+            continue
+        if sample:
+            server.resources.append(*sample)
+
+def resource_status_lines(server):
+    """Current usage and a sparkline of the recent CPU history, for the panel."""
+    latest = server.resources.latest()
+    if latest is None or time.time() - latest[0] > RESOURCE_SAMPLE_INTERVAL_SECONDS * 3:
+        return []
+    _, current = latest
+    lines = [f"📈 **CPU:** {current['cpu_percent']:.0f}% · **RAM:** {format_bytes(current['rss_bytes'])} · **Threads:** {current['threads']:.0f}"]
+    cpu_history = sparkline(server.resources.values("cpu_percent", since=time.time() - RESOURCE_HISTORY_SECONDS), RESOURCE_SPARKLINE_WIDTH)
+    if cpu_history:
+        lines.append(f"📉 **CPU ({RESOURCE_HISTORY_SECONDS // 60}m):** `{cpu_history}`")
+    return lines
+
+
+def scheduled_status_lines(server):
+    """The next scheduled start, stop or restart of a server, for the panel."""
+    next_job = next((job for job in bot.scheduler.upcoming([server.name]) if job.server_name == server.name and job.kind != "shutdown"), None)
+    if next_job is None:
+        return []
+    when = datetime.datetime.fromtimestamp(next_job.run_at, TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M %Z')
+    return [f"📅 **Next Scheduled:** {next_job.kind.capitalize()} at {when} (`#{next_job.id}`)"]
+
+
+async def collect_panel_state(server):
+    """
+    Reads everything a server's panel shows at one moment: one process check, one player count, and copies of
+    the status lines and recent history. The embed is rendered from this snapshot, so its sections never disagree.
+    """
+    running = await bot.check_server_process(server)
+    state = {
+        "running": running,
+        "start_time": server.start_time,
+        "shutdown_deadline": server.shutdown_deadline,
+        "last_ready_seconds": server.last_ready_seconds,
+        "players_queried": running and server.player_count is not None,
+        "players": None, # (online, max) from the player count query, None when it got no answer
+        "idle_shutdown_at": None,
+        "detail_lines": server.operations.status_lines() + scheduled_status_lines(server),
+        "resource_lines": resource_status_lines(server) if running else [],
+        "history": list(server.command_history)
+    }
+    if server.snapshots is not None:
+        state["detail_lines"].extend(server.snapshots.status_lines())
+    if state["players_queried"]:
+        state["players"] = await server.player_count.get()
+        if server.idle_since is not None and server.idle_shutdown_minutes:
+            idle_seconds_left = max(0, server.idle_shutdown_minutes * 60 - (time.monotonic() - server.idle_since))
+            # Rounded to the minute so the rendered embed, and with it the edit digest, stays the same between ticks.
+            state["idle_shutdown_at"] = int((time.time() + idle_seconds_left) // 60 * 60)
+    return state
+
+EMBED_FIELD_MAX_CHARS = 1024
+
+def _embed_field_value(lines):
+    value = "\n".join(lines)
+    return value if len(value) <= EMBED_FIELD_MAX_CHARS else value[:EMBED_FIELD_MAX_CHARS - 1] + "…"
+
+def build_panel_embed(server, state):
+    """
+    Renders a server's panel from a collect_panel_state snapshot. Times use Discord timestamps, which every
+    viewer sees in their own time zone and which count down by themselves, so the panel needs no edit to stay current.
+    """
+    running = state["running"]
+    embed = discord.Embed(title=server.display_name, colour=discord.Colour.green() if running else discord.Colour.red())
+    embed.add_field(name="Status", value="🟢 Running" if running else "🔴 Stopped")
+    if running:
+        if state["start_time"]:
+            start_time = state["start_time"]
+            if start_time.tzinfo is None:
+                start_time = TARGET_TIMEZONE.localize(start_time)
+            shutdown_time = state["shutdown_deadline"] or start_time + datetime.timedelta(hours=server.shutdown_delay_hours)
+            shutdown_timestamp = int(shutdown_time.timestamp())
+            embed.add_field(name="Started At", value=f"<t:{int(start_time.timestamp())}:f>")
+            embed.add_field(name="Auto-Shutdown", value=f"<t:{shutdown_timestamp}:f> (<t:{shutdown_timestamp}:R>)")
         else:
-            logging.info("Automated shutdown skipped: Server was already stopped.")
-    except asyncio.CancelledError:
-        logging.info("Automated shutdown task was cancelled.")
-    except Exception as e:
-        logging.error(f"Error in automated shutdown task: {e}")
+            embed.add_field(name="Started At", value="Unknown (Bot may have restarted)")
+            embed.add_field(name="Auto-Shutdown", value="Unknown")
+        if state["players_queried"]:
+            players = state["players"]
+            embed.add_field(name="Players", value=f"{players[0]}/{players[1]}" if players else "Unknown (no answer to query)")
+        if state["idle_shutdown_at"] is not None:
+            embed.add_field(name="Idle Shutdown", value=f"<t:{state['idle_shutdown_at']}:R> (no players)")
+        if state["last_ready_seconds"] is not None:
+            embed.add_field(name="Ready In", value=f"{state['last_ready_seconds']:.1f}s")
+    if state["detail_lines"]:
+        embed.add_field(name="Details", value=_embed_field_value(state["detail_lines"]), inline=False)
+    if state["resource_lines"]:
+        embed.add_field(name="Resources", value=_embed_field_value(state["resource_lines"]), inline=False)
+    history_lines = [entry.display_line() for entry in state["history"]] or ["No activity yet."]
+    embed.add_field(name="Recent Activity", value=_embed_field_value(history_lines), inline=False)
+    embed.set_footer(text="Use the buttons below to control the server, or !serverhelp for advanced commands.")
+    return embed
+
+def _persistent_message_digest(content, embed, view):
+    view_key = tuple(getattr(item, "custom_id", None) for item in view.children) if view else ()
+    embed_key = sorted(embed.to_dict().items()) if embed else None
+    return hashlib.sha1(repr((content, embed_key, view_key)).encode()).hexdigest()
+
+async def update_persistent_message(channel, server, message_id_attr, content=None, embed=None, view=None):
+    """
+    Generic function to update or send one of a server's persistent messages.
+    Edits go straight to the cached message object and are skipped entirely when the rendered message is unchanged.
+    """
+    message_id = getattr(server, message_id_attr)
+    cache_key = (server.name, message_id_attr)
+    digest = _persistent_message_digest(content, embed, view)
+
+    if message_id and bot.persistent_message_hashes.get(cache_key) == digest:
+        logging.debug("Content for %s %s unchanged. Skipping edit of message %s.", server.name, message_id_attr, message_id)
+        return
+
+    if message_id:
+        existing_message = bot.persistent_messages.get(cache_key)
+        if existing_message is None or existing_message.id != message_id:
+            # A PartialMessage can be edited without a fetch_message round trip.
+            existing_message = channel.get_partial_message(message_id)
+        try:
+            edited_message = await existing_message.edit(content=content, embed=embed, view=view)
+            bot.persistent_messages[cache_key] = edited_message or existing_message
+            bot.persistent_message_hashes[cache_key] = digest
+            logging.debug("Edited existing message %s for %s.", message_id, message_id_attr)
+            return
+        except discord.NotFound:
+            logging.warning("Message %s for %s not found. Will send a new one.", message_id, message_id_attr)
+        except discord.Forbidden:
+            logging.error("Bot lacks permission to edit message %s for %s. Will send a new one.", message_id, message_id_attr)
+        except Exception as e:
+            logging.error("Failed to edit existing message %s for %s: %s. Attempting to send a new one.", message_id, message_id_attr, e)
+        # Clear the ID and cached object to force a new message
+        setattr(server, message_id_attr, None)
+        bot.state_store.set(server.state_key(message_id_attr), None)
+        bot.persistent_messages.pop(cache_key, None)
+        bot.persistent_message_hashes.pop(cache_key, None)
+
+    try:
+        new_message = await channel.send(content=content, embed=embed, view=view)
+        setattr(server, message_id_attr, new_message.id)
+        bot.persistent_messages[cache_key] = new_message
+        bot.persistent_message_hashes[cache_key] = digest
+        bot.state_store.set(server.state_key(message_id_attr), new_message.id)
+        logging.debug("Sent new message and saved ID for %s: %s.", message_id_attr, new_message.id)
+    except Exception as e:
+        logging.error("Failed to send new persistent message for %s: %s", message_id_attr, e)
+
+
+# --- Readiness and Termination Probes ---
+class ServerProbe(abc.ABC):
+    """A single condition polled while waiting for the server to become ready or to stop."""
+    description = "probe"
+
+    def __init__(self, expect=True):
+        self.expect = expect
+
+    def arm(self):
+        """Called right before the start/stop action so probes can snapshot the current state."""
+
+    @abc.abstractmethod
+    async def check(self):
+        """Returns the observed state, which matches() compares with expect."""
+
+    async def matches(self):
+        try:
+            return await self.check() == self.expect
+        except Exception as e:
+            logging.debug("%s probe failed: %s", self.description, e)
+            return False
+
+
+class ProcessServerProbe(ServerProbe):
+    def __init__(self, server, expect=True):
+        super().__init__(expect)
+        self.server = server
+        self.description = f"process {server.process_name}"
+
+    async def check(self):
+        return await bot.check_server_process(self.server, force=True)
+
+
+class TcpPortServerProbe(ServerProbe):
+    CONNECT_TIMEOUT_SECONDS = 1
+
+    def __init__(self, host, port, expect=True):
+        super().__init__(expect)
+        self.host, self.port = host, port
+        self.description = f"tcp {host}:{port}"
+
+    async def check(self):
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.CONNECT_TIMEOUT_SECONDS)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+
+class UdpPortServerProbe(ServerProbe):
+    REPLY_TIMEOUT_SECONDS = 1
+
+    def __init__(self, host, port, payload=b"\x00", expect=True):
+        super().__init__(expect)
+        self.host, self.port, self.payload = host, port, payload
+        self.description = f"udp {host}:{port}"
+
+    async def check(self):
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+
+        class ReplyProtocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                if not reply.done():
+                    reply.set_result(True)
+
+            def error_received(self, exc):
+                if not reply.done():
+                    reply.set_result(False) # e.g. ICMP port unreachable
+
+        transport, _ = await loop.create_datagram_endpoint(ReplyProtocol, remote_addr=(self.host, self.port))
+        try:
+            transport.sendto(self.payload)
+            return await asyncio.wait_for(reply, self.REPLY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            transport.close()
+
+
+class LogPatternServerProbe(ServerProbe):
+    """Matches a regex against log output written after arm() was called."""
+    def __init__(self, path, pattern, expect=True):
+        super().__init__(expect)
+        self.path = path
+        self.pattern = re.compile(pattern.encode() if isinstance(pattern, str) else pattern)
+        self.description = f"log {os.path.basename(path)}"
+        self._offset = 0
+        self._carry = b""
+        self._matched = False
+
+    def arm(self):
+        try:
+            self._offset = os.path.getsize(self.path)
+        except OSError:
+            self._offset = 0
+        self._carry = b""
+        self._matched = False
+
+    def _read_new_output(self):
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < self._offset:
+                self._offset = 0 # The log was rotated or truncated
+            f.seek(self._offset)
+            data = f.read()
+            self._offset = f.tell()
+        return data
+
+    async def check(self):
+        if self._matched:
+            return True
+        data = await asyncio.get_running_loop().run_in_executor(None, self._read_new_output)
+        # Keep the last partial line so a match split across two reads is still found.
+        buffer = self._carry + data
+        self._matched = self.pattern.search(buffer) is not None
+        self._carry = buffer[buffer.rfind(b"\n") + 1:]
+        return self._matched
+
+
+def build_server_probes(server, specs):
+    """Turns a server's ready_probes/stopped_probes dicts into probe objects."""
+    probe_classes = {
+        "process": ProcessServerProbe,
+        "tcp": TcpPortServerProbe,
+        "udp": UdpPortServerProbe,
+        "log": LogPatternServerProbe
+    }
+    probes = []
+    for spec in specs:
+        spec = dict(spec)
+        probe_type = spec.pop("type")
+        if probe_type not in probe_classes:
+            raise ValueError(f"Unknown server probe type '{probe_type}'. Expected one of: {', '.join(probe_classes)}.")
+        if probe_type == "process":
+            spec["server"] = server
+        probes.append(probe_classes[probe_type](**spec))
+    return probes
+
+async def wait_for_server_probes(probes, timeout_seconds):
+    """
+    Polls the probes with exponential backoff until all of them match or the timeout expires.
+    Returns (success, elapsed_seconds).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + timeout_seconds
+    interval = SERVER_PROBE_INITIAL_INTERVAL_SECONDS
+    while True:
+        await asyncio.sleep(min(interval, max(0, deadline - loop.time())))
+        results = await asyncio.gather(*(probe.matches() for probe in probes))
+        if all(results):
+            return True, loop.time() - started
+        if loop.time() >= deadline:
+            pending = ", ".join(probe.description for probe, ok in zip(probes, results) if not ok)
+            logging.warning("Server probes still failing after %ss: %s", timeout_seconds, pending)
+            return False, loop.time() - started
+        interval = min(interval * 2, SERVER_PROBE_MAX_INTERVAL_SECONDS)
+
+
+# --- Player Count Queries ---
+class PlayerCountQuery(abc.ABC):
+    """Asks a running game server how many players are online."""
+    TIMEOUT_SECONDS = PLAYER_QUERY_TIMEOUT_SECONDS
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+
+    @abc.abstractmethod
+    async def query(self):
+        """Returns (players, max_players)."""
+
+
+class A2SPlayerQuery(PlayerCountQuery):
+    """Source engine A2S_INFO query over UDP (Valve games, Valheim, ARK, Rust and most Steam dedicated servers)."""
+    REQUEST = b"\xff\xff\xff\xffTSource Engine Query\x00"
+
+    async def _exchange(self, transport, replies, payload):
+        transport.sendto(payload)
+        return await asyncio.wait_for(replies.get(), self.TIMEOUT_SECONDS)
+
+    async def query(self):
+        loop = asyncio.get_running_loop()
+        replies = asyncio.Queue()
+
+        class ReplyProtocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                replies.put_nowait(data)
+
+        transport, _ = await loop.create_datagram_endpoint(ReplyProtocol, remote_addr=(self.host, self.port))
+        try:
+            reply = await self._exchange(transport, replies, self.REQUEST)
+            if reply[4:5] == b"A":
+                # Newer servers answer with a challenge that has to be echoed back with the request.
+                reply = await self._exchange(transport, replies, self.REQUEST + reply[5:9])
+        finally:
+            transport.close()
+        if reply[:5] != b"\xff\xff\xff\xffI":
+            raise ValueError(f"Unexpected A2S_INFO reply header {reply[:5]!r}")
+        # Header, protocol byte, then name, map, folder and game as null-terminated strings and a 16-bit app ID.
+        position = 6
+        for _ in range(4):
+            position = reply.index(b"\x00", position) + 1
+        position += 2
+        return reply[position], reply[position + 1]
+
+
+class MinecraftPlayerQuery(PlayerCountQuery):
+    """Minecraft Java Edition Server List Ping over TCP."""
+    @staticmethod
+    def _varint(value):
+        value &= 0xFFFFFFFF
+        encoded = bytearray()
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            encoded.append(byte | (0x80 if value else 0))
+            if not value:
+                return bytes(encoded)
+
+    @staticmethod
+    async def _read_varint(reader):
+        value = 0
+        for shift in range(0, 35, 7):
+            byte = (await reader.readexactly(1))[0]
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value
+        raise ValueError("VarInt is too long")
+
+    def _packet(self, payload):
+        return self._varint(len(payload)) + payload
+
+    async def _ping(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            host = self.host.encode()
+            # Handshake (protocol version -1 = "just asking", next state 1 = status) followed by a status request.
+            handshake = b"\x00" + self._varint(-1) + self._varint(len(host)) + host + self.port.to_bytes(2, "big") + self._varint(1)
+            writer.write(self._packet(handshake) + self._packet(b"\x00"))
+            await writer.drain()
+            await self._read_varint(reader) # Packet length
+            await self._read_varint(reader) # Packet ID
+            status = json.loads(await reader.readexactly(await self._read_varint(reader)))
+        finally:
+            writer.close()
+        return status["players"]["online"], status["players"]["max"]
+
+    async def query(self):
+        return await asyncio.wait_for(self._ping(), self.TIMEOUT_SECONDS)
+
+
+def build_player_query(spec):
+    """Turns a server's player_query dict into a query object, or None when no query is configured."""
+    if not spec:
+        return None
+    query_classes = {
+        "a2s": A2SPlayerQuery,
+        "minecraft": MinecraftPlayerQuery
+    }
+    spec = dict(spec)
+    query_type = spec.pop("type")
+    if query_type not in query_classes:
+        raise ValueError(f"Unknown player query type '{query_type}'. Expected one of: {', '.join(query_classes)}.")
+    return query_classes[query_type](**spec)
+
+
+class PlayerCountCache:
+    """
+    Shares one player count query between the panel and the idle policy for a short TTL.
+    get() returns (players, max_players), or None when the server did not answer.
+    """
+    def __init__(self, query, ttl_seconds):
+        self.query = query
+        self.ttl_seconds = ttl_seconds
+        self._value = None
+        self._checked_at = None
+        self._inflight = None
+
+    async def _refresh(self):
+        try:
+            value = await self.query.query()
+        except Exception as e:
+            logging.debug("Player count query to %s:%s failed: %r", self.query.host, self.query.port, e)
+            value = None
+        self._value = value
+        self._checked_at = asyncio.get_running_loop().time()
+        return value
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        if self._checked_at is not None and loop.time() - self._checked_at < self.ttl_seconds:
+            return self._value
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return await asyncio.shield(self._inflight)
+
+    def invalidate(self):
+        self._checked_at = None
+
+
+# --- Server Log Capture ---
+def read_lines_reversed(path, max_bytes, block_size=65536):
+    """Yields the lines of a file newest first, reading blocks backwards from the end and stopping after max_bytes."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        carry = b""
+        read_total = 0
+        while position > 0 and read_total < max_bytes:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + carry).split(b"\n")
+            read_total += size
+            carry = lines[0]
+            for line in reversed(lines[1:]):
+                yield line
+        if position == 0 and carry:
+            yield carry
+
+def search_lines(lines, pattern, limit):
+    """Returns up to limit of the newest lines matching pattern, newest first."""
+    matches = []
+    for line in reversed(lines):
+        if pattern.search(line):
+            matches.append(line)
+            if len(matches) >= limit:
+                break
+    return matches
+
+def search_log_files(paths, pattern, limit, max_bytes):
+    """Returns up to limit lines matching pattern from the ends of the given files (newest file first), oldest first."""
+    matches = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        for raw_line in read_lines_reversed(path, max_bytes):
+            line = raw_line.rstrip(b"\r").decode(errors="replace")
+            if line and pattern.search(line):
+                matches.append(line)
+                if len(matches) >= limit:
+                    return matches[::-1]
+    return matches[::-1]
+
+
+class ServerLogCapture:
+    """
+    Keeps the newest lines of a server's output in a bounded in-memory ring buffer.
+    Output comes from the owned process's console, a followed log file, or both. Console output is also
+    spilled to rotated files so searches can reach further back than the buffer.
+    """
+    def __init__(self, server_name, log_file=None):
+        self.server_name = server_name
+        self.log_file = log_file
+        self.lines = deque(maxlen=LOG_BUFFER_LINES)
+        self.evicted = False # True once lines have dropped out of the buffer
+        self._carry = b""
+        self._file_offset = None
+        self._spill_path = None if log_file else os.path.join(LOG_CAPTURE_DIR, f"{server_name}.log")
+        self._pending_spill = []
+        self._spill_task = None
+
+    def feed(self, data):
+        """Splits a chunk of raw output into lines and stores the complete ones."""
+        chunks = (self._carry + data).split(b"\n")
+        self._carry = chunks.pop()
+        if len(self._carry) > LOG_MAX_LINE_LENGTH * 4:
+            chunks.append(self._carry) # Never let a line without a newline grow without bound
+            self._carry = b""
+        for chunk in chunks:
+            line = chunk.rstrip(b"\r").decode(errors="replace")[:LOG_MAX_LINE_LENGTH]
+            if len(self.lines) == self.lines.maxlen:
+                self.evicted = True
+            self.lines.append(line)
+            if self._spill_path:
+                self._pending_spill.append(line)
+        if self._pending_spill:
+            self._schedule_spill()
+
+    async def consume(self, stream):
+        """Reads a process output stream until EOF."""
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            self.feed(data)
+        if self._carry:
+            self.feed(b"\n")
+
+    async def follow_file(self):
+        """Feeds output appended to log_file since the last call. The first call starts at the current end of the file."""
+        data = await asyncio.get_running_loop().run_in_executor(None, self._read_log_file)
+        if data:
+            self.feed(data)
+
+    def _read_log_file(self):
+        try:
+            with open(self.log_file, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if self._file_offset is None or size < self._file_offset:
+                    # Start at the end (or over after a rotation) instead of loading an existing multi-gigabyte log.
+                    self._file_offset = size if self._file_offset is None else 0
+                # After a large burst only the newest part is buffered; older lines stay searchable in the file.
+                self._file_offset = max(self._file_offset, size - LOG_FOLLOW_MAX_READ_BYTES)
+                f.seek(self._file_offset)
+                data = f.read(size - self._file_offset)
+                self._file_offset += len(data)
+                return data
+        except OSError:
+            return b""
+
+    def _schedule_spill(self):
+        if self._spill_task is not None and not self._spill_task.done():
+            return
+        try:
+            self._spill_task = asyncio.get_running_loop().create_task(self._spill_soon())
+        except RuntimeError:
+            pass
+
+    async def _spill_soon(self):
+        await asyncio.sleep(LOG_SPILL_FLUSH_SECONDS)
+        await self.flush()
+
+    async def flush(self):
+        """Appends the pending console lines to the spill file, rotating it when it grows past LOG_SPILL_MAX_BYTES."""
+        if not self._pending_spill:
+            return
+        lines, self._pending_spill = self._pending_spill, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_spill, lines)
+        except Exception as e:
+            logging.error("Failed to write captured output of %s to %s: %s", self.server_name, self._spill_path, e)
+
+    def _write_spill(self, lines):
+        os.makedirs(os.path.dirname(self._spill_path) or ".", exist_ok=True)
+        if os.path.exists(self._spill_path) and os.path.getsize(self._spill_path) >= LOG_SPILL_MAX_BYTES:
+            for index in range(LOG_SPILL_BACKUP_COUNT - 1, 0, -1):
+                if os.path.exists(f"{self._spill_path}.{index}"):
+                    os.replace(f"{self._spill_path}.{index}", f"{self._spill_path}.{index + 1}")
+            os.replace(self._spill_path, f"{self._spill_path}.1")
+        with open(self._spill_path, "a", encoding="utf-8", errors="replace") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _files(self):
+        if self.log_file:
+            return [self.log_file]
+        return [self._spill_path] + [f"{self._spill_path}.{index}" for index in range(1, LOG_SPILL_BACKUP_COUNT + 1)]
+
+    async def search(self, pattern, limit):
+        """
+        Returns up to limit lines matching pattern, oldest first. The in-memory buffer answers most searches;
+        only when it holds too few matches are the log files read backwards from their end.
+        """
+        # Both scans run in the executor; even a simple pattern over thousands of long lines would stall the loop.
+        loop = asyncio.get_running_loop()
+        matches = await loop.run_in_executor(None, search_lines, list(self.lines), pattern, limit)
+        if len(matches) >= limit or (not self.evicted and not self.log_file):
+            return matches[::-1] # Enough matches, or the buffer still holds everything that was captured
+        await self.flush()
+        return await loop.run_in_executor(None, search_log_files, self._files(), pattern, limit, LOG_SEARCH_MAX_BYTES)
+
+@tasks.loop(seconds=LOG_FOLLOW_INTERVAL_SECONDS)
+async def log_follow_loop():
+    for server in bot.game_servers.values():
+        if server.log_capture is not None and server.log_file:
+            await server.log_capture.follow_file()
+
+
+# --- Save Snapshots ---
+SNAPSHOT_TASK_BYTES = 16 * SNAPSHOT_CHUNK_SIZE # Large files are split into ranges of this size so one file can use several workers
+
+def snapshot_chunk_path(chunk_dir, digest):
+    return os.path.join(chunk_dir, digest[:2], digest + ".z")
+
+def _store_file_range(path, offset, length, chunk_dir):
+    """
+    Splits length bytes of path starting at offset into SNAPSHOT_CHUNK_SIZE pieces and stores every piece that is not yet
+    in the chunk store, zlib-compressed and named by its SHA-256. Reads one chunk at a time, so memory use does not
+    depend on the file size. Returns (chunk digests in order, bytes read, compressed bytes stored).
+    """
+    digests = []
+    read_bytes = stored_bytes = 0
+    with open(path, "rb") as source:
+        source.seek(offset)
+        while read_bytes < length:
+            data = source.read(min(SNAPSHOT_CHUNK_SIZE, length - read_bytes))
+            if not data:
+                break # The file shrank while being read; the manifest records what was there
+            read_bytes += len(data)
+            digest = hashlib.sha256(data).hexdigest()
+            digests.append(digest)
+            chunk_path = snapshot_chunk_path(chunk_dir, digest)
+            if os.path.exists(chunk_path):
+                continue
+            compressed = zlib.compress(data, SNAPSHOT_COMPRESSION_LEVEL)
+            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+            temp_path = f"{chunk_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as chunk_file:
+                chunk_file.write(compressed)
+            os.replace(temp_path, chunk_path)
+            stored_bytes += len(compressed)
+    return digests, read_bytes, stored_bytes
+
+
+class SaveSnapshotter:
+    """
+    Incremental snapshots of a server's save directory in a content-addressed chunk store.
+    Files are cut into fixed-size chunks stored once under their SHA-256, so data that did not change is never stored
+    twice, and files whose size and modification time match the previous snapshot are not read at all. A snapshot
+    therefore costs time in proportion to what changed. Each snapshot is a JSON manifest listing every file's chunks;
+    restore_snapshot.py turns one back into a directory.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.root = os.path.join(SNAPSHOT_DIR, server.name)
+        self.chunk_dir = os.path.join(self.root, "chunks")
+        self.manifest_dir = os.path.join(self.root, "manifests")
+        self.progress = None # (bytes processed, bytes to process) while a snapshot runs
+        self.last_summary = None
+        self._task = None
+
+    async def snapshot(self, reason):
+        """Takes a snapshot, or joins the one already running, and returns its summary (None if it failed)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._snapshot(reason))
+        return await asyncio.shield(self._task)
+
+    def _manifest_names(self):
+        try:
+            return sorted(name for name in os.listdir(self.manifest_dir) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def _read_manifest(self, name):
+        with open(os.path.join(self.manifest_dir, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _scan(self):
+        """Lists the save directory, reusing the previous snapshot's chunks for unchanged files. Returns (files, work)."""
+        names = self._manifest_names()
+        previous = self._read_manifest(names[-1]) if names else None
+        previous_files = previous["files"] if previous and previous.get("chunk_size") == SNAPSHOT_CHUNK_SIZE else {}
+        files, work = {}, []
+        for directory, subdirectories, filenames in os.walk(self.server.save_directory):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                relative_path = os.path.relpath(path, self.server.save_directory).replace(os.sep, "/")
+                try:
+                    file_stat = os.stat(path)
+                except OSError:
+                    continue # Deleted while scanning
+                if not stat.S_ISREG(file_stat.st_mode):
+                    continue
+                entry = {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "mode": stat.S_IMODE(file_stat.st_mode), "chunks": None}
+                old_entry = previous_files.get(relative_path)
+                if old_entry and old_entry["size"] == entry["size"] and old_entry["mtime_ns"] == entry["mtime_ns"]:
+                    entry["chunks"] = old_entry["chunks"]
+                else:
+                    for offset in range(0, max(file_stat.st_size, 1), SNAPSHOT_TASK_BYTES):
+                        work.append((relative_path, path, offset, min(SNAPSHOT_TASK_BYTES, file_stat.st_size - offset)))
+                files[relative_path] = entry
+        return files, work
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        # Names sort in creation order, which is how the newest snapshot and the ones to prune are found.
+        created_ms = int(manifest["created_at"] * 1000)
+        while True:
+            name = time.strftime("%Y%m%d-%H%M%S", time.localtime(created_ms // 1000)) + f"-{created_ms % 1000:03d}.json"
+            if not os.path.exists(os.path.join(self.manifest_dir, name)):
+                break
+            created_ms += 1
+        temp_path = os.path.join(self.manifest_dir, name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(temp_path, os.path.join(self.manifest_dir, name))
+
+    def _prune(self):
+        """Keeps the newest SNAPSHOT_KEEP manifests and deletes chunks no remaining manifest refers to. Returns the bytes freed."""
+        names = self._manifest_names()
+        expired = names[:-SNAPSHOT_KEEP]
+        if not expired:
+            return 0
+        for name in expired:
+            os.remove(os.path.join(self.manifest_dir, name))
+        referenced = set()
+        for name in names[-SNAPSHOT_KEEP:]:
+            for entry in self._read_manifest(name)["files"].values():
+                referenced.update(entry["chunks"])
+        freed = 0
+        for directory, _, filenames in os.walk(self.chunk_dir):
+            for filename in filenames:
+                if filename.endswith(".z") and filename[:-2] in referenced:
+                    continue
+                path = os.path.join(directory, filename)
+                freed += os.path.getsize(path)
+                os.remove(path)
+        logging.info("Pruned %s snapshot(s) of %s, freeing %s.", len(expired), self.server.name, format_bytes(freed))
+        return freed
+
+    async def _snapshot(self, reason):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        self.progress = (0, 0)
+        await bot.update_server_status_message(self.server)
+        pending = {}
+        try:
+            files, work = await loop.run_in_executor(None, self._scan)
+            total_bytes = sum(length for _, _, _, length in work)
+            self.progress = (0, total_bytes)
+            for relative_path, path, offset, length in work:
+                future = loop.run_in_executor(bot.snapshot_executor, _store_file_range, path, offset, length, self.chunk_dir)
+                pending[future] = (relative_path, offset, length)
+
+            ranges = {} # relative path -> [(offset, digests, bytes read)]
+            processed_bytes = stored_bytes = 0
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    relative_path, offset, length = pending.pop(future)
+                    digests, read_bytes, new_bytes = future.result()
+                    ranges.setdefault(relative_path, []).append((offset, digests, read_bytes))
+                    processed_bytes += length
+                    stored_bytes += new_bytes
+                self.progress = (processed_bytes, total_bytes)
+                await bot.update_server_status_message(self.server)
+
+            for relative_path, file_ranges in ranges.items():
+                file_ranges.sort()
+                files[relative_path]["chunks"] = [digest for _, digests, _ in file_ranges for digest in digests]
+                files[relative_path]["size"] = sum(read_bytes for _, _, read_bytes in file_ranges)
+            manifest = {
+                "version": 1, "server": self.server.name, "reason": reason, "created_at": time.time(),
+                "source": os.path.abspath(self.server.save_directory), "chunk_size": SNAPSHOT_CHUNK_SIZE, "files": files
+            }
+            await loop.run_in_executor(None, self._write_manifest, manifest)
+            await loop.run_in_executor(None, self._prune)
+        except Exception as e:
+            for future in pending:
+                future.cancel()
+            logging.error("Snapshot of %s failed: %s", self.server.name, e)
+            add_command_history_entry(self.server, 'Snapshot Failed', 'System')
+            await bot.update_command_history_message(self.server)
+            return None
+        finally:
+            self.progress = None
+            await bot.update_server_status_message(self.server)
+
+        summary = {
+            "created_at": manifest["created_at"], "files": len(files), "changed_files": len(ranges),
+            "total_bytes": sum(entry["size"] for entry in files.values()), "read_bytes": processed_bytes,
+            "stored_bytes": stored_bytes, "seconds": time.monotonic() - started
+        }
+        self.last_summary = summary
+        bot.metrics.observe("snapshot_seconds", summary["seconds"], {"server": self.server.name})
+        logging.info("Snapshot of %s (%s): %s of %s files changed, %s read, %s stored in %.1fs.", self.server.name, reason,
+                     summary["changed_files"], summary["files"], format_bytes(processed_bytes), format_bytes(stored_bytes), summary["seconds"])
+        add_command_history_entry(self.server, f'Snapshot Saved ({format_bytes(stored_bytes)} new)', 'System')
+        await bot.update_command_history_message(self.server)
+        return summary
+
+    def status_lines(self):
+        """Progress of a running snapshot, or a summary of the last one, for the panel."""
+        if self.progress is not None:
+            processed_bytes, total_bytes = self.progress
+            done = f"{processed_bytes / total_bytes:.0%}" if total_bytes else "scanning"
+            return [f"💾 **Snapshot:** {done} ({format_bytes(processed_bytes)} of {format_bytes(total_bytes)} changed)"]
+        if self.last_summary is not None:
+            summary = self.last_summary
+            when = datetime.datetime.fromtimestamp(summary["created_at"], TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M %Z')
+            return [f"💾 **Last Snapshot:** {when} · {format_bytes(summary['stored_bytes'])} new · {summary['seconds']:.0f}s"]
+        return []
+
+# Hashing, zlib compression and file I/O all release the GIL, so worker threads use every core without the
+# cost of starting processes that would each re-import this module.
+bot.snapshot_executor = concurrent.futures.ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS or os.cpu_count(), thread_name_prefix="snapshot")
+
+
+# --- Owned Server Process Supervision ---
+class ServerSupervisor:
+    """
+    Owns a game server launched directly from its launch_args as an asyncio subprocess.
+    Awaiting the child's exit reports crashes the moment they happen, stops go through a console command or
+    signal before the process is killed, and crashed servers can optionally be restarted with exponential backoff.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.process = None
+        self._watch_task = None
+        self._output_task = None
+        self._restart_task = None
+        self._stopping = False
+        self._crash_times = deque() # Loop times of recent crashes, used for backoff and crash loop detection
+
+    @property
+    def is_running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        """Launches the server and starts watching for its exit."""
+        if self.is_running:
+            return
+        self._stopping = False
+        kwargs = {}
+        if os.name == "nt":
+            # A separate process group lets the server receive CTRL_BREAK_EVENT without it reaching the bot.
+            kwargs["creationflags"] = _NO_WINDOW_FLAGS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            # A separate session keeps a Ctrl+C aimed at the bot from killing the game server.
+            kwargs["start_new_session"] = True
+        self.process = await asyncio.create_subprocess_exec(
+            *self.server.launch_args,
+            stdin=asyncio.subprocess.PIPE if self.server.stop_console_command else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            **kwargs
+        )
+        self.server.pid = self.process.pid
+        logging.info("Launched %s as PID %s.", self.server.name, self.process.pid)
+        # The pipe has to be drained continuously or a chatty server blocks on its own output.
+        self._output_task = asyncio.ensure_future(self.server.log_capture.consume(self.process.stdout))
+        self._watch_task = asyncio.ensure_future(self._watch_exit(self.process))
+
+    async def stop(self, timeout):
+        """
+        Stops the server in stages: console command or signal, then up to timeout seconds of waiting, then a kill.
+        Returns "graceful" or "killed".
+        """
+        self._stopping = True
+        self.cancel_pending_restart()
+        process = self.process
+        if process is None or process.returncode is not None:
+            return "graceful"
+
+        try:
+            if self.server.stop_console_command and process.stdin is not None:
+                process.stdin.write(self.server.stop_console_command.encode() + b"\n")
+                await process.stdin.drain()
+                logging.info("Sent console command '%s' to %s.", self.server.stop_console_command, self.server.name)
+            elif os.name == "nt":
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                process.send_signal(signal.SIGTERM)
+        except (ProcessLookupError, ConnectionResetError, BrokenPipeError) as e:
+            logging.warning("Could not ask %s to stop gracefully: %s", self.server.name, e)
+
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+            return "graceful"
+        except asyncio.TimeoutError:
+            logging.warning("%s did not exit within %ss. Killing PID %s.", self.server.name, timeout, process.pid)
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        return "killed"
+
+    def cancel_pending_restart(self):
+        """Cancels a crash restart that is still waiting out its backoff. Returns whether one was pending."""
+        if self._restart_task is None or self._restart_task.done():
+            return False
+        self._restart_task.cancel()
+        return True
+
+    async def _watch_exit(self, process):
+        return_code = await process.wait()
+        bot.server_state.invalidate()
+        if self.server.pid == process.pid:
+            self.server.pid = None
+        if self._stopping:
+            logging.info("%s exited with code %s after a stop request.", self.server.name, return_code)
+            return
+
+        logging.warning("%s exited unexpectedly with code %s.", self.server.name, return_code)
+        add_command_history_entry(self.server, f'Server Crashed (exit code {return_code})', 'System')
+        await bot.update_command_history_message(self.server)
+        await bot.update_server_status_message(self.server)
+
+        if not self.server.restart_on_crash:
+            self._clear_shutdown()
+            return
+
+        now = asyncio.get_running_loop().time()
+        self._crash_times.append(now)
+        while self._crash_times and now - self._crash_times[0] > SERVER_CRASH_LOOP_WINDOW_SECONDS:
+            self._crash_times.popleft()
+        if len(self._crash_times) > SERVER_CRASH_LOOP_MAX_RESTARTS:
+            logging.error("%s crashed %s times within %ss. Not restarting it again.", self.server.name, len(self._crash_times), SERVER_CRASH_LOOP_WINDOW_SECONDS)
+            add_command_history_entry(self.server, 'Crash Loop Detected (restarts stopped)', 'System')
+            await bot.update_command_history_message(self.server)
+            self._crash_times.clear()
+            self._clear_shutdown()
+            return
+
+        delay = min(SERVER_RESTART_BACKOFF_INITIAL_SECONDS * 2 ** (len(self._crash_times) - 1), SERVER_RESTART_BACKOFF_MAX_SECONDS)
+        self._restart_task = asyncio.ensure_future(self._restart_after(delay))
+
+    async def _restart_after(self, delay):
+        try:
+            logging.info("Restarting %s in %.0fs.", self.server.name, delay)
+            await asyncio.sleep(delay)
+            if self.is_running:
+                return # Someone started the server by hand while the backoff ran
+            await self.start()
+            add_command_history_entry(self.server, f'Server Restarted (crash {len(self._crash_times)})', 'System')
+            await bot.update_command_history_message(self.server)
+            await bot.update_server_status_message(self.server)
+        except asyncio.CancelledError:
+            logging.info("Pending restart of %s was cancelled.", self.server.name)
+        except Exception as e:
+            logging.error("Failed to restart %s: %s", self.server.name, e)
+            self._clear_shutdown()
+
+    def _clear_shutdown(self):
+        set_server_timing(self.server, None, None)
+        cancel_shutdown(self.server)
+
+
+class LogResponder:
+    """Stands in for a Discord reply target when the bot acts on its own, e.g. for an automated shutdown."""
+    def __init__(self, label):
+        self.label = label
+
+    async def send(self, content, ephemeral=False, delete_after=None):
+        logging.info("[%s] %s", self.label, content)
+
+
+def _response_target(interaction_or_ctx):
+    return interaction_or_ctx.followup if isinstance(interaction_or_ctx, discord.Interaction) else interaction_or_ctx
+
+
+async def start_game_server_func(server, interaction_or_ctx):
+    """Starts a game server (or resets its shutdown timer if it already runs) and returns whether it is running."""
+    server_running_status = await bot.check_server_process(server)
+    response_target = _response_target(interaction_or_ctx)
+
+    if server_running_status:
+        now = datetime.datetime.now(TARGET_TIMEZONE)
+        set_server_timing(server, now, now + datetime.timedelta(hours=server.shutdown_delay_hours))
+        bot.schedule_shutdown(server)
+        logging.info("Shutdown timer for %s reset for %s hours.", server.name, server.shutdown_delay_hours)
+        await response_target.send(f"{server.display_name} was already running. Shutdown timer has been reset!", ephemeral=True)
+        await bot.update_server_status_message(server)
+        return True
+
+    try:
+        ready_probes = build_server_probes(server, server.ready_probes)
+        for probe in ready_probes:
+            probe.arm()
+        if server.supervisor is not None:
+            server.supervisor.cancel_pending_restart()
+            await server.supervisor.start()
+        else:
+            subprocess.Popen(server.start_command, shell=True, creationflags=_NO_WINDOW_FLAGS)
+        bot.server_state.invalidate()
+        server_running_status, ready_seconds = await wait_for_server_probes(ready_probes, server.ready_timeout_seconds)
+        bot.metrics.observe("server_confirm_seconds", ready_seconds, {"server": server.name, "action": "start", "result": "ok" if server_running_status else "timeout"})
+        
+        if server_running_status:
+            now = datetime.datetime.now(TARGET_TIMEZONE)
+            set_server_timing(server, now, now + datetime.timedelta(hours=server.shutdown_delay_hours))
+            server.idle_since = None
+            server.last_ready_seconds = ready_seconds
+            bot.state_store.set(server.state_key("last_ready_seconds"), ready_seconds)
+            add_command_history_entry(server, f'Server Ready ({ready_seconds:.1f}s)', 'System')
+            await bot.update_command_history_message(server)
+            logging.info("%s ready after %.1fs.", server.name, ready_seconds)
+            await response_target.send(f"{server.display_name} started successfully! Ready in {ready_seconds:.1f}s.", ephemeral=True)
+            bot.schedule_shutdown(server)
+        else:
+            await response_target.send(f"Failed to confirm {server.display_name} started within {server.ready_timeout_seconds}s. Please check server logs manually.", ephemeral=True)
+
+        await bot.update_server_status_message(server)
+        return server_running_status
+
+    except Exception as e:
+        logging.error("ERROR in start_game_server for %s: %s", server.name, e)
+        await response_target.send(f"Error starting {server.display_name}: {e}", ephemeral=True)
+        return False
+
+async def stop_game_server_func(server, interaction_or_ctx):
+    """Stops a game server and returns whether it is stopped."""
+    server_running_status = await bot.check_server_process(server)
+    response_target = _response_target(interaction_or_ctx)
+
+    if not server_running_status:
+        # A crashed server may be waiting out its restart backoff; the stop has to win over that restart.
+        if server.supervisor is not None and server.supervisor.cancel_pending_restart():
+            set_server_timing(server, None, None)
+            cancel_shutdown(server)
+            await response_target.send(f"{server.display_name} is not running. Its pending restart after a crash was cancelled.", ephemeral=True)
+        else:
+            await response_target.send(f"{server.display_name} is not running.", ephemeral=True)
+        await bot.update_server_status_message(server)
+        return True
+
+    try:
+        stopped_probes = build_server_probes(server, server.stopped_probes)
+        for probe in stopped_probes:
+            probe.arm()
+        stop_stage = None
+        if server.supervisor is not None and server.supervisor.is_running:
+            stop_stage = await server.supervisor.stop(server.graceful_stop_timeout_seconds)
+        else:
+            # A server launched by an earlier bot process is no longer owned, so fall back to the stop command.
+            await run_shell_command(server.stop_command)
+        bot.server_state.invalidate()
+        server_stopped, stop_seconds = await wait_for_server_probes(stopped_probes, server.stop_timeout_seconds)
+        bot.metrics.observe("server_confirm_seconds", stop_seconds, {"server": server.name, "action": "stop", "result": "ok" if server_stopped else "timeout"})
+        server_running_status = not server_stopped
+
+        if not server_running_status:
+            set_server_timing(server, None, None)
+            if cancel_shutdown(server):
+                logging.info("Automated shutdown of %s cancelled as the server was stopped.", server.name)
+            logging.info("%s stopped after %.1fs.", server.name, stop_seconds)
+            if stop_stage == "killed":
+                add_command_history_entry(server, 'Server Killed (graceful stop timed out)', 'System')
+                await bot.update_command_history_message(server)
+                await response_target.send(f"{server.display_name} did not shut down within {server.graceful_stop_timeout_seconds}s and was killed.", ephemeral=True)
+            else:
+                await response_target.send(f"{server.display_name} stopped successfully! Stopped in {stop_seconds:.1f}s.", ephemeral=True)
+            if server.snapshots is not None and SNAPSHOT_ON_STOP:
+                # Runs inside the stop operation, so a queued start waits until the save has been captured.
+                await server.snapshots.snapshot("stop")
+        else:
+            await response_target.send(f"Failed to confirm {server.display_name} stopped within {server.stop_timeout_seconds}s. Please check server manually.", ephemeral=True)
+
+        await bot.update_server_status_message(server)
+        return not server_running_status
+
+    except Exception as e:
+        logging.error("ERROR in stop_game_server for %s: %s", server.name, e)
+        await response_target.send(f"Error stopping {server.display_name}: {e}", ephemeral=True)
+        return False
+
+async def restart_game_server_func(server, interaction_or_ctx):
+    """Stops a game server if it runs, then starts it again. Returns whether it is running afterwards."""
+    if await bot.check_server_process(server, force=True) and not await stop_game_server_func(server, interaction_or_ctx):
+        return False
+    return await start_game_server_func(server, interaction_or_ctx)
+
+async def automated_shutdown(server):
+    """Stops a game server whose shutdown deadline has passed."""
+    if await bot.check_server_process(server, force=True):
+        add_command_history_entry(server, 'Automated Shutdown', 'System')
+        await bot.update_command_history_message(server)
+        await bot.stop_game_server(server, LogResponder(f"Automated Shutdown: {server.name}"))
+    else:
+        logging.info("Automated shutdown of %s skipped: Server was already stopped.", server.name)
+
+def schedule_shutdown_func(server):
+    """
+    Schedules the automated shutdown of a game server at its shutdown_deadline (shutdown_delay_hours after start
+    unless restored from the state store), moving the server's existing shutdown job if there is one.
+    """
+    deadline = server.shutdown_deadline or datetime.datetime.now(TARGET_TIMEZONE) + datetime.timedelta(hours=server.shutdown_delay_hours)
+    job = bot.scheduler.find("shutdown", server.name)
+    if job is None:
+        bot.scheduler.add("shutdown", deadline.timestamp(), server.name)
+    elif job.run_at != deadline.timestamp():
+        bot.scheduler.reschedule(job, deadline.timestamp())
+    else:
+        return
+    delay_seconds = max(0, (deadline - datetime.datetime.now(TARGET_TIMEZONE)).total_seconds())
+    logging.info("Automated shutdown of %s scheduled for %s (%.2f hours from now).", server.name, deadline.strftime('%m/%d/%y %H:%M:%S %Z'), delay_seconds / 3600)
+
+def cancel_shutdown(server):
+    """Removes a game server's automated shutdown job. Returns whether there was one."""
+    job = bot.scheduler.find("shutdown", server.name)
+    return job is not None and bot.scheduler.cancel(job.id) is not None
+
+
+# --- Server Operation Queue ---
+class OperationResponders:
+    """Sends an operation's replies to everyone whose request was merged into it, including requests merged while it runs."""
+    def __init__(self, requester):
+        self.requesters = [requester]
+
+    async def send(self, content, ephemeral=False, delete_after=None):
+        results = await asyncio.gather(
+            *(_response_target(requester).send(content, ephemeral=ephemeral, delete_after=delete_after) for requester in list(self.requesters)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning("Could not deliver an operation reply: %s", result)
+
+
+class ServerOperation:
+    __slots__ = ("action", "responders", "future", "queued_at", "started_at")
+
+    def __init__(self, action, requester):
+        self.action = action
+        self.responders = OperationResponders(requester)
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+        self.started_at = None
+
+
+class ServerOperationQueue:
+    """
+    Runs one server's start, stop and restart requests one at a time, in arrival order.
+    A request for the same action as the last queued or running operation joins it, and every requester gets
+    its result, so a burst of Start clicks launches the server once. Of conflicting requests the newest wins:
+    it replaces every operation that has not started yet, while the running operation always finishes.
+    """
+    ACTIONS = {"start": start_game_server_func, "stop": stop_game_server_func, "restart": restart_game_server_func}
+
+    def __init__(self, server):
+        self.server = server
+        self.current = None
+        self.pending = []
+        self._worker = None
+
+    async def submit(self, action, requester):
+        """Queues action for the server (or joins an identical one) and returns the operation's result."""
+        superseded = []
+        last = self.pending[-1] if self.pending else self.current
+        if last is None or last.action != action:
+            superseded, self.pending = self.pending, []
+            last = self.current
+        if last is not None and last.action == action:
+            operation = last
+            operation.responders.requesters.append(requester)
+            bot.metrics.inc("server_operations_merged_total", {"server": self.server.name, "action": action})
+            logging.info("%s request for %s merged into the queued one.", action.capitalize(), self.server.name)
+        else:
+            operation = ServerOperation(action, requester)
+            self.pending.append(operation)
+            if self._worker is None or self._worker.done():
+                self._worker = asyncio.get_running_loop().create_task(self._run())
+
+        for replaced in superseded:
+            logging.info("%s request for %s superseded by a newer %s request.", replaced.action.capitalize(), self.server.name, action)
+            replaced.future.set_result(False)
+            await replaced.responders.send(f"Your {replaced.action} request for {self.server.display_name} was replaced by a newer {action} request.", ephemeral=True)
+        await bot.update_server_status_message(self.server)
+        return await asyncio.shield(operation.future)
+
+    async def _run(self):
+        while self.pending:
+            operation = self.pending.pop(0)
+            self.current = operation
+            operation.started_at = time.monotonic()
+            bot.metrics.observe("server_operation_wait_seconds", operation.started_at - operation.queued_at, {"server": self.server.name, "action": operation.action})
+            result = False
+            try:
+                result = await self.ACTIONS[operation.action](self.server, operation.responders)
+            except Exception as e:
+                logging.error("%s of %s failed: %s", operation.action.capitalize(), self.server.name, e)
+            finally:
+                self.current = None
+                operation.future.set_result(result)
+        await bot.update_server_status_message(self.server)
+
+    def status_lines(self):
+        """The running and waiting operations, for the panel."""
+        if self.current is None and not self.pending:
+            return []
+        now = time.monotonic()
+        parts = []
+        if self.current is not None:
+            merged = len(self.current.responders.requesters)
+            parts.append(f"{self.current.action} running {now - self.current.started_at:.0f}s" + (f" ({merged} requests)" if merged > 1 else ""))
+        parts.extend(f"{operation.action} waiting {now - operation.queued_at:.0f}s" for operation in self.pending)
+        return [f"🚦 **Operations:** {', '.join(parts)}"]
+
+
+# --- Job Scheduler ---
+class CronSchedule:
+    """
+    A five-field cron expression (minute hour day-of-month month day-of-week) evaluated in TARGET_TIMEZONE.
+    Fields accept *, numbers, ranges (1-5), lists (1,3) and steps (*/15, 0-30/10); day-of-week 0 and 7 are Sunday.
+    As in cron, when both day fields are restricted a day matches if either one does.
+    """
+    FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+    SEARCH_DAYS = 366 * 5 # Far enough ahead to reach any February 29th
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("A cron expression needs five fields: minute hour day-of-month month day-of-week.")
+        self.expression = " ".join(fields)
+        minutes, hours, days, months, weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        )
+        self.minutes, self.hours = sorted(minutes), sorted(hours)
+        self.days, self.months = days, months
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+        self.next_after(time.time()) # Rejects expressions that can never fire, such as February 30th
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(","):
+            range_text, _, step_text = part.partition("/")
+            try:
+                step = int(step_text) if step_text else 1
+                if range_text == "*":
+                    start, end = low, high
+                elif "-" in range_text:
+                    start, end = (int(value) for value in range_text.split("-", 1))
+                else:
+                    start = int(range_text)
+                    end = high if step_text else start
+            except ValueError:
+                raise ValueError(f"Cron field '{field}' is not a number, range or list.") from None
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Cron field '{field}' is outside {low}-{high}.")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day):
+        day_match = day.day in self.days
+        weekday_match = day.isoweekday() % 7 in self.weekdays
+        if self._any_day:
+            return weekday_match
+        if self._any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+    def next_after(self, timestamp):
+        """Returns the epoch time of the first matching minute strictly after timestamp."""
+        start = datetime.datetime.fromtimestamp(timestamp, TARGET_TIMEZONE).replace(tzinfo=None, second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day = start.date()
+        for _ in range(self.SEARCH_DAYS):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    if day == start.date() and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        if day == start.date() and hour == start.hour and minute < start.minute:
+                            continue
+                        local_time = TARGET_TIMEZONE.localize(datetime.datetime.combine(day, datetime.time(hour, minute)))
+                        return TARGET_TIMEZONE.normalize(local_time).timestamp()
+            day += datetime.timedelta(days=1)
+        raise ValueError(f"Cron expression '{self.expression}' never fires.")
+
+
+class JobScheduler:
+    """
+    Runs automated shutdowns and scheduled starts, stops, restarts and channel cleanups at absolute deadlines.
+    Jobs are kept in a heap ordered by run_at and persisted in the state store. A single task sleeps until
+    the earliest job is due, so the cost of waiting does not grow with the number of scheduled jobs.
+    """
+    KINDS = ("shutdown", "start", "stop", "restart", "cleanup")
+    MAX_SLEEP_SECONDS = 60 # Re-read the wall clock at least this often, so clock changes and suspends cannot delay jobs
+
+    def __init__(self):
+        self.jobs = {}
+        self._heap = [] # (run_at, job ID); entries whose job was cancelled or moved are skipped when they surface
+        self._cron_cache = {}
+        self._next_id = 1
+        self._wakeup = None
+        self._runner = None
+        self._running = set()
+
+    def cron(self, expression):
+        expression = " ".join(expression.split())
+        if expression not in self._cron_cache:
+            self._cron_cache[expression] = CronSchedule(expression)
+        return self._cron_cache[expression]
+
+    async def load(self):
+        """Loads the persisted jobs. Jobs added before loading finished are kept."""
+        for job in await bot.state_store.load_jobs():
+            if job.id in self.jobs:
+                continue
+            self.jobs[job.id] = job
+            self._heap.append((job.run_at, job.id))
+            self._next_id = max(self._next_id, job.id + 1)
+        heapq.heapify(self._heap)
+
+    def add(self, kind, run_at, server_name=None, cron=None, created_by="System"):
+        job = ScheduledJob(self._next_id, kind, server_name, run_at, cron, created_by)
+        self._next_id += 1
+        self._push(job)
+        return job
+
+    def reschedule(self, job, run_at):
+        job.run_at = run_at
+        self._push(job)
+
+    def cancel(self, job_id):
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            bot.state_store.delete_job(job_id)
+        return job
+
+    def _push(self, job):
+        self.jobs[job.id] = job
+        bot.state_store.save_job(job)
+        if len(self._heap) > 2 * len(self.jobs) + 16:
+            self._heap = [(other.run_at, other.id) for other in self.jobs.values() if other is not job]
+            heapq.heapify(self._heap)
+        heapq.heappush(self._heap, (job.run_at, job.id))
+        if self._wakeup is not None and self._heap[0][1] == job.id:
+            self._wakeup.set()
+
+    def find(self, kind, server_name):
+        return next((job for job in self.jobs.values() if job.kind == kind and job.server_name == server_name), None)
+
+    def upcoming(self, server_names=None):
+        """Jobs in run order, optionally only those of server_names (jobs without a server are always included)."""
+        jobs = [job for job in self.jobs.values() if server_names is None or job.server_name is None or job.server_name in server_names]
+        return sorted(jobs, key=lambda job: job.run_at)
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        for task in (self._runner, *self._running):
+            if task is not None:
+                task.cancel()
+        self._runner = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap:
+                run_at, job_id = self._heap[0]
+                job = self.jobs.get(job_id)
+                if job is None or job.run_at != run_at:
+                    heapq.heappop(self._heap)
+                elif run_at <= now:
+                    heapq.heappop(self._heap)
+                    self._dispatch(job, now)
+                else:
+                    break
+            sleep_seconds = min(self._heap[0][0] - now, self.MAX_SLEEP_SECONDS) if self._heap else self.MAX_SLEEP_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, job, now):
+        due_at = job.run_at
+        if job.cron:
+            self.reschedule(job, self.cron(job.cron).next_after(now))
+        else:
+            self.cancel(job.id)
+        # A server must never outlive its shutdown deadline, but a start or restart hours late is no longer wanted.
+        if job.kind != "shutdown" and now - due_at > SCHEDULE_MISSED_GRACE_MINUTES * 60:
+            logging.warning("Skipped scheduled %s #%s: it was due %.0f minutes ago while the bot was offline.", job.kind, job.id, (now - due_at) / 60)
+            return
+        task = asyncio.get_running_loop().create_task(run_scheduled_job(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+bot.scheduler = JobScheduler()
+
+
+async def run_scheduled_job(job):
+    server = bot.game_servers.get(job.server_name) if job.server_name else None
+    if job.server_name and server is None:
+        logging.warning("Scheduled %s #%s targets unknown server %s. Skipping it.", job.kind, job.id, job.server_name)
+        return
+    logging.info("Running scheduled %s #%s%s.", job.kind, job.id, f" of {server.name}" if server else "")
+    try:
+        if job.kind == "shutdown":
+            await automated_shutdown(server)
+        elif job.kind == "cleanup":
+            await run_channel_cleanup()
+        else:
+            add_command_history_entry(server, f'Scheduled {job.kind.capitalize()} (#{job.id})', 'System')
+            await bot.update_command_history_message(server)
+            responder = LogResponder(f"Scheduled {job.kind.capitalize()}: {server.name}")
+            if job.kind == "restart":
+                await bot.restart_game_server(server, responder)
+            elif job.kind == "stop" and await bot.check_server_process(server, force=True):
+                await bot.stop_game_server(server, responder)
+            elif job.kind == "start" and not await bot.check_server_process(server, force=True):
+                await bot.start_game_server(server, responder)
+    except Exception as e:
+        logging.error("Scheduled %s #%s failed: %s", job.kind, job.id, e)
+
+
+def ensure_cleanup_job():
+    """Keeps one recurring channel cleanup job in line with DAILY_CLEAR_HOUR and DAILY_CLEAR_MINUTE."""
+    expression = f"{DAILY_CLEAR_MINUTE} {DAILY_CLEAR_HOUR} * * *"
+    job = next((job for job in bot.scheduler.jobs.values() if job.kind == "cleanup" and job.created_by == "System"), None)
+    if job is not None and job.cron == expression:
+        return
+    if job is not None:
+        bot.scheduler.cancel(job.id)
+    bot.scheduler.add("cleanup", bot.scheduler.cron(expression).next_after(time.time()), cron=expression)
+
+
+SCHEDULE_RELATIVE_PATTERN = re.compile(r"(?:\+|in)(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?")
+
+def parse_schedule_time(tokens, now):
+    """
+    Parses the time part of !schedule and returns (run_at, cron). Accepts `HH:MM` (the next such time),
+    `YYYY-MM-DD HH:MM`, a relative `+1h30m` / `in 2d`, or `cron <minute> <hour> <day> <month> <weekday>`.
+    """
+    if not tokens:
+        raise ValueError("Please give a time.")
+    if tokens[0].lower() == "cron":
+        expression = " ".join(tokens[1:])
+        schedule = bot.scheduler.cron(expression)
+        return schedule.next_after(now), schedule.expression
+
+    text = " ".join(tokens).lower()
+    if text.startswith("+") or text.startswith("in "):
+        match = SCHEDULE_RELATIVE_PATTERN.fullmatch(text.replace(" ", ""))
+        if not match or not any(match.groups()):
+            raise ValueError(f"Could not read the duration `{text}`. Use e.g. `+45m`, `+2h30m` or `in 1d`.")
+        days, hours, minutes = (int(value or 0) for value in match.groups())
+        return now + days * 86400 + hours * 3600 + minutes * 60, None
+
+    try:
+        if len(tokens) == 2:
+            local_time = datetime.datetime.strptime(text, "%Y-%m-%d %H:%M")
+        else:
+            clock = datetime.datetime.strptime(text, "%H:%M").time()
+            today = datetime.datetime.fromtimestamp(now, TARGET_TIMEZONE).date()
+            local_time = datetime.datetime.combine(today, clock)
+            if TARGET_TIMEZONE.localize(local_time).timestamp() <= now:
+                local_time += datetime.timedelta(days=1)
+    except ValueError:
+        raise ValueError(f"Could not read the time `{text}`. Use `HH:MM`, `YYYY-MM-DD HH:MM`, `+2h` or `cron ...`.") from None
+    run_at = TARGET_TIMEZONE.normalize(TARGET_TIMEZONE.localize(local_time)).timestamp()
+    if run_at <= now:
+        raise ValueError("That time is in the past.")
+    return run_at, None
+
+
+# --- Idle Shutdown ---
+@tasks.loop(seconds=IDLE_CHECK_INTERVAL_SECONDS)
+async def idle_shutdown_loop():
+    """Stops servers that have had no players for their idle_shutdown_minutes. The hard shutdown deadline still applies."""
+    for server in bot.game_servers.values():
+        if not server.idle_shutdown_minutes or server.player_count is None:
+            continue
+        if not await bot.check_server_process(server):
+            server.idle_since = None
+            continue
+        result = await server.player_count.get()
+        if result is None:
+            continue # An unanswered query says nothing about the players, so the idle timer neither starts nor resets
+        if result[0] > 0:
+            server.idle_since = None
+            continue
+
+        now = time.monotonic()
+        if server.idle_since is None:
+            server.idle_since = now
+            logging.info("%s has no players. Idle shutdown in %s minutes unless someone joins.", server.name, server.idle_shutdown_minutes)
+            await bot.update_server_status_message(server)
+            continue
+        if now - server.idle_since >= server.idle_shutdown_minutes * 60:
+            server.idle_since = None
+            add_command_history_entry(server, f'Idle Shutdown (no players for {server.idle_shutdown_minutes}m)', 'System')
+            await bot.update_command_history_message(server)
+            await bot.stop_game_server(server, LogResponder(f"Idle Shutdown: {server.name}"))
+
+
+# --- Demand Forecast and Pre-warming ---
+# History entries that mark a player asking for the server, and the start and end of a session.
+FORECAST_DEMAND_COMMANDS = ("startserver", "Start Server (Button)")
+FORECAST_SESSION_START_PREFIX = "Server Ready"
+FORECAST_SESSION_END_PREFIXES = ("Automated Shutdown", "Idle Shutdown", "Server Crashed", "Server Killed", "stopserver",
+                                 "Stop Server (Button)", "Stop Server (API)", "Scheduled Stop", "Pre-warm Unused")
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+class DemandForecast:
+    """
+    A server's start demand per weekday and hour, learned from the last FORECAST_HISTORY_DAYS of command history.
+    The probability of an hour is the share of observed weeks in which someone asked for the server during it;
+    sessions that began in that hour give its typical session length.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.weeks_observed = 0
+        self.updated_at = None
+        self._demand = {} # (weekday, hour) -> number of weeks with a start request in that hour
+        self._sessions = {} # (weekday, hour) -> durations in seconds of the sessions that started in that hour
+
+    async def refresh(self):
+        now = time.time()
+        entries = await bot.state_store.history_since(history_server_names(self.server), now - FORECAST_HISTORY_DAYS * 86400)
+        demand_weeks = {}
+        sessions = {}
+        session_start = None
+        for entry in entries:
+            local_time = datetime.datetime.fromtimestamp(entry.created_at, TARGET_TIMEZONE)
+            slot = (local_time.weekday(), local_time.hour)
+            if entry.command in FORECAST_DEMAND_COMMANDS:
+                demand_weeks.setdefault(slot, set()).add(local_time.isocalendar()[:2])
+            elif entry.command.startswith(FORECAST_SESSION_START_PREFIX):
+                session_start = (slot, entry.created_at)
+            elif session_start is not None and entry.command.startswith(FORECAST_SESSION_END_PREFIXES):
+                sessions.setdefault(session_start[0], []).append(entry.created_at - session_start[1])
+                session_start = None
+        self._demand = {slot: len(weeks) for slot, weeks in demand_weeks.items()}
+        self._sessions = {slot: sorted(durations) for slot, durations in sessions.items()}
+        self.weeks_observed = (now - entries[0].created_at) / (7 * 86400) if entries else 0
+        self.updated_at = now
+
+    def probability(self, weekday, hour):
+        if self.weeks_observed < 1:
+            return 0.0
+        return min(1.0, self._demand.get((weekday, hour), 0) / self.weeks_observed)
+
+    def typical_session_seconds(self, weekday, hour):
+        durations = self._sessions.get((weekday, hour))
+        return durations[len(durations) // 2] if durations else None
+
+    def upcoming(self, hours):
+        """(slot start, probability, typical session seconds) for each of the next hours, starting with the next full hour."""
+        slot_start = datetime.datetime.now(TARGET_TIMEZONE).replace(minute=0, second=0, microsecond=0)
+        slots = []
+        for _ in range(hours):
+            slot_start = TARGET_TIMEZONE.normalize(slot_start + datetime.timedelta(hours=1))
+            slots.append((slot_start, self.probability(slot_start.weekday(), slot_start.hour),
+                          self.typical_session_seconds(slot_start.weekday(), slot_start.hour)))
+        return slots
+
+    @property
+    def confident(self):
+        return self.weeks_observed >= FORECAST_MIN_WEEKS
+
+
+async def prewarm_claimed(server):
+    """Whether anyone asked for a pre-warmed server or joined it since it was started."""
+    entries = await bot.state_store.history_since(history_server_names(server), server.prewarmed_at)
+    if any(entry.command in FORECAST_DEMAND_COMMANDS for entry in entries):
+        return True
+    players = await server.player_count.get() if server.player_count is not None else None
+    return bool(players and players[0] > 0)
+
+@tasks.loop(seconds=FORECAST_CHECK_INTERVAL_SECONDS)
+async def prewarm_loop():
+    """Starts servers shortly before hours with confidently predicted demand and stops them again if nobody comes."""
+    now = time.time()
+    for server in bot.game_servers.values():
+        if not server.prewarm:
+            continue
+        try:
+            if server.forecast.updated_at is None or now - server.forecast.updated_at >= 3600:
+                await server.forecast.refresh()
+            running = await bot.check_server_process(server)
+
+            if server.prewarmed_at is not None:
+                if not running:
+                    server.prewarmed_at = None
+                elif await prewarm_claimed(server):
+                    logging.info("Pre-warmed %s was claimed.", server.name)
+                    server.prewarmed_at = None
+                elif now - server.prewarmed_at >= FORECAST_PREWARM_GRACE_MINUTES * 60:
+                    server.prewarmed_at = None
+                    add_command_history_entry(server, f'Pre-warm Unused (stopped after {FORECAST_PREWARM_GRACE_MINUTES}m)', 'System')
+                    await bot.update_command_history_message(server)
+                    await bot.stop_game_server(server, LogResponder(f"Pre-warm: {server.name}"))
+                continue
+
+            if running or not server.forecast.confident:
+                continue
+            slot_start, probability, _ = server.forecast.upcoming(1)[0]
+            lead_seconds = FORECAST_PREWARM_LEAD_MINUTES * 60 + (server.last_ready_seconds or 0)
+            if probability < FORECAST_PREWARM_CONFIDENCE or slot_start.timestamp() - now > lead_seconds or server.prewarmed_for == slot_start.timestamp():
+                continue
+            logging.info("Pre-warming %s for %s (%.0f%% expected demand).", server.name, slot_start.strftime('%a %H:%M'), probability * 100)
+            add_command_history_entry(server, f'Pre-warm Start ({probability:.0%} for {slot_start.strftime("%H:%M")})', 'System')
+            await bot.update_command_history_message(server)
+            server.prewarmed_at = time.time()
+            server.prewarmed_for = slot_start.timestamp() # Never pre-warm twice for the same hour, e.g. after a manual stop
+            if not await bot.start_game_server(server, LogResponder(f"Pre-warm: {server.name}")):
+                server.prewarmed_at = None
+        except Exception as e:
+            logging.error("Pre-warm check of %s failed: %s", server.name, e)
+
+
+# --- Attach helper functions to the bot instance ---
+bot.check_server_process = bot.server_state.get
+# Every start, stop and restart goes through the server's operation queue; the *_func versions run one directly.
+bot.start_game_server = lambda server, interaction_or_ctx: server.operations.submit("start", interaction_or_ctx)
+bot.stop_game_server = lambda server, interaction_or_ctx: server.operations.submit("stop", interaction_or_ctx)
+bot.restart_game_server = lambda server, interaction_or_ctx: server.operations.submit("restart", interaction_or_ctx)
+bot.schedule_shutdown = schedule_shutdown_func
+bot.update_persistent_message = update_persistent_message
+
+
+# --- Outbound Persistent Message Updates ---
+class PersistentMessageUpdater:
+    """
+    Coalesces refresh requests for persistent messages into at most one edit per message per interval.
+    Callers only mark a message dirty; a background worker renders the latest state and edits it later,
+    pacing itself with the rate-limit headers Discord returns for each channel.
+    """
+    CHANNEL_ROUTE_PATTERN = re.compile(r"/channels/(\d+)/messages")
+
+    def __init__(self, min_interval_seconds):
+        self.min_interval_seconds = min_interval_seconds
+        self._renderers = {} # key -> async render function
+        self._dirty = {} # key -> ID of the channel holding the message, in the order the keys were first marked
+        self._next_edit_at = {} # key -> loop time before which the key is not edited again
+        self._channel_blocked_until = {} # channel ID -> loop time when the channel's rate-limit bucket resets
+        self._wakeup = None
+        self._settled = None
+        self._task = None
+
+    def register(self, key, render_func):
+        self._renderers[key] = render_func
+
+    def mark_dirty(self, key, channel_id):
+        """Queues a refresh of the persistent message registered under key and returns immediately."""
+        self._dirty[key] = channel_id
+        if self._wakeup is not None:
+            self._settled.clear()
+            self._wakeup.set()
+
+    def start(self):
+        """Starts the background worker on the running event loop (safe to call on every on_ready)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._settled = asyncio.Event()
+        if self._dirty:
+            self._wakeup.set()
+        else:
+            self._settled.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def flush(self):
+        """Waits until every dirty message has been rendered."""
+        if self._settled is not None:
+            await self._settled.wait()
+
+    def observe_response(self, path, status, headers):
+        """Records rate-limit headers from a Discord REST response that touched a channel's messages."""
+        match = self.CHANNEL_ROUTE_PATTERN.search(path)
+        if not match:
+            return
+        try:
+            if status == 429:
+                wait_seconds = float(headers.get("Retry-After", self.min_interval_seconds))
+            elif headers.get("X-RateLimit-Remaining") == "0":
+                wait_seconds = float(headers.get("X-RateLimit-Reset-After", self.min_interval_seconds))
+            else:
+                return
+        except ValueError:
+            return
+        channel_id = int(match.group(1))
+        blocked_until = asyncio.get_running_loop().time() + wait_seconds
+        self._channel_blocked_until[channel_id] = max(blocked_until, self._channel_blocked_until.get(channel_id, 0))
+        logging.debug("Channel %s rate-limit bucket exhausted; holding persistent message edits for %.2fs.", channel_id, wait_seconds)
+
+    def _ready_at(self, key, channel_id):
+        return max(self._next_edit_at.get(key, 0), self._channel_blocked_until.get(channel_id, 0))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._dirty:
+                now = loop.time()
+                ready_keys = [key for key, channel_id in self._dirty.items() if self._ready_at(key, channel_id) <= now]
+                if not ready_keys:
+                    delay = min(self._ready_at(key, channel_id) for key, channel_id in self._dirty.items()) - now
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    continue
+                for key in ready_keys:
+                    self._dirty.pop(key)
+                    try:
+                        await self._renderers[key]()
+                    except Exception as e:
+                        logging.error("Failed to render persistent message '%s': %s", key, e)
+                    self._next_edit_at[key] = loop.time() + self.min_interval_seconds
+            self._settled.set()
+
+bot.message_updater = PersistentMessageUpdater(PERSISTENT_MESSAGE_MIN_EDIT_INTERVAL_SECONDS)
 
 
-# --- Attach helper functions to the bot instance ---
-bot.check_server_process = check_server_process_func
-bot.start_game_server = start_game_server_func
-bot.stop_game_server = stop_game_server_func
-bot.schedule_shutdown = schedule_shutdown_func
-bot.update_persistent_message = update_persistent_message
-bot.get_server_status_string = get_server_status_string_func
+async def render_panel_message(server):
+    channel = bot.get_channel(server.channel_id)
+    if channel is None:
+        logging.warning("Control channel %s for %s not found. Skipping panel update.", server.channel_id, server.name)
+        return
+    if server.panel_view is None:
+        server.panel_view = ServerControlView(bot, server)
+        bot.add_view(server.panel_view)
+    state = await collect_panel_state(server)
+    await bot.update_persistent_message(channel, server, "panel_message_id", embed=build_panel_embed(server, state), view=server.panel_view)
 
+def attach_server_services(server):
+    """Creates a server's runtime helpers once every class they need is defined. Called by build_game_servers."""
+    server.resources = ResourceHistory(max(1, int(RESOURCE_HISTORY_SECONDS / max(RESOURCE_SAMPLE_INTERVAL_SECONDS, 1))))
+    server.resource_sampler = ProcessResourceSampler()
+    query = build_player_query(server.player_query)
+    if query:
+        server.player_count = PlayerCountCache(query, PLAYER_COUNT_CACHE_TTL_SECONDS)
+    if server.launch_args or server.log_file:
+        server.log_capture = ServerLogCapture(server.name, server.log_file)
+    if server.save_directory:
+        server.snapshots = SaveSnapshotter(server)
+    if server.launch_args:
+        server.supervisor = ServerSupervisor(server)
+    server.operations = ServerOperationQueue(server)
+    server.forecast = DemandForecast(server)
+    bot.message_updater.register((server.name, "panel"), lambda: render_panel_message(server))
 
-async def update_server_status_message_wrapper(channel):
-    # Now adds the "Game Server Status:" title here
-    status_content = "**Game Server Status:**\n" + await bot.get_server_status_string()
-    await bot.update_persistent_message(channel, "current_status_message_id", PERSISTENT_STATUS_MESSAGE_ID_FILE, lambda: status_content)
+bot.game_servers = build_game_servers()
 
-async def update_command_history_message_wrapper(channel):
-    history_content_func = lambda: "**Recent Activity:**\n" + \
-                                   ("No activity yet." if not bot.command_history_list else
-                                    "\n".join([f"- `{entry['command']}` by {entry['user']} at {entry['timestamp']}"
-                                               for entry in bot.command_history_list]))
-    await bot.update_persistent_message(channel, "current_history_message_id", PERSISTENT_HISTORY_MESSAGE_ID_FILE, history_content_func)
+async def update_panel_message_wrapper(server):
+    """Marks a server's panel dirty; the message updater re-renders and edits it in the background."""
+    bot.message_updater.mark_dirty((server.name, "panel"), server.channel_id)
 
-bot.update_server_status_message = update_server_status_message_wrapper
-bot.update_command_history_message = update_command_history_message_wrapper
+# Status and recent activity are sections of the one panel message, so both kinds of refresh mark the same
+# message dirty and any burst of them is rendered into a single edit.
+bot.update_server_status_message = update_panel_message_wrapper
+bot.update_command_history_message = update_panel_message_wrapper
 
 # --- New: Periodic Status Update Loop ---
 @tasks.loop(minutes=STATUS_UPDATE_INTERVAL_MINUTES)
 async def status_update_loop():
-    channel = bot.get_channel(SERVER_CHANNEL_ID)
-    if channel:
-        await bot.update_server_status_message(channel)
-    else:
-        logging.warning(f"Status update loop: Server control channel {SERVER_CHANNEL_ID} not found.")
-
-# --- NEW: Daily Clear Channel Loop ---
-@tasks.loop(time=datetime.time(hour=DAILY_CLEAR_HOUR, minute=DAILY_CLEAR_MINUTE, tzinfo=TARGET_TIMEZONE))
-async def daily_clear_channel_loop():
-    logging.info("Attempting to run daily_clear_channel_loop.")
-    channel = bot.get_channel(SERVER_CHANNEL_ID)
-    if channel:
-        logging.info(f"Executing daily clear_channel in channel {SERVER_CHANNEL_ID}.")
-        class DummyContext:
-            def __init__(self, bot_instance, channel_obj):
-                self.bot = bot_instance
-                self.channel = channel_obj
-                self.message = None 
-                
-            async def send(self, content, ephemeral=False, delete_after=None):
-                logging.info(f"[Daily Clear Task] Bot would send: {content}")
-                pass
-        
-        dummy_ctx = DummyContext(bot, channel)
-        await clear_channel(dummy_ctx)
-        logging.info("Daily clear_channel command finished.")
-    else:
-        logging.warning(f"Daily clear_channel loop: Server control channel {SERVER_CHANNEL_ID} not found.")
+    now = time.monotonic()
+    if bot.last_status_tick is not None:
+        drift = now - bot.last_status_tick - STATUS_UPDATE_INTERVAL_MINUTES * 60
+        bot.metrics.observe("status_loop_drift_seconds", abs(drift))
+    bot.last_status_tick = now
+    # Every server renders from the same cached process scan, so one tick costs one scan.
+    for server in bot.game_servers.values():
+        await bot.update_server_status_message(server)
+
+bot.last_status_tick = None
+
+# --- Scheduled Channel Cleanup ---
+async def run_channel_cleanup():
+    """Clears every control channel and prunes old history. Run by the scheduler's cleanup jobs (daily by default)."""
+    logging.info("Attempting to run scheduled channel cleanup.")
+    class DummyContext:
+        def __init__(self, bot_instance, channel_obj):
+            self.bot = bot_instance
+            self.channel = channel_obj
+            self.message = None 
+            
+        async def send(self, content, ephemeral=False, delete_after=None):
+            logging.info("[Daily Clear Task] Bot would send: %s", content)
+            pass
+
+    for channel_id in {server.channel_id for server in bot.game_servers.values()}:
+        channel = bot.get_channel(channel_id)
+        if channel:
+            logging.info("Executing daily clear_channel in channel %s.", channel_id)
+            await clear_channel(DummyContext(bot, channel))
+            logging.info("Daily clear_channel command finished.")
+        else:
+            logging.warning("Scheduled channel cleanup: Server control channel %s not found.", channel_id)
+    await prune_command_history()
 
 # --- Server Control Buttons View ---
 class ServerControlView(discord.ui.View):
-    def __init__(self, bot_instance, server_channel_id):
+    def __init__(self, bot_instance, server):
         super().__init__(timeout=None)
         self.bot_instance = bot_instance
-        self.server_channel_id = server_channel_id
+        self.server = server
+        # Custom IDs are namespaced so every server's panel gets its own persistent buttons.
+        self.start_button.custom_id = f"{server.name}:start_server"
+        self.stop_button.custom_id = f"{server.name}:stop_server"
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.channel_id != self.server_channel_id:
+        if interaction.channel_id != self.server.channel_id:
             await interaction.response.send_message("Please use these buttons in the designated server control channel.", ephemeral=True)
             return False
         try:
@@ -338,32 +3248,28 @@ class ServerControlView(discord.ui.View):
                 await interaction.response.defer(ephemeral=True)
             return True
         except discord.errors.InteractionResponded:
-            logging.debug(f"Interaction for {interaction.data.get('custom_id', 'unknown')} already responded to (e.g., double click).")
+            logging.debug("Interaction for %s already responded to (e.g., double click).", interaction.data.get('custom_id', 'unknown'))
             return True
         except Exception as e:
-            logging.error(f"Failed to defer interaction for {interaction.data.get('custom_id', 'unknown')}: {e}")
+            logging.error("Failed to defer interaction for %s: %s", interaction.data.get('custom_id', 'unknown'), e)
             try:
                 if not interaction.response.is_done():
                     await interaction.response.send_message(f"Error deferring interaction: {e}", ephemeral=True)
                 else:
                     await interaction.followup.send(f"Error deferring interaction: {e}", ephemeral=True)
             except Exception as fe:
-                logging.critical(f"CRITICAL ERROR: Also failed to send followup after deferral failure: {fe}")
+                logging.critical("CRITICAL ERROR: Also failed to send followup after deferral failure: %s", fe)
             return False
 
     async def _handle_button_action(self, interaction: discord.Interaction, action_name: str, action_func):
-        logging.debug(f"{action_name} button callback initiated.")
-        try:
-            await action_func(interaction)
-            self.bot_instance.command_history_list.append({
-                'command': f'{action_name} (Button)',
-                'user': interaction.user.display_name,
-                'timestamp': datetime.datetime.now(TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M:%S %Z')
-            })
-            await self.bot_instance.update_command_history_message(interaction.channel)
-            logging.debug(f"{action_name} called successfully for button.")
+        logging.debug("%s button callback initiated for %s.", action_name, self.server.name)
+        try:
+            if await action_func(self.server, interaction):
+                add_command_history_entry(self.server, f'{action_name} (Button)', interaction.user.display_name)
+                await self.bot_instance.update_command_history_message(self.server)
+            logging.debug("%s called successfully for button.", action_name)
         except Exception as e:
-            logging.error(f"An unhandled exception occurred in {action_name} button callback: {e}")
+            logging.error("An unhandled exception occurred in %s button callback: %s", action_name, e)
             await interaction.followup.send(f"An unexpected error occurred during server {action_name.lower()}: {e}", ephemeral=True)
 
     @discord.ui.button(label="Start Server", style=discord.ButtonStyle.success, custom_id="start_server")
@@ -374,104 +3280,580 @@ class ServerControlView(discord.ui.View):
     async def stop_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._handle_button_action(interaction, "Stop Server", self.bot_instance.stop_game_server)
 
+# --- Startup Helpers ---
+# Separate status and history messages sent by earlier versions; they are deleted once now that the panel shows both.
+RETIRED_MESSAGE_ID_ATTRS = ("status_message_id", "history_message_id")
+
+# Unnamespaced keys written by single-server versions of the bot, adopted by the first configured server.
+LEGACY_SERVER_STATE_KEYS = {
+    "panel_message_id": "current_panel_message_id",
+    "status_message_id": "current_status_message_id",
+    "history_message_id": "current_history_message_id",
+    "server_start_time": "server_start_time",
+    "shutdown_deadline": "shutdown_deadline",
+    "last_ready_seconds": "last_ready_seconds"
+}
+
+def _migrate_legacy_server_state(server):
+    for key, legacy_key in LEGACY_SERVER_STATE_KEYS.items():
+        legacy_value = bot.state_store.get(legacy_key)
+        if legacy_value is None:
+            continue
+        if bot.state_store.get(server.state_key(key)) is None:
+            bot.state_store.set(server.state_key(key), legacy_value)
+        bot.state_store.set(legacy_key, None)
+
+def history_server_names(server):
+    """The server names a server's history is stored under. History recorded before servers were named belongs to the first server."""
+    first_server = next(iter(bot.game_servers.values()))
+    return [server.name, ""] if server is first_server else [server.name]
+
+async def prune_command_history():
+    """Deletes command history older than HISTORY_RETENTION_DAYS."""
+    if not HISTORY_RETENTION_DAYS:
+        return
+    try:
+        removed = await bot.state_store.prune_history(time.time() - HISTORY_RETENTION_DAYS * 86400)
+    except Exception as e:
+        logging.error("Failed to prune command history: %s", e)
+        return
+    if removed:
+        logging.info("Pruned %s command history entries older than %s days.", removed, HISTORY_RETENTION_DAYS)
+
+async def load_persistent_state():
+    """Restores message IDs, server timings, command history and scheduled jobs from the state store (once per process)."""
+    if bot.state_store.loaded:
+        return
+    await bot.state_store.load()
+    for index, server in enumerate(bot.game_servers.values()):
+        if index == 0:
+            _migrate_legacy_server_state(server)
+        server.panel_message_id = bot.state_store.get(server.state_key("panel_message_id"))
+        for attr_name in RETIRED_MESSAGE_ID_ATTRS:
+            message_id = bot.state_store.get(server.state_key(attr_name))
+            if message_id:
+                bot.retired_messages.append((server, attr_name, message_id))
+
+        start_timestamp = bot.state_store.get(server.state_key("server_start_time"))
+        deadline_timestamp = bot.state_store.get(server.state_key("shutdown_deadline"))
+        server.start_time = datetime.datetime.fromtimestamp(start_timestamp, TARGET_TIMEZONE) if start_timestamp else None
+        server.shutdown_deadline = datetime.datetime.fromtimestamp(deadline_timestamp, TARGET_TIMEZONE) if deadline_timestamp else None
+        server.last_ready_seconds = bot.state_store.get(server.state_key("last_ready_seconds"))
+
+        server.command_history.extend(await bot.state_store.recent_history(history_server_names(server), MAX_COMMAND_HISTORY))
+    await prune_command_history()
+    await bot.scheduler.load()
+    ensure_cleanup_job()
+
+async def delete_retired_messages():
+    """Deletes the status and history messages of earlier versions and forgets their IDs."""
+    while bot.retired_messages:
+        server, attr_name, message_id = bot.retired_messages.pop()
+        channel = bot.get_channel(server.channel_id)
+        if channel is not None:
+            try:
+                await channel.get_partial_message(message_id).delete()
+                logging.info("Deleted the old %s of %s; the panel shows it now.", attr_name.replace("_id", "").replace("_", " "), server.name)
+            except discord.NotFound:
+                pass
+            except Exception as e:
+                logging.warning("Could not delete old message %s of %s: %s", message_id, server.name, e)
+        bot.state_store.set(server.state_key(attr_name), None)
+
+async def restore_persistent_messages(servers):
+    """
+    Renders the panels of all servers. Existing panels are edited concurrently; panels that have to be sent anew
+    are sent one after another afterwards so they keep their usual order in each channel.
+    """
+    await delete_retired_messages()
+    existing, missing = [], []
+    for server in servers:
+        if bot.get_channel(server.channel_id) is None:
+            logging.warning("Server control channel %s for %s not found on ready. Cannot initialize its panel.", server.channel_id, server.name)
+            continue
+        (existing if server.panel_message_id else missing).append(server)
+    await asyncio.gather(*(render_panel_message(server) for server in existing))
+    for server in missing:
+        await render_panel_message(server)
+
+async def run_startup_clear_channel(channel):
+    """Runs clear_channel after startup without holding up the panel."""
+    class DummyContextStartup:
+        def __init__(self, bot_instance, channel_obj):
+            self.bot = bot_instance
+            self.channel = channel_obj
+            self.message = None 
+        async def send(self, content, ephemeral=False, delete_after=None):
+            logging.info("[Startup Clear Task] Bot would send: %s", content)
+            pass
+
+    started = time.perf_counter()
+    try:
+        await clear_channel(DummyContextStartup(bot, channel))
+        logging.info("Startup clear_channel command finished in %.2fs.", time.perf_counter() - started)
+    except Exception as e:
+        logging.error("Startup clear_channel task failed: %s", e)
+
+async def start_metrics_endpoint():
+    """Serves the metrics in the Prometheus text format on METRICS_HTTP_HOST:METRICS_HTTP_PORT."""
+    async def handle_metrics(request):
+        if not math.isnan(bot.latency) and not math.isinf(bot.latency):
+            bot.metrics.set_gauge("gateway_latency_seconds", bot.latency)
+        bot.metrics.set_gauge("uptime_seconds", time.time() - bot.metrics.started_at)
+        resident_bytes, _ = process_memory_bytes()
+        if resident_bytes is not None:
+            bot.metrics.set_gauge("process_resident_bytes", resident_bytes)
+        return web.Response(text=bot.metrics.render_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HTTP_HOST, METRICS_HTTP_PORT).start()
+    bot.metrics_runner = runner
+    logging.info("Serving metrics on http://%s:%s/metrics", METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+
+async def report_steady_state_memory():
+    """Logs the bot's memory use once startup work (message restore, channel cleanup) has settled."""
+    await asyncio.sleep(MEMORY_REPORT_DELAY_SECONDS)
+    resident_bytes, peak_bytes = process_memory_bytes()
+    if resident_bytes is None:
+        return
+    bot.metrics.set_gauge("steady_state_resident_bytes", resident_bytes)
+    logging.info("Steady-state memory: %s resident (peak %s); caching %s guild(s), %s message(s), %s member(s).",
+                 format_bytes(resident_bytes), format_bytes(peak_bytes), len(bot.guilds), len(bot.cached_messages),
+                 sum(len(guild.members) for guild in bot.guilds))
+
+bot.startup_clear_tasks = {} # channel ID -> background clear_channel task started on ready
+
+# --- Local Control API ---
+CONTROL_API_ACTIONS = ("start", "stop", "restart")
+
+class ApiResponder:
+    """Collects the replies of an operation requested through the control API, so they can be returned to the caller."""
+    def __init__(self, label):
+        self.label = label
+        self.messages = []
+
+    async def send(self, content, ephemeral=False, delete_after=None):
+        logging.info("[%s] %s", self.label, content)
+        self.messages.append(content)
+
+
+def api_job(job):
+    return {
+        "id": job.id, "kind": job.kind, "server": job.server_name, "cron": job.cron, "created_by": job.created_by,
+        "run_at": datetime.datetime.fromtimestamp(job.run_at, TARGET_TIMEZONE).isoformat()
+    }
+
+async def api_server_status(server, running):
+    """A JSON-ready summary of one server, built from the same state the panel shows."""
+    status = {
+        "name": server.name,
+        "display_name": server.display_name,
+        "running": running,
+        "started_at": server.start_time.isoformat() if running and server.start_time else None,
+        "shutdown_at": server.shutdown_deadline.isoformat() if running and server.shutdown_deadline else None,
+        "last_ready_seconds": server.last_ready_seconds,
+        "operation": server.operations.current.action if server.operations.current else None,
+        "queued_operations": [operation.action for operation in server.operations.pending],
+        "scheduled": [api_job(job) for job in bot.scheduler.upcoming([server.name]) if job.server_name == server.name][:5]
+    }
+    if running and server.player_count is not None:
+        players = await server.player_count.get()
+        status["players"] = {"online": players[0], "max": players[1]} if players else None
+    return status
+
+def _api_error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+@web.middleware
+async def control_api_auth(request, handler):
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {CONTROL_API_TOKEN}".encode()):
+        return _api_error(401, "Missing or wrong token.")
+    return await handler(request)
+
+async def start_control_api():
+    """
+    Serves the control API on CONTROL_API_SOCKET, or on CONTROL_API_HOST:CONTROL_API_PORT.
+    Requests go through the same operation queue, state cache and history as the panel buttons, so the panel shows
+    their effect and a start from a script merges with one from Discord.
+    """
+    if not CONTROL_API_TOKEN or CONTROL_API_TOKEN == "YOUR_CONTROL_API_TOKEN":
+        logging.error("Control API not started: set CONTROL_API_TOKEN to a long random string first.")
+        return
+
+    def find_server(request):
+        return bot.game_servers.get(request.match_info["server"])
+
+    async def handle_servers(request):
+        running_states = await bot.server_state.get_all()
+        return web.json_response({"servers": [await api_server_status(server, running_states.get(server.name, False))
+                                              for server in bot.game_servers.values()]})
+
+    async def handle_server(request):
+        server = find_server(request)
+        if server is None:
+            return _api_error(404, f"Unknown server '{request.match_info['server']}'.")
+        return web.json_response(await api_server_status(server, await bot.check_server_process(server)))
+
+    async def handle_action(request):
+        server = find_server(request)
+        if server is None:
+            return _api_error(404, f"Unknown server '{request.match_info['server']}'.")
+        action = request.match_info["action"]
+        user = request.query.get("user", "API")
+        responder = ApiResponder(f"API {action.capitalize()}: {server.name}")
+
+        async def run_operation():
+            ok = await server.operations.submit(action, responder)
+            # Recorded only once the operation went through, like the commands and panel buttons (see OPERATION_COMMANDS).
+            if ok:
+                add_command_history_entry(server, f'{action.capitalize()} Server (API)', user)
+                await bot.update_command_history_message(server)
+            return ok
+
+        operation = run_operation()
+        if request.query.get("wait", "true").lower() in ("0", "false", "no"):
+            task = asyncio.ensure_future(operation)
+            bot.control_api_tasks.add(task)
+            task.add_done_callback(bot.control_api_tasks.discard)
+            return web.json_response({"server": server.name, "action": action, "queued": True}, status=202)
+        ok = await operation
+        status = await api_server_status(server, await bot.check_server_process(server))
+        return web.json_response({"server": server.name, "action": action, "ok": ok, "messages": responder.messages, "status": status})
+
+    async def handle_history(request):
+        server = find_server(request)
+        if server is None:
+            return _api_error(404, f"Unknown server '{request.match_info['server']}'.")
+        try:
+            limit = max(1, min(int(request.query.get("limit", HISTORY_PAGE_SIZE)), 1000))
+            offset = max(0, int(request.query.get("offset", 0)))
+        except ValueError:
+            return _api_error(400, "limit and offset must be integers.")
+        # Commit entries still waiting in the write batch so the newest activity is included.
+        await bot.state_store.flush()
+        entries, total = await bot.state_store.history_page(history_server_names(server), limit, offset=offset,
+                                                            user=request.query.get("user"), command=request.query.get("command"))
+        return web.json_response({"server": server.name, "total": total, "entries": [{
+            "created_at": datetime.datetime.fromtimestamp(entry.created_at, TARGET_TIMEZONE).isoformat(),
+            "command": entry.command, "user": entry.user
+        } for entry in entries]})
+
+    async def handle_schedule_list(request):
+        return web.json_response({"jobs": [api_job(job) for job in bot.scheduler.upcoming(set(bot.game_servers))]})
+
+    async def handle_schedule_add(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return _api_error(400, "Send a JSON object with action, server and when.")
+        action, when = body.get("action"), str(body.get("when", ""))
+        if action not in CONTROL_API_ACTIONS + ("cleanup",):
+            return _api_error(400, "action must be start, stop, restart or cleanup.")
+        server = None
+        if action != "cleanup":
+            server = bot.game_servers.get(body.get("server"))
+            if server is None:
+                return _api_error(404, f"Unknown server '{body.get('server')}'.")
+        if len(bot.scheduler.jobs) >= SCHEDULE_MAX_JOBS:
+            return _api_error(409, f"There are already {SCHEDULE_MAX_JOBS} scheduled jobs.")
+        try:
+            run_at, cron = parse_schedule_time(when.split(), time.time())
+        except ValueError as e:
+            return _api_error(400, str(e))
+        job = bot.scheduler.add(action, run_at, server.name if server else None, cron, body.get("user", "API"))
+        if server is not None:
+            await bot.update_server_status_message(server)
+        return web.json_response(api_job(job), status=201)
+
+    async def handle_schedule_cancel(request):
+        job = bot.scheduler.jobs.get(int(request.match_info["job_id"]))
+        if job is None:
+            return _api_error(404, f"No scheduled job #{request.match_info['job_id']}.")
+        if job.kind == "shutdown":
+            return _api_error(409, "The automated shutdown can't be cancelled; stop the server instead.")
+        bot.scheduler.cancel(job.id)
+        if job.server_name in bot.game_servers:
+            await bot.update_server_status_message(bot.game_servers[job.server_name])
+        return web.json_response(api_job(job))
+
+    app = web.Application(middlewares=[control_api_auth])
+    app.router.add_get("/servers", handle_servers)
+    app.router.add_get("/servers/{server}", handle_server)
+    app.router.add_post("/servers/{server}/{action:" + "|".join(CONTROL_API_ACTIONS) + "}", handle_action)
+    app.router.add_get("/servers/{server}/history", handle_history)
+    app.router.add_get("/schedule", handle_schedule_list)
+    app.router.add_post("/schedule", handle_schedule_add)
+    app.router.add_delete("/schedule/{job_id:\\d+}", handle_schedule_cancel)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    if CONTROL_API_SOCKET:
+        remove_stale_socket(CONTROL_API_SOCKET) # Left behind if the bot crashed; binding would fail with EADDRINUSE
+        # The socket is created with mode 0600, so only the bot's own user can connect even before it is listening.
+        previous_umask = os.umask(0o177)
+        try:
+            await web.UnixSite(runner, CONTROL_API_SOCKET).start()
+        finally:
+            os.umask(previous_umask)
+        logging.info("Serving the control API on unix:%s", CONTROL_API_SOCKET)
+    else:
+        await web.TCPSite(runner, CONTROL_API_HOST, CONTROL_API_PORT).start()
+        logging.info("Serving the control API on http://%s:%s/", CONTROL_API_HOST, CONTROL_API_PORT)
+    bot.control_api_runner = runner
+
+def remove_stale_socket(path):
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def stop_http_endpoints():
+    """Stops serving the control API and the metrics, and removes the control API's socket."""
+    serving_socket = CONTROL_API_SOCKET and bot.control_api_runner is not None
+    runners = [runner for runner in (bot.control_api_runner, bot.metrics_runner) if runner is not None]
+    bot.control_api_runner = bot.metrics_runner = None
+    for runner in runners:
+        await runner.cleanup()
+    if serving_socket:
+        remove_stale_socket(CONTROL_API_SOCKET)
+
+_discord_close = bot.close
+
+async def close_bot():
+    """Runs when the bot shuts down: releases the HTTP listeners before discord.py closes the gateway connection."""
+    await stop_http_endpoints()
+    await _discord_close()
+
+bot.close = close_bot
+
+bot.control_api_runner = None
+bot.control_api_tasks = set() # Operations started with wait=false, kept referenced until they finish
+
+
+# --- Control Channel Flood Handling ---
+class TokenBucketLimiter:
+    """Per-key token buckets: a key may send a burst of up to capacity messages, then rate_per_second on average."""
+    MAX_KEYS = 1000 # Buckets that have refilled completely are forgotten once this many keys are tracked
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._buckets = {} # key -> (tokens, monotonic time of the last update)
+
+    def allow(self, key):
+        """Takes one token from key's bucket and returns True, or returns False when the bucket is empty."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate_per_second)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self.MAX_KEYS:
+            self._buckets = {other_key: (other_tokens, other_updated_at) for other_key, (other_tokens, other_updated_at) in self._buckets.items()
+                             if other_tokens + (now - other_updated_at) * self.rate_per_second < self.capacity}
+        return allowed
+
+
+class MessageDeleteBatcher:
+    """
+    Collects chat to remove from the control channels and deletes it with one bulk delete per channel and window,
+    instead of one DELETE request per message.
+    """
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self._pending = {} # channel ID -> messages waiting for the channel's next bulk delete
+        self._tasks = {} # channel ID -> task that deletes the pending messages when the window closes
+        self._waiting = set() # channel IDs whose window is still open
+
+    def add(self, message):
+        channel_id = message.channel.id
+        self._pending.setdefault(channel_id, []).append(message)
+        task = self._tasks.get(channel_id)
+        if task is None or task.done():
+            self._tasks[channel_id] = asyncio.get_running_loop().create_task(self._delete_after_window(message.channel))
+
+    async def _delete_after_window(self, channel):
+        self._waiting.add(channel.id)
+        try:
+            await asyncio.sleep(self.window_seconds)
+        except asyncio.CancelledError:
+            pass # flush() closed the window early
+        finally:
+            self._waiting.discard(channel.id)
+        # Messages added while a bulk delete is in flight join the next batch right away.
+        while self._pending.get(channel.id):
+            await self._delete_pending(channel)
+
+    async def _delete_pending(self, channel):
+        messages = self._pending.pop(channel.id, [])
+        for start in range(0, len(messages), BULK_DELETE_LIMIT):
+            batch = messages[start:start + BULK_DELETE_LIMIT]
+            try:
+                # delete_messages falls back to a single DELETE when only one message is in the batch.
+                await channel.delete_messages(batch)
+                bot.metrics.inc("chat_messages_deleted_total", value=len(batch))
+            except discord.Forbidden:
+                logging.error("Bot lacks 'manage_messages' permission to delete user's invalid message.")
+                return
+            except discord.HTTPException as e:
+                logging.error("Failed to delete %s invalid message(s) in channel %s: %s", len(batch), channel.id, e)
+
+    async def flush(self):
+        """Closes every open window and waits until all collected messages are deleted."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for channel_id in self._waiting:
+            self._tasks[channel_id].cancel()
+        await asyncio.gather(*tasks)
+
+bot.message_rate_limiter = TokenBucketLimiter(CONTROL_CHANNEL_MESSAGES_PER_MINUTE / 60, CONTROL_CHANNEL_MESSAGE_BURST)
+bot.message_delete_batcher = MessageDeleteBatcher(INVALID_MESSAGE_DELETE_WINDOW_SECONDS)
+
+
 # --- Bot Events ---
 @bot.event
 async def on_ready():
-    logging.info(f"Bot logged in as {bot.user}")
-    logging.info(f"Bot ID: {bot.user.id}")
-
-    channel = bot.get_channel(SERVER_CHANNEL_ID)
-    if channel:
-        # Step 1: Run clear_channel at script start
-        logging.info("Running clear_channel at bot startup.")
-        class DummyContextStartup:
-            def __init__(self, bot_instance, channel_obj):
-                self.bot = bot_instance
-                self.channel = channel_obj
-                self.message = None 
-            async def send(self, content, ephemeral=False, delete_after=None):
-                logging.info(f"[Startup Clear Task] Bot would send: {content}")
-                pass
-        
-        dummy_ctx_startup = DummyContextStartup(bot, channel)
-        await clear_channel(dummy_ctx_startup)
-        logging.info("Startup clear_channel command finished.")
-
-        # Step 2: Load Persistent Message IDs FIRST
-        for file_path, attr_name in [
-            (PERSISTENT_VIEW_MESSAGE_ID_FILE, "current_panel_message_id"),
-            (PERSISTENT_HISTORY_MESSAGE_ID_FILE, "current_history_message_id"),
-            (PERSISTENT_STATUS_MESSAGE_ID_FILE, "current_status_message_id")
-        ]:
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    message_id_str = f.read().strip()
-                if message_id_str:
-                    try:
-                        setattr(bot, attr_name, int(message_id_str))
-                    except ValueError:
-                        logging.error(f"Invalid message ID stored in {file_path}. Clearing file.")
-                        os.remove(file_path)
-                        setattr(bot, attr_name, None)
-                else:
-                    setattr(bot, attr_name, None)
+    startup_started = phase_started = time.perf_counter()
 
-        # Step 3: Initialize/Update all persistent messages sequentially
-        logging.info("Initializing/Updating all persistent messages.")
-        
-        panel_view = ServerControlView(bot, SERVER_CHANNEL_ID)
-        await bot.update_persistent_message(
-            channel, 
-            "current_panel_message_id", 
-            PERSISTENT_VIEW_MESSAGE_ID_FILE, 
-            lambda: "Use the buttons below to control the game server:", 
-            view=panel_view
-        )
-        
-        # Give a small delay to ensure Discord API has time to process the first send
-        await asyncio.sleep(0.1) 
+    def log_phase(phase_name):
+        nonlocal phase_started
+        now = time.perf_counter()
+        logging.info("Startup phase '%s' took %.0f ms.", phase_name, (now - phase_started) * 1000)
+        phase_started = now
 
-        await bot.update_server_status_message(channel)
-        
-        # Another small delay
-        await asyncio.sleep(0.1) 
+    logging.info("Bot logged in as %s", bot.user)
+    logging.info("Bot ID: %s", bot.user.id)
 
-        await bot.update_command_history_message(channel)
-        
-        bot.add_view(panel_view) # Register the view for persistence after message is set up
-        logging.info("All persistent messages initialized/updated.")
+    bot.message_updater.start()
+    bot.loop_monitor.start()
 
-    else:
-        logging.warning(f"Server control channel {SERVER_CHANNEL_ID} not found on ready. Cannot initialize panel messages.")
-
-    # Step 4: Initial server status check (for logging and shutdown task)
-    if await bot.check_server_process():
-        logging.info(f"Detected {GAME_SERVER_PROCESS_NAME} is already running.")
-        if channel and bot.shutdown_task is None: 
-            bot.server_start_time = datetime.datetime.now(TARGET_TIMEZONE) 
-            bot.shutdown_task = bot.loop.create_task(bot.schedule_shutdown(channel))
-            logging.info(f"Shutdown task initiated on ready for existing server.")
-    else:
-        logging.info(f"{GAME_SERVER_PROCESS_NAME} is not detected as running.")
-        bot.server_start_time = None
-        if bot.shutdown_task and not bot.shutdown_task.done():
-            bot.shutdown_task.cancel()
-            bot.shutdown_task = None
-            logging.info("Existing shutdown task cancelled as server is not running on ready.")
+    # Step 1: Register the persistent views before anything else so the panel buttons work right away
+    for server in bot.game_servers.values():
+        if server.panel_view is None:
+            server.panel_view = ServerControlView(bot, server)
+            bot.add_view(server.panel_view)
+    log_phase("register views")
+
+    # Step 2: Restore persisted state (message IDs, server timings, history) off the event loop
+    await load_persistent_state()
+    log_phase("load state")
+
+    # Step 3: Restore all persistent messages concurrently
+    logging.info("Initializing/Updating all persistent messages.")
+    await restore_persistent_messages(bot.game_servers.values())
+    logging.info("All persistent messages initialized/updated.")
+    log_phase("restore messages")
+
+    # Step 4: Initial server status check (for logging and shutdown jobs); one process scan covers every server
+    running_states = await bot.server_state.get_all()
+    for server in bot.game_servers.values():
+        if running_states.get(server.name):
+            logging.info("Detected %s (%s) is already running.", server.process_name, server.name)
+            if server.start_time and server.shutdown_deadline:
+                # Keep the persisted deadline so a bot restart never extends the server's lifetime.
+                logging.info("Restored %s start time %s and shutdown deadline %s.", server.name, server.start_time, server.shutdown_deadline)
+            else:
+                now = datetime.datetime.now(TARGET_TIMEZONE)
+                set_server_timing(server, now, now + datetime.timedelta(hours=server.shutdown_delay_hours))
+            bot.schedule_shutdown(server)
+        else:
+            logging.info("%s (%s) is not detected as running.", server.process_name, server.name)
+            set_server_timing(server, None, None)
+            if cancel_shutdown(server):
+                logging.info("Automated shutdown of %s cancelled as server is not running on ready.", server.name)
+    log_phase("process check")
 
     # Step 5: Start the periodic loops
     if not status_update_loop.is_running():
         status_update_loop.start()
         logging.info("Status update loop started.")
 
-    if not daily_clear_channel_loop.is_running():
-        daily_clear_channel_loop.start()
-        logging.info("Daily clear channel loop started.")
+    if any(server.idle_shutdown_minutes and server.player_count for server in bot.game_servers.values()) and not idle_shutdown_loop.is_running():
+        idle_shutdown_loop.start()
+        logging.info("Idle shutdown loop started.")
+
+    if any(server.prewarm for server in bot.game_servers.values()) and not prewarm_loop.is_running():
+        prewarm_loop.start()
+        logging.info("Pre-warm loop started.")
+
+    if METRICS_HTTP_PORT and bot.metrics_runner is None:
+        try:
+            await start_metrics_endpoint()
+        except OSError as e:
+            logging.error("Could not serve metrics on %s:%s: %s", METRICS_HTTP_HOST, METRICS_HTTP_PORT, e)
+
+    if (CONTROL_API_PORT or CONTROL_API_SOCKET) and bot.control_api_runner is None:
+        try:
+            await start_control_api()
+        except OSError as e:
+            logging.error("Could not serve the control API: %s", e)
+
+    if any(server.log_file for server in bot.game_servers.values()) and not log_follow_loop.is_running():
+        log_follow_loop.start()
+        logging.info("Log follow loop started.")
+
+    if RESOURCE_SAMPLING_SUPPORTED and not resource_sample_loop.is_running():
+        resource_sample_loop.start()
+        logging.info("Resource sample loop started.")
+
+    bot.scheduler.start()
+
+    if MEMORY_REPORT_DELAY_SECONDS and bot.memory_report_task is None:
+        bot.memory_report_task = asyncio.ensure_future(report_steady_state_memory())
+
+    logging.info("Bot ready in %.0f ms.", (time.perf_counter() - startup_started) * 1000)
+
+    # Step 6: Clean up every control channel in the background once the panels are usable
+    for channel_id in {server.channel_id for server in bot.game_servers.values()}:
+        channel = bot.get_channel(channel_id)
+        clear_task = bot.startup_clear_tasks.get(channel_id)
+        if channel and (clear_task is None or clear_task.done()):
+            logging.info("Running clear_channel in channel %s in the background after startup.", channel_id)
+            bot.startup_clear_tasks[channel_id] = asyncio.ensure_future(run_startup_clear_channel(channel))
+
+
+def command_target_servers(message):
+    """
+    Returns the servers a control channel command applies to: the server named by its first argument,
+    otherwise every server whose panel lives in the channel.
+    """
+    channel_servers = servers_in_channel(message.channel.id)
+    tokens = message.content.split()
+    if len(tokens) > 1:
+        named = [server for server in channel_servers if server.name == tokens[1]]
+        if named:
+            return named
+    return channel_servers
+
+async def resolve_server(ctx, server_name):
+    """
+    Returns the server a command targets in this channel, or None after telling the user why it could not be resolved.
+    The name may be omitted when only one server is controlled from the channel.
+    """
+    channel_servers = servers_in_channel(ctx.channel.id)
+    if not channel_servers:
+        await ctx.send("Please use this command in the designated server control channel.", ephemeral=True)
+        return None
+    if server_name is None and len(channel_servers) == 1:
+        return channel_servers[0]
+    for server in channel_servers:
+        if server.name == server_name:
+            return server
+    server_names = ", ".join(f"`{server.name}`" for server in channel_servers)
+    if server_name is None:
+        await ctx.send(f"Please name the server to use: {server_names}.", ephemeral=True, delete_after=15)
+    else:
+        await ctx.send(f"Unknown server `{server_name}`. Servers in this channel: {server_names}.", ephemeral=True, delete_after=15)
+    return None
 
 
 @bot.event
 async def on_command_error(ctx, error):
-    if ctx.channel.id == SERVER_CHANNEL_ID and isinstance(error, commands.CommandNotFound):
+    if is_control_channel(ctx.channel.id) and isinstance(error, commands.CommandNotFound):
         return
 
     if isinstance(error, commands.CommandNotFound):
@@ -479,112 +3861,468 @@ async def on_command_error(ctx, error):
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send("Missing arguments. Please check the command usage.", delete_after=10)
     else:
-        logging.error(f"An unexpected error occurred during command execution: {error}")
+        logging.error("An unexpected error occurred during command execution: %s", error)
         await ctx.send(f"An unexpected error occurred: {error}", delete_after=10)
 
-    if isinstance(ctx, commands.Context) and ctx.message and \
-       ctx.message.id not in {bot.current_panel_message_id, bot.current_history_message_id, bot.current_status_message_id}:
+    if isinstance(ctx, commands.Context) and ctx.message and ctx.message.id not in persistent_message_ids():
         try:
             await ctx.message.delete()
         except discord.Forbidden:
-            logging.error(f"Bot lacks 'manage_messages' permission to delete error-causing command message.")
+            logging.error("Bot lacks 'manage_messages' permission to delete error-causing command message.")
         except Exception as e:
-            logging.error(f"Failed to delete error-causing command message: {e}")
+            logging.error("Failed to delete error-causing command message: %s", e)
 
 @bot.event
 async def on_message(message):
     if message.author.bot:
         return
 
-    if message.channel.id != SERVER_CHANNEL_ID:
+    if not is_control_channel(message.channel.id):
         await bot.process_commands(message)
         return
 
+    if not bot.message_rate_limiter.allow(message.author.id):
+        # A flood is dropped before it costs any API call of its own; its messages go out with the next bulk delete.
+        bot.metrics.inc("messages_rate_limited_total")
+        logging.debug("Dropping message %s from %s in control channel: rate limit exceeded.", message.id, message.author)
+        bot.message_delete_batcher.add(message)
+        return
+
     ctx = await bot.get_context(message)
     if ctx.valid:
-        bot.command_history_list.append({
-            'command': ctx.command.name,
-            'user': ctx.author.display_name,
-            'timestamp': datetime.datetime.now(TARGET_TIMEZONE).strftime('%m/%d/%y %H:%M:%S %Z')
-        })
-        await bot.update_command_history_message(message.channel)
-        await bot.invoke(ctx)
+        bot.metrics.inc("commands_total", {"command": ctx.command.name})
+        servers = command_target_servers(message)
+        if ctx.command.name not in OPERATION_COMMANDS:
+            for server in servers:
+                add_command_history_entry(server, ctx.command.name, ctx.author.display_name)
+        try:
+            await bot.invoke(ctx)
+        finally:
+            # The panel is only refreshed once the command has run, so its edit never delays the reply.
+            for server in servers:
+                await bot.update_command_history_message(server)
     else:
-        if message.id not in {bot.current_panel_message_id, bot.current_history_message_id, bot.current_status_message_id}:
-            logging.debug(f"Deleting non-command message '{message.content}' in control channel.")
-            try:
-                await message.delete()
-            except discord.Forbidden:
-                logging.error(f"Bot lacks 'manage_messages' permission to delete user's invalid message.")
-            except Exception as e:
-                logging.error(f"Failed to delete user's invalid message: {e}")
+        if message.id not in persistent_message_ids():
+            logging.debug("Deleting non-command message '%s' in control channel.", message.content)
+            bot.message_delete_batcher.add(message)
         else:
-            logging.debug(f"Ignoring deletion of persistent message ID {message.id} in on_message.")
+            logging.debug("Ignoring deletion of persistent message ID %s in on_message.", message.id)
     
 
 # --- Bot Commands ---
-@bot.command(name="panel", help="Sends/updates the server control panel, status, and command history messages.")
-async def panel(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
+@bot.command(name="panel", help="Sends/updates the server control panel with its status and recent activity.")
+async def panel(ctx, server_name: str = None):
+    if not is_control_channel(ctx.channel.id):
         await ctx.send("Please use this command in the designated server control channel.", ephemeral=True)
         return
-    
-    panel_view = ServerControlView(bot, SERVER_CHANNEL_ID)
-    
-    await bot.update_persistent_message(
-        ctx.channel, 
-        "current_panel_message_id", 
-        PERSISTENT_VIEW_MESSAGE_ID_FILE, 
-        lambda: "Use the buttons below to control the game server:", 
-        view=panel_view
-    )
 
-    await bot.update_server_status_message(ctx.channel)
+    if server_name is None:
+        servers = servers_in_channel(ctx.channel.id)
+    else:
+        server = await resolve_server(ctx, server_name)
+        if server is None:
+            return
+        servers = [server]
 
-    await bot.update_command_history_message(ctx.channel)
+    for server in servers:
+        # An explicit !panel always re-renders, which also recreates a panel that was deleted by hand.
+        bot.persistent_message_hashes.pop((server.name, "panel_message_id"), None)
+        await render_panel_message(server)
 
 
-@bot.command(name="startserver", help="Starts the game server.")
-async def startserver(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
-        await ctx.send("Please use this command in the designated server control channel.", ephemeral=True)
+@bot.command(name="startserver", help="Starts a game server. The server name may be omitted when the channel controls only one.")
+async def startserver(ctx, server_name: str = None):
+    server = await resolve_server(ctx, server_name)
+    if server is None:
         return
-    await ctx.send("Attempting to start the game server...", ephemeral=True)
-    await bot.start_game_server(ctx)
+    await ctx.send(f"Attempting to start {server.display_name}...", ephemeral=True)
+    if await bot.start_game_server(server, ctx):
+        add_command_history_entry(server, ctx.command.name, ctx.author.display_name)
 
 
-@bot.command(name="stopserver", help="Stops the game server.")
-async def stopserver(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
-        await ctx.send("Please use this command in the designated server control channel.", ephemeral=True)
+@bot.command(name="stopserver", help="Stops a game server. The server name may be omitted when the channel controls only one.")
+async def stopserver(ctx, server_name: str = None):
+    server = await resolve_server(ctx, server_name)
+    if server is None:
         return
-    await ctx.send("Attempting to stop the game server...", ephemeral=True)
-    await bot.stop_game_server(ctx)
+    await ctx.send(f"Attempting to stop {server.display_name}...", ephemeral=True)
+    if await bot.stop_game_server(server, ctx):
+        add_command_history_entry(server, ctx.command.name, ctx.author.display_name)
 
-@bot.command(name="serverstatus", help="Checks and updates the status of the game server.")
-async def serverstatus(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
+@bot.command(name="serverstatus", help="Checks and updates the status of the game servers in this channel.")
+async def serverstatus(ctx, server_name: str = None):
+    if not is_control_channel(ctx.channel.id):
         await ctx.send("This command is only available in the designated server control channel.", ephemeral=True)
         return
-    await bot.update_server_status_message(ctx.channel)
+    if server_name is None:
+        servers = servers_in_channel(ctx.channel.id)
+    else:
+        server = await resolve_server(ctx, server_name)
+        if server is None:
+            return
+        servers = [server]
+    for server in servers:
+        await bot.update_server_status_message(server)
     await ctx.send("Server status display updated.", ephemeral=True)
 
 
+@bot.command(name="serverstats", help="Shows resource usage percentiles of a game server over the sampled history.")
+async def serverstats(ctx, server_name: str = None):
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+    if not RESOURCE_SAMPLING_SUPPORTED:
+        await ctx.send("Resource sampling is only available on Linux hosts.", ephemeral=True, delete_after=15)
+        return
+
+    since = time.time() - RESOURCE_HISTORY_SECONDS
+    cpu_values = sorted(v for v in server.resources.values("cpu_percent", since=since) if not math.isnan(v))
+    if not cpu_values:
+        await ctx.send(f"No resource samples for {server.display_name} yet. Samples are taken while the server is running.", ephemeral=True, delete_after=15)
+        return
+
+    rows = [("CPU %", "cpu_percent", lambda v: f"{v:.1f}"),
+            ("RAM", "rss_bytes", format_bytes),
+            ("Threads", "threads", lambda v: f"{v:.0f}"),
+            ("Read/s", "read_bytes_per_second", format_bytes),
+            ("Write/s", "write_bytes_per_second", format_bytes)]
+    table_lines = [f"{'':<9}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+    for label, metric, fmt in rows:
+        values = sorted(v for v in server.resources.values(metric, since=since) if not math.isnan(v))
+        if not values:
+            table_lines.append(f"{label:<9}{'n/a':>10}")
+            continue
+        table_lines.append(f"{label:<9}" + "".join(f"{fmt(percentile(values, p)):>10}" for p in (0.5, 0.9, 0.99)) + f"{fmt(values[-1]):>10}")
+
+    content = (f"**{server.display_name} Resources** (last {RESOURCE_HISTORY_SECONDS // 60} min, {len(cpu_values)} samples):\n"
+               "```\n" + "\n".join(table_lines) + "\n```")
+    await ctx.send(content, delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+    if ctx.message:
+        try:
+            await ctx.message.delete(delay=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+        except Exception as e:
+            logging.warning("Could not schedule deletion of !serverstats command message: %s", e)
+
+
+@bot.command(name="serverlog", help="Shows the last lines of a game server's output. Usage: !serverlog [server] [n] [--regex] [text]")
+async def serverlog(ctx, *args):
+    args = list(args)
+    server_name = None
+    if args and any(server.name == args[0] for server in servers_in_channel(ctx.channel.id)):
+        server_name = args.pop(0)
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+    if server.log_capture is None:
+        await ctx.send(f"No output is captured for {server.display_name}. Configure launch_args or log_file for it.", ephemeral=True, delete_after=15)
+        return
+
+    line_count = 20
+    if args and args[0].isdigit():
+        line_count = max(1, min(int(args.pop(0)), SERVER_LOG_MAX_LINES))
+    use_regex = bool(args) and args[0] == "--regex"
+    if use_regex:
+        args.pop(0)
+        # A regular expression can backtrack for minutes, so only members who manage the server may send one.
+        if not isinstance(ctx.author, discord.Member) or not ctx.channel.permissions_for(ctx.author).manage_guild:
+            await ctx.send("Only members with the Manage Server permission can search with a regular expression.", ephemeral=True, delete_after=15)
+            return
+    pattern_text = " ".join(args)
+    if len(pattern_text) > LOG_SEARCH_MAX_PATTERN_LENGTH:
+        await ctx.send(f"The search text may be at most {LOG_SEARCH_MAX_PATTERN_LENGTH} characters long.", ephemeral=True, delete_after=15)
+        return
+    try:
+        pattern = re.compile(pattern_text if use_regex else re.escape(pattern_text), re.IGNORECASE)
+    except re.error as e:
+        await ctx.send(f"Invalid regular expression: {e}", ephemeral=True, delete_after=15)
+        return
+
+    lines = await server.log_capture.search(pattern, line_count)
+    matching = f" matching `{pattern_text}`" if pattern_text else ""
+    if not lines:
+        await ctx.send(f"No output{matching} found for {server.display_name}.", ephemeral=True, delete_after=15)
+        return
+
+    header = f"**{server.display_name} Output** (last {len(lines)} line(s){matching}):\n"
+    # Discord messages are limited to 2000 characters, so keep the newest lines that fit.
+    budget = 2000 - len(header) - len("```\n\n```")
+    shown = []
+    for line in reversed(lines):
+        line = line.replace("```", "`\u200b``")
+        if len(line) + 1 > budget:
+            break
+        shown.append(line)
+        budget -= len(line) + 1
+    await ctx.send(header + "```\n" + "\n".join(reversed(shown)) + "\n```", delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+    if ctx.message:
+        try:
+            await ctx.message.delete(delay=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+        except Exception as e:
+            logging.warning("Could not schedule deletion of !serverlog command message: %s", e)
+
+
+@bot.command(name="history", help="Pages through a game server's activity history. Usage: !history [server] [user|!command] [page]")
+async def history(ctx, *args):
+    args = list(args)
+    server_name = None
+    if args and any(server.name == args[0] for server in servers_in_channel(ctx.channel.id)):
+        server_name = args.pop(0)
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+
+    page = 1
+    if args and args[-1].isdigit():
+        page = max(1, int(args.pop()))
+    term = " ".join(args)
+    user = command = None
+    if term.startswith(bot.command_prefix):
+        command = term[len(bot.command_prefix):]
+    elif term:
+        user = term
+
+    # Commit entries still waiting in the write batch so the newest activity is included.
+    await bot.state_store.flush()
+    entries, total = await bot.state_store.history_page(
+        history_server_names(server), HISTORY_PAGE_SIZE, offset=(page - 1) * HISTORY_PAGE_SIZE, user=user, command=command
+    )
+    matching = f" for `{term}`" if term else ""
+    if not entries:
+        message = f"No activity{matching} recorded for {server.display_name}." if total == 0 else \
+                  f"Page {page} is past the end; there are {math.ceil(total / HISTORY_PAGE_SIZE)} page(s){matching}."
+        await ctx.send(message, ephemeral=True, delete_after=15)
+        return
+
+    page_count = math.ceil(total / HISTORY_PAGE_SIZE)
+    header = f"**{server.display_name} Activity{matching}** (page {page}/{page_count}, {total} entries):\n"
+    await ctx.send(header + "\n".join(entry.display_line() for entry in entries), delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+    if ctx.message:
+        try:
+            await ctx.message.delete(delay=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+        except Exception as e:
+            logging.warning("Could not schedule deletion of !history command message: %s", e)
+
+
+SCHEDULE_USAGE = ("Usage: `!schedule` lists jobs, `!schedule <start|stop|restart> [server] <when>`, `!schedule cleanup <when>`, "
+                  "`!schedule cancel <id>`. `<when>` is `HH:MM`, `YYYY-MM-DD HH:MM`, `+1h30m` or `cron <min> <hour> <day> <month> <weekday>`.")
+
+@bot.command(name="schedule", help="Lists, adds or cancels scheduled server actions. Usage: !schedule [<start|stop|restart> [server] <when> | cleanup <when> | cancel <id>]")
+async def schedule(ctx, *args):
+    channel_servers = servers_in_channel(ctx.channel.id)
+    if not channel_servers:
+        await ctx.send("This command is only available in the designated server control channel.", ephemeral=True, delete_after=10)
+        return
+    args = list(args)
+    action = args.pop(0).lower() if args else "list"
+
+    if action == "list":
+        jobs = bot.scheduler.upcoming({server.name for server in channel_servers})
+        if not jobs:
+            await ctx.send("Nothing is scheduled.", ephemeral=True, delete_after=15)
+            return
+        shown = [job.describe() for job in jobs[:20]]
+        if len(jobs) > len(shown):
+            shown.append(f"...and {len(jobs) - len(shown)} more.")
+        await ctx.send("**Scheduled Jobs:**\n" + "\n".join(shown), delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+
+    elif action == "cancel":
+        job_id = args[0].lstrip("#") if args else ""
+        job = bot.scheduler.jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None or (job.server_name is not None and job.server_name not in {server.name for server in channel_servers}):
+            await ctx.send(f"No scheduled job `#{job_id}` in this channel.", ephemeral=True, delete_after=15)
+            return
+        if job.kind == "shutdown":
+            await ctx.send("The automated shutdown can't be cancelled; postpone it with `!extend` or stop the server instead.", ephemeral=True, delete_after=15)
+            return
+        bot.scheduler.cancel(job.id)
+        await ctx.send(f"Cancelled {job.describe()}.", ephemeral=True, delete_after=15)
+        if job.server_name in bot.game_servers:
+            await bot.update_server_status_message(bot.game_servers[job.server_name])
+
+    elif action in ("start", "stop", "restart", "cleanup"):
+        server = None
+        if action != "cleanup":
+            server_name = args.pop(0) if args and any(server.name == args[0] for server in channel_servers) else None
+            server = await resolve_server(ctx, server_name)
+            if server is None:
+                return
+        if len(bot.scheduler.jobs) >= SCHEDULE_MAX_JOBS:
+            await ctx.send(f"There are already {SCHEDULE_MAX_JOBS} scheduled jobs. Cancel some first.", ephemeral=True, delete_after=15)
+            return
+        try:
+            run_at, cron = parse_schedule_time(args, time.time())
+        except ValueError as e:
+            await ctx.send(f"{e}\n{SCHEDULE_USAGE}", ephemeral=True, delete_after=30)
+            return
+        job = bot.scheduler.add(action, run_at, server.name if server else None, cron, ctx.author.display_name)
+        await ctx.send(f"Scheduled {job.describe()}.", ephemeral=True, delete_after=15)
+        if server is not None:
+            await bot.update_server_status_message(server)
+
+    else:
+        await ctx.send(SCHEDULE_USAGE, ephemeral=True, delete_after=30)
+
+
+@bot.command(name="extend", help="Postpones a running game server's automated shutdown. Usage: !extend [server] [hours]")
+async def extend(ctx, *args):
+    args = list(args)
+    server_name = None
+    if args and any(server.name == args[0] for server in servers_in_channel(ctx.channel.id)):
+        server_name = args.pop(0)
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+    try:
+        hours = float(args[0]) if args else 1.0
+    except ValueError:
+        hours = 0
+    if not 0 < hours <= SCHEDULE_EXTEND_MAX_HOURS:
+        await ctx.send(f"Please give a number of hours between 0 and {SCHEDULE_EXTEND_MAX_HOURS}, e.g. `!extend 2`.", ephemeral=True, delete_after=15)
+        return
+    if not await bot.check_server_process(server) or server.shutdown_deadline is None:
+        await ctx.send(f"{server.display_name} is not running, so there is no shutdown to postpone.", ephemeral=True, delete_after=15)
+        return
+
+    latest_deadline = datetime.datetime.now(TARGET_TIMEZONE) + datetime.timedelta(hours=SCHEDULE_EXTEND_MAX_HOURS)
+    new_deadline = min(server.shutdown_deadline + datetime.timedelta(hours=hours), latest_deadline)
+    if new_deadline <= server.shutdown_deadline:
+        await ctx.send(f"The shutdown of {server.display_name} is already {SCHEDULE_EXTEND_MAX_HOURS} hours away, the most allowed.", ephemeral=True, delete_after=15)
+        return
+    set_server_timing(server, server.start_time, new_deadline)
+    bot.schedule_shutdown(server)
+    await ctx.send(f"Automated shutdown of {server.display_name} moved to {new_deadline.strftime('%m/%d/%y %H:%M:%S %Z')}.", ephemeral=True, delete_after=15)
+    await bot.update_server_status_message(server)
+
+
+@bot.command(name="backup", help="Takes a snapshot of a game server's save directory now. Usage: !backup [server]")
+async def backup(ctx, server_name: str = None):
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+    if server.snapshots is None:
+        await ctx.send(f"Snapshots are not configured for {server.display_name}. Set save_directory for it.", ephemeral=True, delete_after=15)
+        return
+    warning = ""
+    if await bot.check_server_process(server):
+        warning = " The server is running, so files it is writing may be caught mid-save."
+    await ctx.send(f"Taking a snapshot of {server.display_name}...{warning}", ephemeral=True, delete_after=15)
+    summary = await server.snapshots.snapshot("manual")
+    if summary is None:
+        await ctx.send(f"The snapshot of {server.display_name} failed. Check the bot log for details.", ephemeral=True, delete_after=15)
+        return
+    await ctx.send(f"Snapshot of {server.display_name} saved: {summary['changed_files']} of {summary['files']} file(s) changed, "
+                   f"{format_bytes(summary['stored_bytes'])} new data stored in {summary['seconds']:.1f}s.", ephemeral=True, delete_after=15)
+
+
+@bot.command(name="forecast", help="Shows when players are expected to want a game server over the next day. Usage: !forecast [server]")
+async def forecast(ctx, server_name: str = None):
+    server = await resolve_server(ctx, server_name)
+    if server is None:
+        return
+    model = server.forecast
+    await model.refresh()
+    if model.weeks_observed < 1:
+        await ctx.send(f"Not enough history for a forecast of {server.display_name} yet; it needs at least a week of activity.", ephemeral=True, delete_after=15)
+        return
+
+    lines = [f"**{server.display_name} Demand Forecast** (learned from {model.weeks_observed:.1f} weeks of history):"]
+    upcoming = [slot for slot in model.upcoming(24) if slot[1] > 0][:18] # Keeps the reply under the message size limit
+    if not upcoming:
+        lines.append("No demand expected in the next 24 hours.")
+    for slot_start, probability, session_seconds in upcoming:
+        filled = round(probability * 10)
+        session = f" · sessions ~{int(session_seconds // 3600)}h {int(session_seconds % 3600 // 60)}m" if session_seconds else ""
+        prewarm = " · pre-warm" if server.prewarm and model.confident and probability >= FORECAST_PREWARM_CONFIDENCE else ""
+        lines.append(f"`{WEEKDAY_NAMES[slot_start.weekday()]} {slot_start.strftime('%H:%M')}` `{'█' * filled}{'░' * (10 - filled)}` {probability:.0%}{session}{prewarm}")
+    if not server.prewarm:
+        lines.append("Pre-warming is off for this server.")
+    elif not model.confident:
+        lines.append(f"Pre-warming starts once {FORECAST_MIN_WEEKS} weeks of history are available.")
+    await ctx.send("\n".join(lines), delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+    if ctx.message:
+        try:
+            await ctx.message.delete(delay=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+        except Exception as e:
+            logging.warning("Could not schedule deletion of !forecast command message: %s", e)
+
+
+@bot.command(name="botstats", help="Shows the bot's own health: REST latency, event loop lag, process probe timings and more.")
+async def botstats(ctx):
+    if not is_control_channel(ctx.channel.id):
+        await ctx.send("This command is only available in the designated server control channel.", ephemeral=True, delete_after=10)
+        return
+
+    metrics = bot.metrics
+    def ms(seconds):
+        return f"{seconds * 1000:.0f} ms"
+    def summary(histogram):
+        return f"n={histogram.count} · p50 {ms(histogram.quantile(0.5))} · p95 {ms(histogram.quantile(0.95))} · max {ms(histogram.max)}"
+
+    uptime_minutes = int((time.time() - metrics.started_at) // 60)
+    lines = [f"Uptime               {uptime_minutes // 60}h {uptime_minutes % 60}m"]
+    if not math.isnan(bot.latency) and not math.isinf(bot.latency):
+        lines.append(f"Gateway latency      {ms(bot.latency)}")
+    for label_items, histogram in metrics.histograms_named("event_loop_lag_seconds").items():
+        lines.append(f"Event loop lag       p50 {ms(histogram.quantile(0.5))} · p99 {ms(histogram.quantile(0.99))} · max {ms(histogram.max)}")
+    lines.append(f"Loop blocks >{LOOP_BLOCK_WARNING_MS}ms   {metrics.counter_value('event_loop_blocks_total')}")
+    lines.append(f"Chat deleted         {metrics.counter_value('chat_messages_deleted_total')} ({metrics.counter_value('messages_rate_limited_total')} rate-limited)")
+    resident_bytes, peak_bytes = process_memory_bytes()
+    if resident_bytes is not None:
+        steady_bytes = metrics.gauge_value("steady_state_resident_bytes")
+        steady = f" · steady {format_bytes(steady_bytes)}" if steady_bytes is not None else ""
+        lines.append(f"Memory (RSS)         {format_bytes(resident_bytes)} · peak {format_bytes(peak_bytes)}{steady}")
+    lines.append(f"Cached               {len(bot.cached_messages)} messages · {sum(len(guild.members) for guild in bot.guilds)} members · "
+                 f"{metrics.counter_value('gateway_events_dropped_total')} events dropped")
+    for label_items, histogram in metrics.histograms_named("status_loop_drift_seconds").items():
+        lines.append(f"Status loop drift    p99 {ms(histogram.quantile(0.99))} · max {ms(histogram.max)}")
+    for label_items, histogram in metrics.histograms_named("process_probe_seconds").items():
+        lines.append(f"Process probe        {summary(histogram)}")
+    for label_items, histogram in sorted(metrics.histograms_named("server_confirm_seconds").items()):
+        labels = dict(label_items)
+        lines.append(f"{labels['server']} {labels['action']} ({labels['result']})".ljust(21) + f"n={histogram.count} · p50 {histogram.quantile(0.5):.1f}s · max {histogram.max:.1f}s")
+
+    rest_histograms = sorted(metrics.histograms_named("rest_request_seconds").items())
+    if rest_histograms:
+        lines.append("REST calls:")
+        for label_items, histogram in rest_histograms:
+            route = dict(label_items)["route"]
+            rate_limited = metrics.counter_value("rest_requests_total", route=route, status=429)
+            lines.append(f"  {route:<19}{summary(histogram)}" + (f" · {rate_limited}x 429" if rate_limited else ""))
+
+    await ctx.send("**Bot Stats:**\n```\n" + "\n".join(lines) + "\n```", delete_after=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+    if ctx.message:
+        try:
+            await ctx.message.delete(delay=STATS_MESSAGE_DELETE_DELAY_SECONDS)
+        except Exception as e:
+            logging.warning("Could not schedule deletion of !botstats command message: %s", e)
+
+
 @bot.command(name="serverhelp", help="Shows commands specific to this server bot.")
 async def serverhelp(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
+    if not is_control_channel(ctx.channel.id):
         await ctx.send("This command is only available in the designated server control channel.", ephemeral=True, delete_after=10)
         return
 
-    help_message_content = """
+    server_names = ", ".join(f"`{server.name}`" for server in servers_in_channel(ctx.channel.id))
+    help_message_content = f"""
 **Available Server Commands (All Users):**
-`!panel` - Sends/updates the server control panel, status, and command history messages.
-`!startserver` - Starts the game server.
-`!stopserver` - Stops the game server.
-`!serverstatus` - Checks and updates the displayed status of the game server.
-`!clear_channel` - Clears all messages in this channel except the panel, status, and history messages.
+`!panel [server]` - Sends/updates the server control panel with its status and recent activity.
+`!startserver [server]` - Starts the game server.
+`!stopserver [server]` - Stops the game server.
+`!serverstatus [server]` - Checks and updates the displayed status of the game server.
+`!serverstats [server]` - Shows CPU, RAM, thread and disk I/O percentiles of the game server over the last hour.
+`!serverlog [server] [n] [--regex] [text]` - Shows the last n lines of the game server's output, optionally only those containing text (--regex needs Manage Server).
+`!history [server] [user|!command] [page]` - Pages through the full activity history, optionally only one user's or one command's.
+`!schedule [start|stop|restart|cleanup|cancel] ...` - Lists, adds or cancels scheduled jobs; `!schedule help` explains the time formats.
+`!forecast [server]` - Shows when players are expected to want the server over the next day.
+`!extend [server] [hours]` - Postpones the automated shutdown of a running server (1 hour by default).
+`!backup [server]` - Snapshots the server's save directory now (also done after every stop).
+`!botstats` - Shows the bot's own health: Discord API latency, event loop lag and process check timings.
+`!clear_channel` - Clears all messages in this channel except the server panels.
+`!clear_channel full` - Same as above, but rescans the whole channel instead of only messages since the last clear.
 `!serverhelp` - Shows this help message.
 
+**Servers in this channel:** {server_names}. The server name may be left out when there is only one.
 **Note:** Buttons on the panel provide easier control for Start/Stop.
 """
     help_msg = await ctx.send(help_message_content)
@@ -596,23 +4334,114 @@ async def serverhelp(ctx):
         # Delete the bot's help message
         await help_msg.delete() 
     except (discord.NotFound, discord.Forbidden) as e:
-        logging.warning(f"Could not delete !serverhelp response (bot's message): {e}")
+        logging.warning("Could not delete !serverhelp response (bot's message): %s", e)
     except Exception as e:
-        logging.error(f"Failed to delete !serverhelp response (bot's message): {e}")
+        logging.error("Failed to delete !serverhelp response (bot's message): %s", e)
 
     # Delete the original command message from the user
     if ctx.message:
         try:
             await ctx.message.delete()
         except (discord.NotFound, discord.Forbidden) as e:
-            logging.warning(f"Could not delete original !serverhelp command message (user's message): {e}")
+            logging.warning("Could not delete original !serverhelp command message (user's message): %s", e)
         except Exception as e:
-            logging.error(f"Failed to delete original !serverhelp command message (user's message): {e}")
+            logging.error("Failed to delete original !serverhelp command message (user's message): %s", e)
+
 
+# --- Channel Cleanup ---
+BULK_DELETE_LIMIT = 100 # Discord's maximum number of messages per bulk delete request
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) # Discord refuses to bulk delete messages older than this
 
-@bot.command(name="clear_channel", help="Clears all messages in this channel except the panel, status, and history messages.")
-async def clear_channel(ctx):
-    if ctx.channel.id != SERVER_CHANNEL_ID:
+def load_clear_channel_watermark(channel_id):
+    """Returns the newest message ID in the channel handled by the last clear_channel run, or None."""
+    watermark = bot.state_store.get(f"clear_channel_watermark.{channel_id}")
+    if watermark is None and channel_id == SERVER_CHANNEL_ID:
+        # Single-server versions of the bot kept one watermark for the only control channel.
+        watermark = bot.state_store.get("clear_channel_watermark")
+    return watermark
+
+def save_clear_channel_watermark(channel_id, message_id):
+    bot.state_store.set(f"clear_channel_watermark.{channel_id}", message_id)
+
+
+class OldMessageDeleteRun:
+    """Tracks the messages one clear_channel run handed to the shared OldMessageDeleteQueue."""
+    def __init__(self):
+        self.pending = 0
+        self.deleted_count = 0
+        self.failed_ids = set()
+        self._done = asyncio.Event()
+        self._done.set()
+
+    def _added(self):
+        self.pending += 1
+        self._done.clear()
+
+    def _finished(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self._done.set()
+
+    async def wait(self):
+        """Waits until every message of this run was deleted or given up on."""
+        await self._done.wait()
+
+
+class OldMessageDeleteQueue:
+    """
+    Deletes messages that are too old for bulk deletion one at a time in the background.
+    discord.py already waits out an exhausted rate-limit bucket before each request, so the worker only
+    adds its own delay when Discord still answers with a 429.
+    Runs share the worker but each passes its own OldMessageDeleteRun, so overlapping runs only wait for and
+    count their own messages.
+    """
+    def __init__(self):
+        self._queue = None
+        self._task = None
+
+    def _ensure_worker(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+
+    def put(self, message, run):
+        self._ensure_worker()
+        run._added()
+        self._queue.put_nowait((message, run))
+
+    async def _run(self):
+        while True:
+            message, run = await self._queue.get()
+            retrying = False
+            try:
+                await message.delete()
+                run.deleted_count += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    retry_after = float(e.response.headers.get("Retry-After", 1)) if e.response is not None else 1
+                    logging.warning("Rate limited while deleting old message %s. Retrying in %ss.", message.id, retry_after)
+                    await asyncio.sleep(retry_after)
+                    self._queue.put_nowait((message, run))
+                    retrying = True
+                else:
+                    logging.warning("Could not delete old message %s (older than 14 days): %s", message.id, e)
+                    run.failed_ids.add(message.id)
+            except Exception as e:
+                logging.error("Error deleting old message %s: %s", message.id, e)
+                run.failed_ids.add(message.id)
+            finally:
+                self._queue.task_done()
+                if not retrying:
+                    run._finished()
+
+bot.old_message_delete_queue = OldMessageDeleteQueue()
+
+
+@bot.command(name="clear_channel", help="Clears all messages in this channel except the server panels. Use '!clear_channel full' to rescan the whole channel.")
+async def clear_channel(ctx, mode: str = None):
+    if not is_control_channel(ctx.channel.id):
         if isinstance(ctx, commands.Context):
             await ctx.send("This command can only be used in the designated server control channel.", ephemeral=True)
         return
@@ -620,38 +4449,64 @@ async def clear_channel(ctx):
     if isinstance(ctx, commands.Context):
         await ctx.send("Attempting to clear channel history...", ephemeral=True)
     
-    ids_to_keep = set()
-    if bot.current_panel_message_id: ids_to_keep.add(bot.current_panel_message_id)
-    if bot.current_history_message_id: ids_to_keep.add(bot.current_history_message_id)
-    if bot.current_status_message_id: ids_to_keep.add(bot.current_status_message_id)
-    
+    ids_to_keep = persistent_message_ids()
+
+    # Messages kept only for this run, or that failed to delete, must be rescanned next time, so the watermark
+    # may not pass them.
+    transient_ids_to_keep = set()
     if isinstance(ctx, commands.Context) and ctx.message:
-        ids_to_keep.add(ctx.message.id)
+        transient_ids_to_keep.add(ctx.message.id)
+    ids_to_keep |= transient_ids_to_keep
 
-    messages_to_bulk_delete = []
-    individually_deleted_count = 0
+    watermark = None if mode == "full" else load_clear_channel_watermark(ctx.channel.id)
+    newest_seen_id = watermark
+    pending_bulk_delete = []
+    bulk_deleted_count = 0
+    old_message_run = OldMessageDeleteRun()
+    failed_ids = set()
     total_messages_processed = 0
 
+    async def flush_bulk_delete():
+        nonlocal bulk_deleted_count
+        if not pending_bulk_delete:
+            return
+        batch = pending_bulk_delete[:]
+        pending_bulk_delete.clear()
+        try:
+            await ctx.channel.delete_messages(batch)
+            bulk_deleted_count += len(batch)
+        except discord.Forbidden:
+            raise
+        except discord.HTTPException as e:
+            logging.warning("Bulk delete of %s messages failed: %s", len(batch), e)
+            failed_ids.update(message.id for message in batch)
+
     try:
-        async for message in ctx.channel.history(limit=None):
+        # Only messages newer than the last run's watermark are read, oldest first.
+        after = discord.Object(id=watermark) if watermark else None
+        bulk_delete_cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE + datetime.timedelta(minutes=1)
+        async for message in ctx.channel.history(limit=None, after=after, oldest_first=True):
             total_messages_processed += 1
-            if message.id not in ids_to_keep:
-                if (datetime.datetime.now(datetime.timezone.utc) - message.created_at).days < 14:
-                    messages_to_bulk_delete.append(message)
-                else:
-                    try:
-                        await message.delete()
-                        individually_deleted_count += 1
-                        await asyncio.sleep(0.5)
-                    except (discord.Forbidden, discord.HTTPException) as e:
-                        logging.warning(f"Could not delete old message {message.id} (older than 14 days): {e}")
-                    except Exception as e:
-                        logging.error(f"Error deleting old message {message.id}: {e}")
+            newest_seen_id = max(newest_seen_id or 0, message.id)
+            if message.id in ids_to_keep:
+                continue
+            if message.created_at > bulk_delete_cutoff:
+                pending_bulk_delete.append(message)
+                if len(pending_bulk_delete) >= BULK_DELETE_LIMIT:
+                    await flush_bulk_delete()
+            else:
+                bot.old_message_delete_queue.put(message, old_message_run)
+
+        await flush_bulk_delete()
+        await old_message_run.wait()
+        individually_deleted_count = old_message_run.deleted_count
+
+        if newest_seen_id:
+            failed_ids.update(old_message_run.failed_ids)
+            if transient_ids_to_keep or failed_ids:
+                newest_seen_id = min(newest_seen_id, min(transient_ids_to_keep | failed_ids) - 1)
+            save_clear_channel_watermark(ctx.channel.id, newest_seen_id)
 
-        if messages_to_bulk_delete:
-            await ctx.channel.delete_messages(messages_to_bulk_delete)
-        
-        bulk_deleted_count = len(messages_to_bulk_delete)
         deleted_count = bulk_deleted_count + individually_deleted_count
             
         if isinstance(ctx, commands.Context):
@@ -662,14 +4517,14 @@ async def clear_channel(ctx):
                 delete_after=15
             )
         else:
-            logging.info(f"Startup/Daily clear task: Successfully cleared {deleted_count} messages.")
+            logging.info("Startup/Daily clear task: Successfully cleared %s of %s scanned messages.", deleted_count, total_messages_processed)
 
     except discord.Forbidden:
-        logging.error(f"Bot lacks 'manage_messages' permission to clear the channel.")
+        logging.error("Bot lacks 'manage_messages' permission to clear the channel.")
         if isinstance(ctx, commands.Context):
             await ctx.send("I don't have permission to delete messages in this channel. Please grant 'Manage Messages' permission.", ephemeral=True)
     except Exception as e:
-        logging.error(f"ERROR in clear_channel command: {e}")
+        logging.error("ERROR in clear_channel command: %s", e)
         if isinstance(ctx, commands.Context):
             await ctx.send(f"An error occurred while trying to clear the channel: {e}", ephemeral=True)
 
@@ -677,8 +4532,9 @@ async def clear_channel(ctx):
 # --- Run the Bot ---
 if __name__ == "__main__":
     try:
-        bot.run(DISCORD_BOT_TOKEN)
+        # log_handler=None keeps discord.py from adding a second, unqueued console handler to the root logger.
+        bot.run(DISCORD_BOT_TOKEN, log_handler=None)
     except discord.LoginFailure:
         logging.critical("Bot login failed. Check if DISCORD_BOT_TOKEN is correct and valid. Double-check for typos or if the token was revoked/regenerated elsewhere.")
     except Exception as e:
-        logging.critical(f"An unhandled error occurred during bot startup: {e}")
+        logging.critical("An unhandled error occurred during bot startup: %s", e)
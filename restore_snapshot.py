@@ -0,0 +1,116 @@
+"""
+Lists and restores the save snapshots game_server_bot takes.
+
+Needs only the standard library, so it works with the bot stopped. Stop the game server before restoring into
+its save directory.
+
+    python restore_snapshot.py list MyGameServer                                # newest snapshot last
+    python restore_snapshot.py restore MyGameServer latest restored_saves
+    python restore_snapshot.py restore MyGameServer 20240501-030000-000.json "C:\\Game\\Saves" --force
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+
+
+def manifest_names(store):
+    manifest_dir = os.path.join(store, "manifests")
+    try:
+        return sorted(name for name in os.listdir(manifest_dir) if name.endswith(".json"))
+    except FileNotFoundError:
+        return []
+
+
+def read_manifest(store, name):
+    with open(os.path.join(store, "manifests", name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_bytes(byte_count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(byte_count) < 1024 or unit == "GB":
+            return f"{byte_count:.0f} {unit}" if unit == "B" else f"{byte_count:.1f} {unit}"
+        byte_count /= 1024
+
+
+def list_snapshots(store):
+    names = manifest_names(store)
+    if not names:
+        print(f"No snapshots in {store}.")
+        return 1
+    for name in names:
+        manifest = read_manifest(store, name)
+        total_bytes = sum(entry["size"] for entry in manifest["files"].values())
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest["created_at"]))
+        print(f"{name:<28}{created:<21}{manifest.get('reason', ''):<10}{len(manifest['files']):>7} files{format_bytes(total_bytes):>12}")
+    return 0
+
+
+def restore_snapshot(store, name, target, force):
+    names = manifest_names(store)
+    if name == "latest":
+        if not names:
+            print(f"No snapshots in {store}.", file=sys.stderr)
+            return 1
+        name = names[-1]
+    elif not name.endswith(".json"):
+        name += ".json"
+    if name not in names:
+        print(f"Snapshot {name} not found in {store}.", file=sys.stderr)
+        return 1
+    if os.path.isdir(target) and os.listdir(target) and not force:
+        print(f"{target} is not empty. Use --force to overwrite the files the snapshot contains.", file=sys.stderr)
+        return 1
+
+    manifest = read_manifest(store, name)
+    chunk_dir = os.path.join(store, "chunks")
+    target_root = os.path.abspath(target)
+    for relative_path, entry in sorted(manifest["files"].items()):
+        path = os.path.abspath(os.path.join(target_root, *relative_path.split("/")))
+        if os.path.commonpath([target_root, path]) != target_root:
+            print(f"Skipping {relative_path}: it points outside the target directory.", file=sys.stderr)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".restore.tmp"
+        with open(temp_path, "wb") as output:
+            for digest in entry["chunks"]:
+                with open(os.path.join(chunk_dir, digest[:2], digest + ".z"), "rb") as chunk_file:
+                    data = zlib.decompress(chunk_file.read())
+                if hashlib.sha256(data).hexdigest() != digest:
+                    output.close()
+                    os.remove(temp_path)
+                    print(f"Chunk {digest} of {relative_path} is corrupt; restore aborted.", file=sys.stderr)
+                    return 1
+                output.write(data)
+        os.replace(temp_path, path)
+        os.chmod(path, entry.get("mode", 0o644))
+        os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+    print(f"Restored {len(manifest['files'])} file(s) from {name} into {target}.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and restore game server save snapshots.")
+    parser.add_argument("--snapshot-dir", default="snapshots", help="the bot's SNAPSHOT_DIR (default: snapshots)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    list_parser = subcommands.add_parser("list", help="list a server's snapshots")
+    list_parser.add_argument("server", help="server name as configured in GAME_SERVERS")
+    restore_parser = subcommands.add_parser("restore", help="write a snapshot's files into a directory")
+    restore_parser.add_argument("server", help="server name as configured in GAME_SERVERS")
+    restore_parser.add_argument("snapshot", help="manifest name from 'list', or 'latest'")
+    restore_parser.add_argument("target", help="directory to restore into")
+    restore_parser.add_argument("--force", action="store_true", help="restore into a directory that is not empty")
+    args = parser.parse_args()
+
+    store = os.path.join(args.snapshot_dir, args.server)
+    if args.command == "list":
+        return list_snapshots(store)
+    return restore_snapshot(store, args.snapshot, args.target, args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Command-line client for game_server_bot's local control API.
+
+Needs only the standard library. The token comes from --token or the GSBOT_CONTROL_TOKEN environment variable, and
+must match CONTROL_API_TOKEN in the bot's configuration.
+
+    python server_control.py status                          # every server
+    python server_control.py start MyGameServer              # waits until the start is confirmed
+    python server_control.py stop MyGameServer --no-wait     # only queues the stop
+    python server_control.py history MyGameServer --limit 20
+    python server_control.py schedule add restart MyGameServer cron 0 5 * * *
+    python server_control.py --socket /run/gsbot/control.sock schedule list
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import urllib.parse
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def request(args, method, path, query=None, body=None):
+    """Sends one request and returns (HTTP status, decoded JSON body)."""
+    if args.socket:
+        connection = UnixHTTPConnection(args.socket, args.timeout)
+    else:
+        url = urllib.parse.urlsplit(args.url)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=args.timeout)
+    if query:
+        path += "?" + urllib.parse.urlencode(query)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    try:
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+
+def format_status(status):
+    state = "running" if status["running"] else "stopped"
+    parts = [f"{status['name']}: {state}"]
+    if status.get("shutdown_at"):
+        parts.append(f"shuts down {status['shutdown_at']}")
+    if status.get("players"):
+        parts.append(f"{status['players']['online']}/{status['players']['max']} players")
+    if status.get("operation"):
+        parts.append(f"{status['operation']} in progress")
+    if status.get("queued_operations"):
+        parts.append("queued: " + ", ".join(status["queued_operations"]))
+    return " · ".join(parts)
+
+
+def format_job(job):
+    target = f" {job['server']}" if job["server"] else ""
+    repeat = f", repeats '{job['cron']}'" if job["cron"] else ""
+    return f"#{job['id']} {job['kind']}{target} at {job['run_at']}{repeat} (by {job['created_by']})"
+
+
+def run(args):
+    """Runs the chosen command and returns the process exit code."""
+    if args.command == "status":
+        status, result = request(args, "GET", f"/servers/{urllib.parse.quote(args.server)}" if args.server else "/servers")
+        lines = [format_status(server) for server in result.get("servers", [result])] if status == 200 else []
+    elif args.command in ("start", "stop", "restart"):
+        query = {"user": args.user}
+        if args.no_wait:
+            query["wait"] = "false"
+        status, result = request(args, "POST", f"/servers/{urllib.parse.quote(args.server)}/{args.command}", query)
+        lines = result.get("messages", []) + ([format_status(result["status"])] if "status" in result else [])
+        if status == 202:
+            lines = [f"{args.command.capitalize()} of {args.server} queued."]
+        elif status == 200 and not result["ok"]:
+            status = 500 # The request worked but the operation did not; report it through the exit code
+    elif args.command == "history":
+        query = {"limit": args.limit, "offset": args.offset}
+        if args.filter_user:
+            query["user"] = args.filter_user
+        if args.filter_command:
+            query["command"] = args.filter_command
+        status, result = request(args, "GET", f"/servers/{urllib.parse.quote(args.server)}/history", query)
+        lines = [f"{entry['created_at']}  {entry['command']} ({entry['user']})" for entry in result.get("entries", [])]
+        if status == 200:
+            lines.append(f"{len(lines)} of {result['total']} entries.")
+    elif args.schedule_command == "add":
+        server, when = (None, args.when) if args.action == "cleanup" else (args.when[0], args.when[1:])
+        body = {"action": args.action, "server": server, "when": " ".join(when), "user": args.user}
+        status, result = request(args, "POST", "/schedule", body=body)
+        lines = [f"Scheduled {format_job(result)}."] if status == 201 else []
+    elif args.schedule_command == "cancel":
+        status, result = request(args, "DELETE", f"/schedule/{args.job_id.lstrip('#')}")
+        lines = [f"Cancelled {format_job(result)}."] if status == 200 else []
+    else:
+        status, result = request(args, "GET", "/schedule")
+        lines = [format_job(job) for job in result.get("jobs", [])] or ["Nothing is scheduled."]
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif "error" in result:
+        print(f"Error: {result['error']}", file=sys.stderr)
+    else:
+        print("\n".join(lines))
+    return 0 if status < 300 else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Control game servers through the bot's local control API.")
+    parser.add_argument("--url", default="http://127.0.0.1:9109", help="API address (default: http://127.0.0.1:9109)")
+    parser.add_argument("--socket", help="connect to this Unix socket (CONTROL_API_SOCKET) instead of --url")
+    parser.add_argument("--token", default=os.environ.get("GSBOT_CONTROL_TOKEN"), help="API token (default: $GSBOT_CONTROL_TOKEN)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for an answer; starts wait for the server to be ready")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON response")
+    parser.add_argument("--user", default="API", help="name recorded in the command history (default: API)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status_parser = commands.add_parser("status", help="show whether servers are running")
+    status_parser.add_argument("server", nargs="?")
+    for action in ("start", "stop", "restart"):
+        action_parser = commands.add_parser(action, help=f"{action} a server")
+        action_parser.add_argument("server")
+        action_parser.add_argument("--no-wait", action="store_true", help="return once the request is queued")
+
+    history_parser = commands.add_parser("history", help="show a server's command history, newest first")
+    history_parser.add_argument("server")
+    history_parser.add_argument("--limit", type=int, default=10)
+    history_parser.add_argument("--offset", type=int, default=0)
+    history_parser.add_argument("--filter-user", help="only entries by this user")
+    history_parser.add_argument("--filter-command", help="only entries of this command")
+
+    schedule_parser = commands.add_parser("schedule", help="list, add or cancel scheduled jobs")
+    schedule_commands = schedule_parser.add_subparsers(dest="schedule_command")
+    schedule_commands.add_parser("list", help="list scheduled jobs")
+    add_parser = schedule_commands.add_parser("add", help="add a job, e.g. 'add restart MyGameServer 05:00'")
+    add_parser.add_argument("action", choices=("start", "stop", "restart", "cleanup"))
+    add_parser.add_argument("when", nargs="+", help="[server] followed by HH:MM, 'YYYY-MM-DD HH:MM', +1h30m or 'cron <5 fields>'")
+    cancel_parser = schedule_commands.add_parser("cancel", help="cancel a job by its ID")
+    cancel_parser.add_argument("job_id")
+
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error("no token given; use --token or set GSBOT_CONTROL_TOKEN")
+    if args.command == "schedule" and args.schedule_command == "add" and args.action != "cleanup" and len(args.when) < 2:
+        parser.error("schedule add needs a server and a time")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return run(args)
+    except (OSError, http.client.HTTPException) as e:
+        print(f"Could not reach the control API: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())